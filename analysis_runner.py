@@ -0,0 +1,172 @@
+import heapq
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from log_pipeline import open_log_file
+
+logger = logging.getLogger(__name__)
+
+
+class Analysis:
+    """One consumer of the shared log scan.
+
+    prefilter -- LinePrefilter with the byte markers this analysis needs (None = every line)
+    parse_fn  -- decoded entry -> parsed item or None, e.g. a script's parse_log_entry
+    finish_fn -- (parsed_items, name_suffix) -> writes the analysis outputs
+    consumer_cls -- name_suffix -> object with feed(item) and finish(), fed each item as
+                 its file is scanned so the analysis keeps only its own state
+                 (None = collect the items and call finish_fn on them at the end)
+    reorder   -- ReorderBuffer: items are fed in its key order instead of file order
+    parse_fn must be a module-level function when the scan runs in a process pool.
+    """
+
+    def __init__(self, name, parse_fn, finish_fn, prefilter=None, reorder=None, consumer_cls=None):
+        self.name = name
+        self.parse_fn = parse_fn
+        self.finish_fn = finish_fn
+        self.prefilter = prefilter
+        self.reorder = reorder
+        self.consumer_cls = consumer_cls
+
+    def accepts(self, line):
+        return self.prefilter is None or self.prefilter.accepts(line)
+
+    def start(self, name_suffix):
+        """Return the consumer that receives this analysis' items for one run."""
+        if self.consumer_cls is not None:
+            return self.consumer_cls(name_suffix)
+        return _CollectingConsumer(self.finish_fn, name_suffix)
+
+
+class _CollectingConsumer:
+    """Consumer for an analysis that needs all its items at once: keeps them and calls finish_fn at the end."""
+
+    def __init__(self, finish_fn, name_suffix):
+        self.finish_fn = finish_fn
+        self.name_suffix = name_suffix
+        self.items = []
+        self.feed = self.items.append
+
+    def finish(self):
+        self.finish_fn(self.items, self.name_suffix)
+
+
+class _OrderedFeed:
+    """Feeds a consumer each file's items in ReorderBuffer key order, one file at a time.
+
+    A file's items are first sorted by reorder.reorder, then pass through one
+    window of reorder.window items kept across files, so lines a rotated
+    file holds from before the end of the previous file still come out in
+    order. An item later than the window is fed straight away and counted
+    in reorder.late, as in ReorderBuffer's own streams.
+    """
+
+    def __init__(self, consumer, reorder):
+        self.consumer = consumer
+        self.reorder = reorder
+        self._heap = []
+        self._count = 0
+        self._last_key = None
+
+    def feed_file(self, items):
+        heap = self._heap
+        key = self.reorder.key
+        window = self.reorder.window
+        feed = self.consumer.feed
+        for item in self.reorder.reorder(items):
+            item_key = key(item)
+            if self._last_key is not None and item_key < self._last_key:
+                self.reorder.late += 1
+                feed(item)
+                continue
+            self._count += 1
+            entry = (item_key, self._count, item)
+            if len(heap) < window:
+                heapq.heappush(heap, entry)
+            else:
+                self._last_key, _, released = heapq.heappushpop(heap, entry)
+                feed(released)
+
+    def finish(self):
+        self._heap.sort()
+        for _, _, item in self._heap:
+            self.consumer.feed(item)
+        self._heap.clear()
+        self.consumer.finish()
+
+
+class ScanStats:
+    def __init__(self):
+        self.lines_seen = 0
+        self.lines_decoded = 0
+
+    def add(self, other):
+        self.lines_seen += other.lines_seen
+        self.lines_decoded += other.lines_decoded
+
+    def summary(self):
+        return f"Single scan decoded {self.lines_decoded} of {self.lines_seen} lines"
+
+
+def scan_log_file(file_path, analyses):
+    """Read one log file once and return ({analysis name: [parsed items]}, ScanStats).
+
+    Each raw line is checked against every analysis' pre-filter and decoded
+    at most once. When several analyses take the same line each gets its own
+    shallow copy of the entry, since parse functions add keys to it. Only one
+    file's items are held; run_analyses feeds them on before the next file.
+    """
+    parsed = {analysis.name: [] for analysis in analyses}
+    stats = ScanStats()
+    with open_log_file(file_path) as file:
+        for line_num, line in enumerate(file, 1):
+            stats.lines_seen += 1
+            accepted = [analysis for analysis in analyses if analysis.accepts(line)]
+            if not accepted:
+                continue
+            try:
+                entry = json.loads(line.decode('utf-8', errors='replace'))
+            except json.JSONDecodeError as e:
+                logger.error(f"Error parsing JSON in {file_path}, line {line_num}: {e}")
+                continue
+            stats.lines_decoded += 1
+            for analysis in accepted:
+                item = analysis.parse_fn(entry if len(accepted) == 1 else dict(entry))
+                if item is not None:
+                    parsed[analysis.name].append(item)
+    return parsed, stats
+
+
+def run_analyses(file_paths, analyses, consumers, max_workers=1):
+    """Scan the files once in order, feeding each file's items to consumers[analysis.name]; return ScanStats.
+
+    consumers come from Analysis.start and are finished after the last file.
+    max_workers > 1 (or None = every CPU) scans rotated files in a process pool.
+    """
+    if max_workers == 1:
+        return _feed_scans(file_paths, map(scan_log_file, file_paths, repeat(analyses)), analyses, consumers)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return _feed_scans(file_paths, executor.map(scan_log_file, file_paths, repeat(analyses)), analyses, consumers)
+
+
+def _feed_scans(file_paths, scans, analyses, consumers):
+    feeds = {}
+    for analysis in analyses:
+        consumer = consumers[analysis.name]
+        feeds[analysis.name] = _OrderedFeed(consumer, analysis.reorder) if analysis.reorder is not None else consumer
+    stats = ScanStats()
+    for file_path, (parsed, file_stats) in zip(file_paths, scans):
+        logger.info(f"Scanned {file_path}")
+        for name, items in parsed.items():
+            feed = feeds[name]
+            if isinstance(feed, _OrderedFeed):
+                feed.feed_file(items)
+            else:
+                for item in items:
+                    feed.feed(item)
+        stats.add(file_stats)
+    for feed in feeds.values():
+        feed.finish()
+    return stats
@@ -1,85 +1,20 @@
-import os
 import json
-import re
-import gzip
 from datetime import datetime
 from collections import defaultdict
 
+from log_pipeline import LinePrefilter, load_parsed_log_data
+from message_parser import parse_handler_message
+from message_types import MessageTypeResolver
+
 FILTER_ONLY_EXECUTED = False
+PARALLEL_WORKERS = 1  # > 1 parses rotated files in a process pool, None = use all CPUs
 # ORDER_MESSAGE_TYPES = ['AuctionUpdateMessage','AddOrderMessage', 'OrderExecutedMessage', 'ModifyOrderMessage', 'DeleteOrderMessage']
 ORDER_MESSAGE_TYPES = ['AuctionUpdateMessage']
+LINE_PREFILTER = LinePrefilter(required=['message_handler'], any_of=ORDER_MESSAGE_TYPES)  # None = decode every line
+MESSAGE_TYPE_RESOLVER = MessageTypeResolver(ORDER_MESSAGE_TYPES)  # caller + common.<Type>{ token -> type
 
-# def load_log_data(file_path):
-#     log_entries = []
-#     if os.path.isfile(file_path) and file_path.endswith('.gz'):
-#         print(f"Reading log file: {file_path}")
-#         with gzip.open(file_path, 'rt') as file:
-#             for line in file:
-#                 log_entries.append(json.loads(line))
-#     elif os.path.isfile(file_path) and file_path.endswith('.log'):
-#         print(f"Reading log file: {file_path}")
-#         with open(file_path, 'r') as file:
-#             for line in file:
-#                 log_entries.append(json.loads(line))
-#     return log_entries
-
-def load_log_data(file_path):
-    log_entries = []
-    
-    if os.path.isfile(file_path) and file_path.endswith('.gz'):
-        print(f"Reading log file: {file_path}")
-        # Use encoding='utf-8' and errors='replace' to handle problematic characters
-        with gzip.open(file_path, 'rt', encoding='utf-8', errors='replace') as file:
-            for line in file:
-                try:
-                    log_entries.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON in file {file_path}: {e}")
-                    continue
-    
-    elif os.path.isfile(file_path) and file_path.endswith('.log'):
-        print(f"Reading log file: {file_path}")
-        # Also use encoding='utf-8' and errors='replace' for .log files
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
-            for line in file:
-                try:
-                    log_entries.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON in file {file_path}: {e}")
-                    continue
-    
-    return log_entries
-
-def load_all_log_data(folder_path):
-    log_entries = []
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
-        log_entries.extend(load_log_data(file_path))
-    return log_entries
-
-def extract_object(input_string):
-    match = re.search(r'\{(.*)\}', input_string)
-    if match:
-        content = match.group(1)
-        
-        # Convert the content into a dictionary
-        content_dict = {}
-        for item in content.split(', '):
-            key, value = item.split(':', 1)
-            key = key.strip()
-            value = value.strip().strip('"')
-            content_dict[key] = value
-
-        return content_dict
-    else:
-        return None
-    
-def get_message_type(input_string):
-    for order_message_type in ORDER_MESSAGE_TYPES:
-        if (order_message_type in input_string):
-            return order_message_type
-    
-    return None
+def get_message_type(caller, input_string):
+    return MESSAGE_TYPE_RESOLVER.resolve(caller, input_string)
 
 def convert_to_timestamp(time_string):
     dt_object = datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%SZ')
@@ -87,13 +22,14 @@ def convert_to_timestamp(time_string):
     
 def parse_log_entry(log):
     message = log['message']
+    caller = log.get('caller', '')
 
-    if 'Unsupported' in message or 'Err: redis: nil' in message or 'message_handler' not in log.get('caller', ''):
+    if 'Unsupported' in message or 'Err: redis: nil' in message or 'message_handler' not in caller:
         return None
     
     log['timestamp'] = convert_to_timestamp(log['time'])
 
-    message_type = get_message_type(message)
+    message_type = get_message_type(caller, message)
 
     if message_type is None:
         # print(f"Failed to get message type, {log}")
@@ -101,13 +37,15 @@ def parse_log_entry(log):
     
     log['message_type'] = message_type
     
-    parsed_message = extract_object(message)
+    handler_message = parse_handler_message(message)
 
-    if parsed_message is None:
+    if handler_message is None:
         print(f"Failed to parse message object, {log}")
         return None
     
-    log['parsed_message'] = parsed_message
+    log['parsed_message'] = {**handler_message.fields, **handler_message.header}
+    log['received_at'] = handler_message.received_at
+    log['executed_time_us'] = handler_message.executed_time_us
 
     return log
 
@@ -165,13 +103,7 @@ def filter_logs_contain_message_type(logs, message_type):
                 filtered_logs[symbol][order_id] = log_entries
     return filtered_logs
 
-def main():
-    log_data = load_all_log_data('abc')
-    print('Successfully loaded all log data')
-    
-    print('Parsing log data...')
-    parsed_log = list(filter(None, map(parse_log_entry, log_data)))
-
+def process_parsed_logs(parsed_log, name_suffix):
     print('Grouping logs by symbol and order id...')
     grouped_sorted_order_logs = group_and_sort_logs(parsed_log, reverse=True)
     # update_order_executed_messages(grouped_sorted_order_logs)
@@ -181,13 +113,19 @@ def main():
         logs_to_export = filter_logs_contain_message_type(grouped_sorted_order_logs, 'OrderExecutedMessage')
     else:
         logs_to_export = grouped_sorted_order_logs
-    # Get the current datetime string
-    datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     print("Exporting to json file...")
     # Write the result to a JSON file
-    with open(f'grouped_by_symbol_{datetime_str}.json', 'w') as f:
+    with open(f'grouped_by_symbol_{name_suffix}.json', 'w') as f:
         json.dump(logs_to_export, f, indent=4)
 
+def main():
+    print('Loading and parsing log data...')
+    parsed_log = load_parsed_log_data('abc', parse_log_entry, LINE_PREFILTER, PARALLEL_WORKERS, report=print)
+
+    # Get the current datetime string
+    datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    process_parsed_logs(parsed_log, datetime_str)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,487 @@
+import os
+import re
+import json
+import gzip
+import logging
+import pickle
+import heapq
+import hashlib
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_EXTENSIONS = ('.gz', '.log')
+PARSE_CACHE_VERSION = 4  # bump when the cached record layout changes
+ROTATION_TIME_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}\.\d{3})')
+
+
+class LinePrefilter:
+    """Cheap byte-level check run on every raw line before json.loads.
+
+    A line is kept only if it contains every `required` marker and, when
+    `any_of` is given, at least one of those markers. The markers must be
+    necessary conditions of the script's parse_log_entry, so the pre-filter
+    never drops a line the parser would have kept.
+    """
+
+    def __init__(self, required=(), any_of=()):
+        self.required = tuple(_to_bytes(marker) for marker in required)
+        self.any_of = tuple(_to_bytes(marker) for marker in any_of)
+        self.lines_seen = 0
+        self.lines_skipped = 0
+
+    def accepts(self, line):
+        for marker in self.required:
+            if marker not in line:
+                return False
+        if self.any_of:
+            for marker in self.any_of:
+                if marker in line:
+                    return True
+            return False
+        return True
+
+    def fresh_copy(self):
+        """Same markers with zeroed counters (used inside pool workers)."""
+        return LinePrefilter(self.required, self.any_of)
+
+    def summary(self):
+        return f"Pre-filter skipped {self.lines_skipped} of {self.lines_seen} lines before JSON decoding"
+
+
+class ParsedFileCache:
+    """On-disk cache of the parsed entries of each log file.
+
+    Entries are keyed by the file's absolute path, size and mtime plus a
+    caller-supplied tag describing the parser configuration, so a rotated
+    file is parsed once and re-runs that only change downstream filters
+    load the pickled result instead. A changed file gets a new key and its
+    stale cache entry is removed.
+
+    The entries are pickled as the parser returned them, not as columns:
+    every consumer needs the record objects back, and most of the bytes
+    are the raw log text that the exports keep.
+    """
+
+    suffix = '.pkl'
+
+    def __init__(self, cache_dir, tag=''):
+        self.cache_dir = cache_dir
+        self.tag = tag
+
+    def load(self, file_path):
+        cache_path = _sidecar_path(self.cache_dir, file_path, self.tag, self.suffix)
+        try:
+            with open(cache_path, 'rb') as f:
+                parsed = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Ignoring unreadable cache file {cache_path}: {e}")
+            return None
+        return parsed
+
+    def store(self, file_path, parsed):
+        cache_path = _prepare_sidecar(self.cache_dir, file_path, self.tag, self.suffix)
+        # Write to a temporary name first so concurrent workers never read a partial file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+
+class FileTimeIndex:
+    """Sidecar index of the min/max message Timestamp (microseconds) of each log file.
+
+    Written the first time a file is parsed and keyed like ParsedFileCache
+    (including its tag, since a parser that drops lines can narrow the span),
+    so later runs with a time filter can skip files without opening them.
+    """
+
+    suffix = '.time.json'
+
+    def __init__(self, index_dir, tag=''):
+        self.index_dir = index_dir
+        self.tag = tag
+
+    def load(self, file_path):
+        try:
+            with open(_sidecar_path(self.index_dir, file_path, self.tag, self.suffix), 'r') as f:
+                span = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return span['min_timestamp'], span['max_timestamp']
+
+    def store(self, file_path, min_timestamp, max_timestamp):
+        index_path = _prepare_sidecar(self.index_dir, file_path, self.tag, self.suffix)
+        with open(index_path, 'w') as f:
+            json.dump({'min_timestamp': min_timestamp, 'max_timestamp': max_timestamp}, f)
+
+
+class StateCheckpointStore:
+    """Pickled replay state at points in feed time, kept next to the parse cache.
+
+    A checkpoint taken at T holds the state after every message with
+    Timestamp <= T, along with the size, mtime and first Timestamp of each
+    log file the replay read. It is only used while every file that holds
+    messages at or before T is still exactly that file, so a growing active
+    .log only invalidates the checkpoints taken after its first message.
+
+    A checkpoint that can never be valid again (a log file it replayed has
+    rotated away or changed) is deleted by prune(), and at most
+    max_checkpoints are kept, dropping the earliest ones first.
+    """
+
+    suffix = '.ckpt.pkl'
+
+    def __init__(self, cache_dir, tag='', max_checkpoints=None):
+        tag_digest = hashlib.sha1(f"{PARSE_CACHE_VERSION}|{tag}".encode('utf-8')).hexdigest()[:8]
+        self.checkpoint_dir = os.path.join(cache_dir, f"checkpoints.{tag_digest}")
+        self.max_checkpoints = max_checkpoints
+
+    def times(self):
+        """Timestamps of the stored checkpoints, ascending."""
+        try:
+            names = os.listdir(self.checkpoint_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-len(self.suffix)]) for name in names if name.endswith(self.suffix))
+
+    def store(self, timestamp, state, file_spans):
+        """Save state as the checkpoint at timestamp; file_spans is {file_path: (min, max) Timestamp or None}."""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        files = {os.path.abspath(file_path): _file_signature(file_path) + (span[0],)
+                 for file_path, span in file_spans.items() if span is not None}
+        checkpoint_path = os.path.join(self.checkpoint_dir, f"{timestamp}{self.suffix}")
+        tmp_path = f"{checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            # The file list goes first so a stale checkpoint is rejected without unpickling its state
+            pickle.dump({'timestamp': timestamp, 'files': files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, checkpoint_path)
+        self._trim()
+
+    def prune(self):
+        """Delete the checkpoints whose replayed files are gone or changed, then trim to max_checkpoints.
+
+        Returns how many were deleted.
+        """
+        removed = 0
+        for checkpoint_time in self.times():
+            checkpoint_path = os.path.join(self.checkpoint_dir, f"{checkpoint_time}{self.suffix}")
+            try:
+                with open(checkpoint_path, 'rb') as f:
+                    header = pickle.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, pickle.UnpicklingError, EOFError):
+                header = None
+            if header is None or not _checkpoint_files_unchanged(header):
+                removed += _remove_file(checkpoint_path)
+        return removed + self._trim()
+
+    def _trim(self):
+        times = self.times()
+        if self.max_checkpoints is None or len(times) <= self.max_checkpoints:
+            return 0
+        return sum(_remove_file(os.path.join(self.checkpoint_dir, f"{checkpoint_time}{self.suffix}"))
+                   for checkpoint_time in times[:len(times) - self.max_checkpoints])
+
+    def load_before(self, timestamp, file_spans):
+        """Return (checkpoint_time, state) for the latest valid checkpoint at or before timestamp, or None.
+
+        file_spans is {file_path: (min, max) Timestamp or None} for the log files as they are now.
+        """
+        current = {os.path.abspath(file_path): (_file_signature(file_path), span[0])
+                   for file_path, span in file_spans.items() if span is not None}
+        for checkpoint_time in reversed(self.times()):
+            if checkpoint_time > timestamp:
+                continue
+            checkpoint_path = os.path.join(self.checkpoint_dir, f"{checkpoint_time}{self.suffix}")
+            try:
+                with open(checkpoint_path, 'rb') as f:
+                    header = pickle.load(f)
+                    if not _checkpoint_matches(header, current):
+                        continue
+                    return checkpoint_time, pickle.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+        return None
+
+
+def _checkpoint_matches(header, current):
+    checkpoint_time = header['timestamp']
+    files = header['files']
+    for file_path, (size, mtime_ns, min_timestamp) in files.items():
+        if min_timestamp <= checkpoint_time and (file_path not in current or current[file_path][0] != (size, mtime_ns)):
+            return False
+    for file_path, (signature, min_timestamp) in current.items():
+        if min_timestamp <= checkpoint_time and (file_path not in files or files[file_path][:2] != signature):
+            return False
+    return True
+
+
+def _checkpoint_files_unchanged(header):
+    # Only the files holding messages up to the checkpoint decide whether it can still be used
+    checkpoint_time = header['timestamp']
+    for file_path, (size, mtime_ns, min_timestamp) in header['files'].items():
+        if min_timestamp > checkpoint_time:
+            continue
+        try:
+            if _file_signature(file_path) != (size, mtime_ns):
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return 1
+
+
+def _file_signature(file_path):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ReorderBuffer:
+    """Bounded heap that puts a nearly ordered stream back into key order.
+
+    Each rotated file is written close to feed order, with a few lines
+    logged slightly late by another goroutine. Up to `window` items are held
+    back and released smallest key first, so any item at most `window`
+    places late comes out in order. An item even later than that is
+    released straight away and counted in `late`. One buffer can reorder
+    several streams; each reorder() call keeps its own heap.
+    """
+
+    def __init__(self, key, window=1024):
+        self.key = key
+        self.window = window
+        self.late = 0
+
+    def reorder(self, items):
+        """Iterate items in key order.
+
+        A file already loaded as a list is sorted outright instead: timsort
+        on nearly ordered data is linear and runs in C, so the window only
+        matters for real streams.
+        """
+        if isinstance(items, list):
+            return iter(sorted(items, key=self.key))
+        return self._reorder_stream(items)
+
+    def _reorder_stream(self, items):
+        heap = []
+        last_key = None
+        key = self.key
+        for count, item in enumerate(items):
+            item_key = key(item)
+            if last_key is not None and item_key < last_key:
+                self.late += 1
+                yield item
+                continue
+            entry = (item_key, count, item)
+            if len(heap) < self.window:
+                heapq.heappush(heap, entry)
+            else:
+                last_key, _, released = heapq.heappushpop(heap, entry)
+                yield released
+        heap.sort()
+        for _, _, item in heap:
+            yield item
+
+    def summary(self):
+        return f"Reorder buffer (window {self.window}) released {self.late} late entries out of order"
+
+
+def merge_ordered_streams(streams, reorder_buffer):
+    """Heap-based k-way merge of per-file streams, each first put in order by reorder_buffer."""
+    return heapq.merge(*(reorder_buffer.reorder(stream) for stream in streams), key=reorder_buffer.key)
+
+
+def _sidecar_prefix(file_path, tag):
+    tag_digest = hashlib.sha1(f"{PARSE_CACHE_VERSION}|{tag}".encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.basename(file_path)}.{tag_digest}."
+
+
+def _sidecar_path(sidecar_dir, file_path, tag, suffix):
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(sidecar_dir, f"{_sidecar_prefix(file_path, tag)}{digest}{suffix}")
+
+
+def _prepare_sidecar(sidecar_dir, file_path, tag, suffix):
+    """Return the sidecar path for file_path, removing entries left from older versions of the file."""
+    os.makedirs(sidecar_dir, exist_ok=True)
+    sidecar_path = _sidecar_path(sidecar_dir, file_path, tag, suffix)
+    prefix = _sidecar_prefix(file_path, tag)
+    for name in os.listdir(sidecar_dir):
+        stale_path = os.path.join(sidecar_dir, name)
+        if name.startswith(prefix) and name.endswith(suffix) and stale_path != sidecar_path:
+            os.remove(stale_path)
+    return sidecar_path
+
+
+def _to_bytes(marker):
+    return marker.encode('utf-8') if isinstance(marker, str) else marker
+
+
+def log_file_rotation_micros(file_path):
+    """Rotation time (UTC, microseconds) encoded in a name like cboe-feed-connector-2025-04-09T03-00-05.338.log.gz."""
+    match = ROTATION_TIME_PATTERN.search(os.path.basename(file_path))
+    if not match:
+        return None
+    rotated_at = datetime.strptime(match.group(1), '%Y-%m-%dT%H-%M-%S.%f').replace(tzinfo=timezone.utc)
+    return int(rotated_at.timestamp()) * 1_000_000 + rotated_at.microsecond
+
+
+def select_log_files_by_time(file_paths, start_micros, end_micros, time_index=None, keep_history=True):
+    """Drop rotated files that cannot contain messages in start_micros..end_micros.
+
+    A file is rotated after its last line is written and messages are logged
+    after their exchange Timestamp, so a file rotated before start_micros
+    only holds earlier messages. Files whose indexed min Timestamp is past
+    end_micros end the selection, since later rotations carry later feed
+    data. Earlier files are kept unless keep_history is False, because the
+    order enrichment needs the AddOrder/Modify history that precedes the window.
+    So with keep_history a short window late in the day still reads nearly
+    every file; only a replay state checkpoint from an earlier run (see
+    StateCheckpointStore) lets the caller start closer to the window.
+    """
+    selected = []
+    for file_path in file_paths:
+        span = time_index.load(file_path) if time_index is not None else None
+        if span is not None and span[0] > end_micros:
+            break
+        if not keep_history:
+            rotated_at = log_file_rotation_micros(file_path)
+            if (rotated_at is not None and rotated_at < start_micros) or (span is not None and span[1] < start_micros):
+                continue
+        selected.append(file_path)
+    return selected
+
+
+def list_log_files(folder_path):
+    """Return the .gz/.log files in a folder, sorted by name (rotation order)."""
+    if not os.path.isdir(folder_path):
+        logger.error(f"Folder does not exist: {folder_path}")
+        return []
+    file_paths = []
+    for file_name in sorted(os.listdir(folder_path)):
+        file_path = os.path.join(folder_path, file_name)
+        if os.path.isfile(file_path) and file_name.endswith(LOG_FILE_EXTENSIONS):
+            file_paths.append(file_path)
+    return file_paths
+
+
+def open_log_file(file_path):
+    """Open a .gz or plain .log file for binary line reading."""
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def iter_log_entries(file_path, prefilter=None):
+    """Yield the decoded JSON entries of one log file, one line at a time.
+
+    When a LinePrefilter is given, lines it rejects are counted and skipped
+    without being decoded.
+    """
+    with open_log_file(file_path) as file:
+        for line_num, line in enumerate(file, 1):
+            if prefilter is not None:
+                prefilter.lines_seen += 1
+                if not prefilter.accepts(line):
+                    prefilter.lines_skipped += 1
+                    continue
+            try:
+                # errors='replace' keeps lines with problematic characters readable
+                yield json.loads(line.decode('utf-8', errors='replace'))
+            except json.JSONDecodeError as e:
+                logger.error(f"Error parsing JSON in {file_path}, line {line_num}: {e}")
+
+
+def iter_folder_log_entries(folder_path, prefilter=None):
+    """Yield the decoded JSON entries of every log file in a folder."""
+    for file_path in list_log_files(folder_path):
+        yield from iter_log_entries(file_path, prefilter)
+
+
+def parse_log_file(file_path, parse_fn, prefilter=None, cache=None):
+    """Decode one log file and return only the entries parse_fn keeps.
+
+    With a ParsedFileCache the result is loaded from / saved to disk.
+    """
+    if cache is not None:
+        parsed = cache.load(file_path)
+        if parsed is not None:
+            return parsed
+    entries = iter_log_entries(file_path, prefilter)
+    parsed = [entry for entry in map(parse_fn, entries) if entry is not None]
+    if cache is not None:
+        cache.store(file_path, parsed)
+    return parsed
+
+
+def iter_parsed_log_files(file_paths, parse_fn, prefilter=None, max_workers=1, cache=None, report=logger.info):
+    """Parse log files in order, yielding (file_path, parsed_entries).
+
+    max_workers == 1 parses one file at a time in this process, so a caller
+    that stops early never reads the remaining files; any other value goes
+    through parse_log_files_parallel. Progress lines are passed to report.
+    """
+    if max_workers == 1:
+        for file_path in file_paths:
+            report(f"Reading log file: {file_path}")
+            yield file_path, parse_log_file(file_path, parse_fn, prefilter, cache)
+    else:
+        for file_path, parsed in parse_log_files_parallel(file_paths, parse_fn, max_workers, prefilter, cache):
+            report(f"Parsed {len(parsed)} entries from {file_path}")
+            yield file_path, parsed
+
+
+def load_parsed_log_data(folder_path, parse_fn, prefilter=None, max_workers=1, cache=None, report=logger.info):
+    """Parse every log file of a folder into one list, in file order.
+
+    The pre-filter summary is passed to report once all files are read.
+    """
+    parsed_log = []
+    for _, parsed in iter_parsed_log_files(list_log_files(folder_path), parse_fn, prefilter, max_workers, cache, report):
+        parsed_log.extend(parsed)
+    if prefilter is not None:
+        report(prefilter.summary())
+    return parsed_log
+
+
+def _parse_log_file_job(file_path, parse_fn, prefilter, cache):
+    local_prefilter = prefilter.fresh_copy() if prefilter is not None else None
+    parsed = parse_log_file(file_path, parse_fn, local_prefilter, cache)
+    if local_prefilter is None:
+        return parsed, 0, 0
+    return parsed, local_prefilter.lines_seen, local_prefilter.lines_skipped
+
+
+def parse_log_files_parallel(file_paths, parse_fn, max_workers=None, prefilter=None, cache=None):
+    """Parse log files in a process pool, yielding (file_path, parsed_entries) in file order.
+
+    parse_fn must be a module-level function so it can be pickled to the workers;
+    max_workers=None uses every CPU. Pre-filter counters from the workers are
+    added to the given prefilter.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_parse_log_file_job, file_paths, repeat(parse_fn), repeat(prefilter), repeat(cache))
+        for file_path, (parsed, lines_seen, lines_skipped) in zip(file_paths, results):
+            if prefilter is not None:
+                prefilter.lines_seen += lines_seen
+                prefilter.lines_skipped += lines_skipped
+            yield file_path, parsed
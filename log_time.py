@@ -0,0 +1,133 @@
+from bisect import bisect_right
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# The exchange's local time zone: candle buckets follow Sydney wall-clock time
+EXCHANGE_TIMEZONE = ZoneInfo('Australia/Sydney')
+
+# Distinct 'time' strings kept by the memo; log lines arrive in time order, so only the recent ones are hit again
+TIME_MEMO_SIZE = 4096
+
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=64)
+def _utc_day_start(date_text):
+    """'2025-05-13' -> POSIX seconds at 00:00 UTC that day."""
+    year, month, day = int(date_text[0:4]), int(date_text[5:7]), int(date_text[8:10])
+    return (datetime(year, month, day).toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+@lru_cache(maxsize=TIME_MEMO_SIZE)
+def parse_log_time(time_string):
+    """Log 'time' field ('2025-05-13T04:09:58Z') -> POSIX timestamp (float).
+
+    The zap encoder always writes the fixed 20-character UTC layout, which is
+    read by slicing; anything else (an explicit offset) goes through strptime.
+    Same result as datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S%z').timestamp(),
+    and raises ValueError the same way on a malformed value.
+    """
+    if len(time_string) == 20 and time_string[19] == 'Z' and time_string[10] == 'T' \
+            and time_string[13] == ':' and time_string[16] == ':':
+        try:
+            hour, minute, second = int(time_string[11:13]), int(time_string[14:16]), int(time_string[17:19])
+            if hour < 24 and minute < 60 and second < 60:
+                return float(_utc_day_start(time_string[:10]) + hour * 3600 + minute * 60 + second)
+        except ValueError:
+            pass
+    return datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S%z').timestamp()
+
+
+_HOUR_SECONDS = 3600
+# Margin kept around the requested span, so a bucket end up to a day past the last timestamp is still covered
+_TABLE_MARGIN_SECONDS = 2 * 86400
+
+
+def _utc_offset_seconds(zone, second):
+    return int(datetime.fromtimestamp(second, timezone.utc).astimezone(zone).utcoffset().total_seconds())
+
+
+class UtcOffsetTable:
+    """UTC offset transitions of a time zone over a span of days, so local times need only integer arithmetic.
+
+    Built once for the timestamps being processed (plus two days each side):
+    the zone is sampled hourly and each change of offset is narrowed to the
+    second, which gives the AEST/AEDT switches of Australia/Sydney. After
+    that, local_micros/bucket are a bisect over the few transitions and an
+    add, and wall_to_utc_micros resolves a wall time the way ZoneInfo does
+    for fold=0 (a repeated time reads as the first one, a skipped time with
+    the offset before the switch).
+
+    starts       -- UTC microseconds at which each offset takes effect (the first is the span start)
+    offsets      -- UTC offset in microseconds from each of starts
+    wall_starts  -- the same instants as Sydney wall time under the fold=0 rule
+    """
+
+    def __init__(self, first_us, last_us, zone=EXCHANGE_TIMEZONE):
+        self.zone = zone
+        first_second = first_us // 1_000_000 - _TABLE_MARGIN_SECONDS
+        self.first_second = first_second - first_second % _HOUR_SECONDS
+        self.last_second = last_us // 1_000_000 + _TABLE_MARGIN_SECONDS
+        starts = [self.first_second]
+        offsets = [_utc_offset_seconds(zone, self.first_second)]
+        hour = self.first_second
+        while hour < self.last_second:
+            next_hour = hour + _HOUR_SECONDS
+            offset = _utc_offset_seconds(zone, next_hour)
+            if offset != offsets[-1]:
+                # First second of the hour with the new offset
+                low, high = hour, next_hour
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if _utc_offset_seconds(zone, middle) == offset:
+                        high = middle
+                    else:
+                        low = middle
+                starts.append(high)
+                offsets.append(offset)
+            hour = next_hour
+        self.starts = [second * 1_000_000 for second in starts]
+        self.offsets = [offset * 1_000_000 for offset in offsets]
+        # ZoneInfo's fold=0 wall time of a switch uses the larger of the two offsets around it
+        self.wall_starts = [self.starts[0] + self.offsets[0]] + [
+            start + max(before, after) for start, before, after in zip(self.starts[1:], self.offsets, self.offsets[1:])]
+
+    def covers(self, first_us, last_us):
+        return self.first_second * 1_000_000 <= first_us and last_us < self.last_second * 1_000_000
+
+    def offset_micros(self, timestamp_us):
+        if not self.first_second * 1_000_000 <= timestamp_us < self.last_second * 1_000_000:
+            raise ValueError(f"{timestamp_us} is outside the UTC offset table")
+        return self.offsets[bisect_right(self.starts, timestamp_us) - 1]
+
+    def local_micros(self, timestamp_us):
+        """UTC microseconds -> wall-clock microseconds in the zone."""
+        return timestamp_us + self.offset_micros(timestamp_us)
+
+    def bucket(self, timestamp_us, size_us):
+        """Index of the local minute/hour/day (size_us long) containing timestamp_us; bucket * size_us is its wall start."""
+        return self.local_micros(timestamp_us) // size_us
+
+    def has_transition(self, first_us, last_us):
+        """True when the offset changes somewhere in first_us..last_us."""
+        return bisect_right(self.starts, first_us) != bisect_right(self.starts, last_us)
+
+    def wall_to_utc_micros(self, local_us):
+        """Wall-clock microseconds in the zone -> UTC microseconds, like datetime(..., tzinfo=zone, fold=0)."""
+        position = bisect_right(self.wall_starts, local_us) - 1
+        if position < 0:
+            raise ValueError(f"{local_us} is outside the UTC offset table")
+        return local_us - self.offsets[position]
+
+
+_offset_tables = []
+
+
+def exchange_offset_table(first_us, last_us):
+    """A UtcOffsetTable of EXCHANGE_TIMEZONE covering first_us..last_us, reusing the last one built when it does."""
+    if _offset_tables and _offset_tables[-1].covers(first_us, last_us):
+        return _offset_tables[-1]
+    table = UtcOffsetTable(first_us, last_us)
+    _offset_tables[:] = [table]
+    return table
@@ -0,0 +1,390 @@
+import re
+import sys
+from collections import namedtuple
+
+# Stops a bare (unquoted) Go %#v token: field separator, end of struct, start of a composite or "(nil)"
+_TOKEN_END = re.compile(r'[,{}()]')
+
+# Go time.Duration.String() components ('383.549µs', '10m12.478033831s'), scaled to microseconds
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ns|µs|us|ms|s|m|h)')
+_DURATION_SCALE = {'ns': 0.001, 'µs': 1.0, 'us': 1.0, 'ms': 1000.0, 's': 1_000_000.0, 'm': 60_000_000.0, 'h': 3_600_000_000.0}
+
+# One level of a DEPTH line's Ask/Bid map: "<index>":models.Trade{Symbol:..., Side:..., Quantity:..., NumberOfTrades:..., Price:..., Exchange:..., Time:...}
+_DEPTH_LEVEL = re.compile(r'"(\d+)":models\.Trade\{Symbol:"[^"]*", Side:"(Ask|Bid)", Quantity:(-?\d+), '
+                          r'NumberOfTrades:(-?\d+), Price:([^,]+), Exchange:"[^"]*", Time:(-?\d+)\}')
+_DEPTH_TAIL = re.compile(r', Time:(-?\d+), IsChanged:(true|false)\}')
+
+# 'Data channel full, dropping message from <addr> (length: N)' from the UDP reader
+_DROP_MESSAGE = re.compile(r'Data channel full, dropping message from (\S+) \(length: (\d+)\)')
+# The connector's own Redis sequence check: 'SEQUENCE: <date>:<unit>:<seq> - ...', 'SEQUENCE: <date>:<unit>:<last>:<seq> - ...'
+_SEQUENCE_CHECK = re.compile(r'SEQUENCE: \d{4}-\d{2}-\d{2}:(\d+):(\d+)(?::(\d+))? - '
+                             r'(?:(Get latest sequence from Redis)|(No missing packets)|Missing packets: (\d+))')
+_SEQUENCE_DUPLICATE = re.compile(r'Sequence: \{\d{4}-\d{2}-\d{2} (\d+) (\d+)\} - IsDuplicate: (true|false)')
+
+# Value patterns for the compiled per-type layouts. Single negated characters keep the regex engine in its
+# fast loops; a quoted Go string keeps its escapes as written, one holding an escaped quote does not match
+_QUOTED_VALUE = r'"([^"]*)"'
+_BARE_VALUE = r'([^,]*)'
+# The rest of the usual line after the struct: header, ReceivedAt, ExecutedTime in µs, then any flags
+_LINE_TAIL = (r'\} - common\.SequencedUnitHeader\{HdrLength:(-?\d+), HdrCount:(-?\d+), HdrUnit:(-?\d+), HdrSequence:(-?\d+)\}'
+              r' - ReceivedAt: (\S+ \S+) - ExecutedTime: ([\d.]+)µs(?: - (.*))?\Z')
+
+_HEADER_KEYS = ('HdrLength', 'HdrCount', 'HdrUnit', 'HdrSequence')
+
+
+class HandlerMessage(namedtuple('HandlerMessage', ['udp_addr', 'message_type', 'fields', 'header_values',
+                                                   'received_at', 'executed_time_us', 'flags'])):
+    """One message_handler.go line split into its parts.
+
+    fields        -- the common.<Type>{...} struct; values keep the text Go printed, without quotes
+    header_values -- the common.SequencedUnitHeader{...} values in (HdrLength, HdrCount, HdrUnit, HdrSequence)
+                     order, as logged; None when the line has no header, a dict of ints for any other key set
+    header        -- the same header as a dict of ints, converted when read
+    received_at   -- the ReceivedAt text ('2025-05-13 13:25:17.236'), local exchange time
+    executed_time_us -- ExecutedTime converted to microseconds (float)
+    flags         -- any trailing ' - XXX' markers such as 'DUPLICATED'
+    """
+
+    __slots__ = ()
+
+    @property
+    def header(self):
+        values = self.header_values
+        if values is None:
+            return {}
+        if isinstance(values, dict):
+            return dict(values)
+        return {'HdrLength': int(values[0]), 'HdrCount': int(values[1]), 'HdrUnit': int(values[2]),
+                'HdrSequence': int(values[3])}
+
+
+DepthSnapshot = namedtuple('DepthSnapshot', ['channel', 'symbol', 'time', 'asks', 'bids', 'is_changed'])
+DepthSnapshot.__doc__ = """One 'DEPTH: <channel> - <symbol> - models.Depth{...}' line: the book the connector published.
+
+asks/bids -- [(price, quantity, order_count, time), ...] by level index, best first
+             (NumberOfTrades in models.Trade is the number of orders at the level)
+time      -- Depth.Time, the Timestamp of the message that produced this book
+"""
+
+
+SequenceCheck = namedtuple('SequenceCheck', ['kind', 'unit', 'sequence', 'last_sequence', 'missing'])
+SequenceCheck.__doc__ = """One line of the connector's Redis sequence check.
+
+kind          -- 'redis_lookup'  'SEQUENCE: <date>:<unit>:<seq> - Get latest sequence from Redis'
+                 'in_order'      'SEQUENCE: <date>:<unit>:<last>:<seq> - No missing packets'
+                 'missing'       'SEQUENCE: <date>:<unit>:<last>:<seq> - Missing packets: N'
+                 'duplicate'     'Sequence: {<date> <unit> <seq>} - IsDuplicate: true'
+                 'not_duplicate' 'Sequence: {<date> <unit> <seq>} - IsDuplicate: false'
+last_sequence -- the latest sequence read back from Redis (in_order/missing only, else None)
+missing       -- N of 'Missing packets: N' (0 for the other kinds)
+"""
+
+
+class GoStructParseError(ValueError):
+    pass
+
+
+class _MessageLayout:
+    """Compiled regex for one message type's usual line, with the fields learned from the first line of that type.
+
+    The regex covers the whole line, so every part sits at a fixed place in
+    match.groups(): UDPAddr first, the struct fields in field_keys order, then
+    HdrLength, HdrCount, HdrUnit, HdrSequence, ReceivedAt, ExecutedTime and
+    the trailing flags text (None without flags) as the last seven.
+    """
+
+    __slots__ = ('regex', 'message_type', 'field_keys')
+
+    def __init__(self, regex, message_type, field_keys):
+        self.regex = regex
+        self.message_type = message_type
+        self.field_keys = field_keys
+
+
+# 'common.<Type>' -> _MessageLayout, or False when the type has nested values and always uses the tokenizer
+_LAYOUTS = {}
+
+
+def _find_string_end(text, start):
+    """Index of the closing quote of a Go quoted string whose body starts at `start`."""
+    end = text.find('"', start)
+    while end != -1:
+        backslashes = 0
+        k = end - 1
+        while text[k] == '\\':
+            backslashes += 1
+            k -= 1
+        if backslashes % 2 == 0:
+            return end
+        end = text.find('"', end + 1)
+    raise GoStructParseError(f"Unterminated string at {start}")
+
+
+def parse_value(text, i):
+    """Parse one Go %#v value starting at text[i]; return (value, index after it).
+
+    Scalars are returned as the text Go printed (quoted strings without their
+    quotes, Go escape sequences such as '\\x00' kept as written). Structs and
+    maps become dicts, nil maps/slices/pointers become None.
+    """
+    if text[i] == '"':
+        end = _find_string_end(text, i + 1)
+        return text[i + 1:end], end + 1
+    match = _TOKEN_END.search(text, i)
+    if match is None:
+        return text[i:].strip(), len(text)
+    j = match.start()
+    stop = text[j]
+    if stop == '{':
+        if text.startswith('map[', i):
+            return _parse_map_body(text, j + 1)
+        return parse_struct_body(text, j + 1)
+    if stop == '(':
+        close = text.find(')', j)
+        if close == -1:
+            raise GoStructParseError(f"Unterminated '(' at {j}")
+        inner = text[j + 1:close]
+        return (None if inner == 'nil' else inner), close + 1
+    return text[i:j], j
+
+
+def parse_struct_body(text, i):
+    """Parse 'Key:value, Key:value}' starting just after '{'; return (dict, index after '}')."""
+    fields = {}
+    if text[i] == '}':
+        return fields, i + 1
+    while True:
+        colon = text.find(':', i)
+        if colon == -1:
+            raise GoStructParseError(f"Missing ':' after {i}")
+        key = text[i:colon]
+        value, i = parse_value(text, colon + 1)
+        fields[key] = value
+        if text[i] == '}':
+            return fields, i + 1
+        if text[i] != ',':
+            raise GoStructParseError(f"Unexpected {text[i]!r} at {i}")
+        i += 2  # ', '
+
+
+def _parse_map_body(text, i):
+    entries = {}
+    if text[i] == '}':
+        return entries, i + 1
+    while True:
+        key, i = parse_value(text, i)
+        if text[i] != ':':
+            raise GoStructParseError(f"Missing ':' in map at {i}")
+        value, i = parse_value(text, i + 1)
+        entries[key] = value
+        if text[i] == '}':
+            return entries, i + 1
+        if text[i] != ',':
+            raise GoStructParseError(f"Unexpected {text[i]!r} at {i}")
+        i += 2  # ', '
+
+
+def _parse_flat_struct_body(text, i):
+    """Fast path for structs without nested values or separators inside strings.
+
+    Returns (dict, index after '}'), or None when the general tokenizer is needed.
+    """
+    close = text.find('}', i)
+    if close == -1:
+        return None
+    body = text[i:close]
+    if not body:
+        return {}, close + 1
+    if '{' in body or '(' in body or '\\"' in body:
+        return None
+    fields = {}
+    for item in body.split(', '):
+        key, sep, value = item.partition(':')
+        if not sep:
+            return None
+        if value[:1] == '"':
+            value = value[1:-1]
+            # A string holding ', ' or '"' would have been cut in the wrong place
+            if not item.endswith('"') or '"' in value:
+                return None
+        fields[key] = value
+    return fields, close + 1
+
+
+def _parse_struct(text, i):
+    parsed = _parse_flat_struct_body(text, i)
+    if parsed is None:
+        return parse_struct_body(text, i)
+    return parsed
+
+
+def _build_layout(message, type_start, brace):
+    """Compile a _MessageLayout from a flat sample line, or return None."""
+    parsed = _parse_flat_struct_body(message, brace + 1)
+    if parsed is None or not all(key.isidentifier() for key in parsed[0]):
+        return None
+    close = parsed[1] - 1
+    field_patterns = []
+    for item in message[brace + 1:close].split(', ') if parsed[0] else ():
+        key, _, value = item.partition(':')
+        field_patterns.append(f"{key}:" + (_QUOTED_VALUE if value[:1] == '"' else _BARE_VALUE))
+    pattern = r'UDPAddr: ([^ ]*) - ' + re.escape(message[type_start:brace + 1]) + ', '.join(field_patterns) + _LINE_TAIL
+    return _MessageLayout(re.compile(pattern), message[type_start + 7:brace], tuple(parsed[0]))
+
+
+def parse_duration_us(text):
+    """'383.549µs' -> 383.549, '10m12.5s' -> 612500000.0 (microseconds)."""
+    if text.endswith('µs'):
+        try:
+            return float(text[:-2])
+        except ValueError:
+            pass
+    parts = _DURATION_PART.findall(text)
+    if not parts:
+        raise GoStructParseError(f"Unknown duration {text!r}")
+    return sum(float(amount) * _DURATION_SCALE[unit] for amount, unit in parts)
+
+
+def _parse_tail(parts, received_at, executed_time_us, flags):
+    """Read the ' - Key: value' parts after the structs; return (received_at, executed_time_us), appending other parts to flags."""
+    for part in parts:
+        if part.startswith('ReceivedAt: '):
+            received_at = part[12:]
+        elif part.startswith('ExecutedTime: '):
+            executed_time_us = parse_duration_us(part[14:])
+        else:
+            flags.append(part)
+    return received_at, executed_time_us
+
+
+def parse_handler_message(message):
+    """Parse a message_handler.go log message.
+
+    'UDPAddr: <addr> - common.<Type>{...} - common.SequencedUnitHeader{...}
+     - ReceivedAt: <time> - ExecutedTime: <duration>[ - FLAG...]'
+
+    The first line of each message type compiles a regex for the whole
+    line, so later lines of that type are matched and split in one C-level
+    call and each part is read from its fixed group. Lines that do not fit
+    the layout (no header, an ExecutedTime not in µs, an escaped quote
+    inside a string) and types with nested values go through the character
+    tokenizer (parse_struct_body).
+
+    The header is kept as the logged text and only converted to ints when
+    read, through HandlerMessage.header or the caller's own int().
+
+    Returns a HandlerMessage, or None when the message has no common.<Type>{ struct.
+    """
+    type_start = message.find('common.')
+    if type_start == -1:
+        return None
+    brace = message.find('{', type_start)
+    if brace == -1:
+        return None
+    layout = _LAYOUTS.get(message[type_start:brace])
+    match = layout.regex.match(message) if layout else None
+    if match is None:
+        if layout is None:
+            _LAYOUTS[message[type_start:brace]] = _build_layout(message, type_start, brace) or False
+        return _parse_handler_message_tokens(message)
+    groups = match.groups()
+    received_at = groups[-3]
+    executed_time_us = float(groups[-2])
+    flags = []
+    if groups[-1] is not None:
+        received_at, executed_time_us = _parse_tail(groups[-1].split(' - '), received_at, executed_time_us, flags)
+    # zip stops at the last field key, before the header groups; tuple.__new__ skips the namedtuple's argument handling
+    return tuple.__new__(HandlerMessage, (groups[0], layout.message_type, dict(zip(layout.field_keys, groups[1:])),
+                                          groups[-7:-3], received_at, executed_time_us, flags))
+
+
+def _parse_handler_message_tokens(message):
+    """parse_handler_message for the lines a layout regex does not match, one character token at a time."""
+    udp_addr = None
+    i = 0
+    if message.startswith('UDPAddr: '):
+        sep = message.find(' - ', 9)
+        if sep == -1:
+            return None
+        udp_addr = message[9:sep]
+        i = sep + 3
+    type_start = message.find('common.', i)
+    if type_start == -1:
+        return None
+    brace = message.find('{', type_start)
+    if brace == -1:
+        return None
+    message_type = message[type_start + 7:brace]
+
+    fields, i = _parse_struct(message, brace + 1)
+    header_values = None
+    if message.startswith(' - common.SequencedUnitHeader{', i):
+        header_text, i = _parse_struct(message, i + 30)
+        try:
+            header = {key: int(value) for key, value in header_text.items()}
+        except (TypeError, ValueError):
+            raise GoStructParseError(f"Non-integer SequencedUnitHeader {header_text!r}")
+        header_values = tuple(header.values()) if tuple(header) == _HEADER_KEYS else header
+    received_at = None
+    executed_time_us = None
+    flags = []
+    if message.startswith(' - ', i):
+        # Remaining ' - Key: value' parts hold no structs, so a plain split is enough
+        received_at, executed_time_us = _parse_tail(message[i + 3:].split(' - '), received_at, executed_time_us, flags)
+    return HandlerMessage(udp_addr, message_type, fields, header_values, received_at, executed_time_us, flags)
+
+
+def parse_depth_message(message):
+    """Parse a 'DEPTH: qh-depth:asx-15 - KAR - models.Depth{...}' log message into a DepthSnapshot.
+
+    The Ask/Bid levels are read with one findall over the message instead of
+    the generic tokenizer. Returns None for the empty Depth{Symbol:""} lines
+    and for anything that is not a DEPTH line.
+    """
+    if not message.startswith('DEPTH: '):
+        return None
+    channel_end = message.find(' - ', 7)
+    symbol_end = message.find(' - models.Depth{', channel_end + 3)
+    if channel_end == -1 or symbol_end == -1:
+        return None
+    symbol = message[channel_end + 3:symbol_end]
+    if not symbol:
+        return None
+    body_start = symbol_end + 16
+    # Depth.Time is the last ', Time:' of the struct, after both maps
+    tail = _DEPTH_TAIL.match(message, message.rfind(', Time:'))
+    if tail is None:
+        raise GoStructParseError(f"DEPTH line without Time/IsChanged: {message[:120]!r}")
+    levels = {'Ask': [], 'Bid': []}
+    for index, side, quantity, order_count, price, level_time in _DEPTH_LEVEL.findall(message, body_start, tail.start()):
+        levels[side].append((int(index), float(price), int(quantity), int(order_count), int(level_time)))
+    asks = [level[1:] for level in sorted(levels['Ask'])]
+    bids = [level[1:] for level in sorted(levels['Bid'])]
+    return DepthSnapshot(message[7:channel_end], sys.intern(symbol), int(tail.group(1)), asks, bids, tail.group(2) == 'true')
+
+
+def parse_drop_message(message):
+    """'Data channel full, dropping message from <addr> (length: N)' -> (addr, N), or None for any other line."""
+    match = _DROP_MESSAGE.match(message)
+    if match is None:
+        return None
+    return sys.intern(match.group(1)), int(match.group(2))
+
+
+def parse_sequence_check(message):
+    """Parse a 'SEQUENCE: ...' or 'Sequence: {...} - IsDuplicate:' line into a SequenceCheck, or None."""
+    match = _SEQUENCE_CHECK.match(message)
+    if match is not None:
+        unit, first, second, lookup, in_order, missing = match.groups()
+        if lookup is not None:
+            return SequenceCheck('redis_lookup', int(unit), int(first), None, 0) if second is None else None
+        if second is None:
+            return None
+        if in_order is not None:
+            return SequenceCheck('in_order', int(unit), int(second), int(first), 0)
+        return SequenceCheck('missing', int(unit), int(second), int(first), int(missing))
+    match = _SEQUENCE_DUPLICATE.match(message)
+    if match is not None:
+        kind = 'duplicate' if match.group(3) == 'true' else 'not_duplicate'
+        return SequenceCheck(kind, int(match.group(1)), int(match.group(2)), None, 0)
+    return None
@@ -0,0 +1,44 @@
+class MessageTypeResolver:
+    """Finds which of message_types a message_handler line carries.
+
+    Every message_handler.go call site logs one message type
+    ('/app/pkg/cboe/message_handler.go:71' is AddOrderMessage), but the line
+    numbers move between feed connector builds (:70 in older logs), so the
+    caller -> type table is learned from the 'common.<Type>{' token the first
+    time a caller is seen. After that a line costs one dict lookup and one
+    substring check confirming the token. Lines without a common.<Type>{
+    token (PREV_QUOTE/NEXT_QUOTE share a caller with OrderExecutedMessage)
+    fall back to the substring scan over message_types.
+    """
+
+    def __init__(self, message_types):
+        self.message_types = tuple(message_types)
+        self._wanted = frozenset(self.message_types)
+        # caller -> ('common.<Type>{' token, the type, or None when it is not one of message_types)
+        self._callers = {}
+        self.fallback_scans = 0
+
+    def resolve(self, caller, message):
+        """Return the message type if it is one of message_types, else None."""
+        known = self._callers.get(caller)
+        if known is not None and known[0] in message:
+            return known[1]
+        return self._resolve_token(caller, message, known)
+
+    def _resolve_token(self, caller, message, known):
+        start = message.find('common.')
+        brace = message.find('{', start) if start != -1 else -1
+        if brace == -1:
+            return self.scan(message)
+        message_type = message[start + 7:brace]
+        resolved = message_type if message_type in self._wanted else None
+        if known is None:
+            self._callers[caller] = (f"common.{message_type}{{", resolved)
+        return resolved
+
+    def scan(self, message):
+        self.fallback_scans += 1
+        for message_type in self.message_types:
+            if message_type in message:
+                return message_type
+        return None
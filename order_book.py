@@ -0,0 +1,363 @@
+from bisect import bisect_left, insort
+
+from message_parser import DepthSnapshot
+from order_index import price_key
+from order_state import feed_order_key
+
+EXCHANGE = 'CXA'
+
+
+class PriceLevel:
+    """One price on one side of a book: total resting quantity and how many orders make it up."""
+
+    __slots__ = ('price', 'quantity', 'order_count', 'timestamp')
+
+    def __init__(self, price):
+        self.price = price
+        self.quantity = 0
+        self.order_count = 0
+        self.timestamp = 0
+
+
+class SymbolBook:
+    """Bid and ask price levels of one symbol, each side kept as {price_key: PriceLevel} plus its sorted keys."""
+
+    __slots__ = ('symbol', 'levels', 'prices', 'total_size')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.levels = {'B': {}, 'S': {}}
+        self.prices = {'B': [], 'S': []}  # ascending price keys per side
+        self.total_size = {'B': 0, 'S': 0}
+
+    def add(self, side, key, price, quantity, timestamp, orders=1):
+        levels = self.levels[side]
+        level = levels.get(key)
+        if level is None:
+            level = levels[key] = PriceLevel(price)
+            insort(self.prices[side], key)
+        level.quantity += quantity
+        level.order_count += orders
+        level.timestamp = max(level.timestamp, timestamp or 0)
+        self.total_size[side] += quantity
+
+    def remove(self, side, key, quantity, timestamp, orders=0):
+        """Take quantity (and orders, when an order leaves the level) off a level; an emptied level is dropped."""
+        level = self.levels[side].get(key)
+        if level is None:
+            return
+        level.quantity -= quantity
+        level.order_count -= orders
+        level.timestamp = max(level.timestamp, timestamp or 0)
+        self.total_size[side] -= quantity
+        if level.order_count <= 0:
+            del self.levels[side][key]
+            prices = self.prices[side]
+            del prices[bisect_left(prices, key)]
+            # Whatever an inconsistent feed left on the level goes with it
+            self.total_size[side] -= level.quantity
+
+    def top(self, side, top_n):
+        """Best top_n levels of a side: highest bids first, lowest asks first."""
+        prices = self.prices[side]
+        keys = prices[::-1][:top_n] if side == 'B' else prices[:top_n]
+        return [self.levels[side][key] for key in keys]
+
+    def depth(self, top_n=10):
+        """Top-N depth in the layout getDepthCBOE.js writes (number_of_trades is the order count at the level)."""
+        def levels_json(side, side_name):
+            return {index: {'symbol': self.symbol, 'quantity': level.quantity, 'number_of_trades': level.order_count,
+                            'price': level.price, 'exchange': EXCHANGE, 'timestamp': level.timestamp,
+                            'source': EXCHANGE, 'side': side_name}
+                    for index, level in enumerate(self.top(side, top_n))}
+
+        return {
+            'symbol': self.symbol,
+            'exchange': EXCHANGE,
+            'depth': {
+                'ask': levels_json('S', 'Ask'),
+                'bid': levels_json('B', 'Bid'),
+                'total_ask_size': self.total_size['S'],
+                'total_bid_size': self.total_size['B'],
+            },
+        }
+
+
+class RestingOrder:
+    __slots__ = ('book', 'side', 'key', 'price', 'quantity')
+
+    def __init__(self, book, side, price, quantity):
+        self.book = book
+        self.side = side
+        self.key = price_key(price)
+        self.price = price
+        self.quantity = quantity
+
+
+class OrderBookEngine:
+    """Bid/ask books per symbol built straight from order records in feed order.
+
+    Reads only the fields each message carries on the wire (Add/Modify Price
+    and Quantity, ExecutedQty, CancelledQty), never the enriched ones, so it
+    can share a record stream with OrderStateEngine. Each message is one dict
+    lookup plus a level update; a level's sorted slot is only touched when
+    the level appears or empties. A fully executed or deleted order leaves
+    its level. DUPLICATED lines of a known order do not change the book.
+
+    books  -- symbol -> SymbolBook
+    orders -- order_id -> RestingOrder for every order resting now
+    """
+
+    def __init__(self, symbols=None):
+        self.books = {}
+        self.orders = {}
+        self.symbols = frozenset(symbols) if symbols is not None else None
+        self.unknown_order_messages = 0
+
+    def apply(self, message):
+        apply_message = self._APPLY.get(message.message_type)
+        if apply_message is None:
+            return
+        if message.duplicated and message.order_id in self.orders:
+            return
+        apply_message(self, message)
+
+    def apply_all(self, messages):
+        for message in messages:
+            self.apply(message)
+
+    def book(self, symbol):
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = SymbolBook(symbol)
+        return book
+
+    def depth(self, top_n=10, symbols=None):
+        """symbol -> top-N depth of the books as they are now."""
+        return {symbol: book.depth(top_n) for symbol, book in self.books.items() if symbols is None or symbol in symbols}
+
+    def replay_depth(self, messages, timestamps, top_n=10, symbols=None):
+        """Apply messages (feed order) and yield (timestamp, depth) for each of timestamps, in one pass.
+
+        The depth at T is the book after every message with Timestamp <= T.
+        """
+        pending = sorted(timestamps)
+        position = 0
+        for message in messages:
+            message_timestamp = message.message_timestamp or 0
+            while position < len(pending) and message_timestamp > pending[position]:
+                yield pending[position], self.depth(top_n, symbols)
+                position += 1
+            self.apply(message)
+        for timestamp in pending[position:]:
+            yield timestamp, self.depth(top_n, symbols)
+
+    def replay(self, messages, until=None, checkpoint_every=None, on_checkpoint=None):
+        """Apply messages (feed order) up to Timestamp until, calling on_checkpoint(T) at each checkpoint_every boundary.
+
+        T is the boundary minus one, so the engine passed along holds every
+        message with Timestamp <= T; a gap in the feed gives one checkpoint, not one per interval.
+        """
+        bucket = None
+        for message in messages:
+            message_timestamp = message.message_timestamp or 0
+            if until is not None and message_timestamp > until:
+                break
+            if checkpoint_every:
+                message_bucket = message_timestamp // checkpoint_every
+                if bucket is not None and message_bucket > bucket and on_checkpoint is not None:
+                    on_checkpoint(message_bucket * checkpoint_every - 1)
+                bucket = message_bucket
+            self.apply(message)
+
+    def _leave(self, order, message):
+        order.book.remove(order.side, order.key, order.quantity, message.message_timestamp, orders=1)
+        del self.orders[message.order_id]
+
+    def _apply_add(self, message):
+        if self.symbols is not None and message.symbol not in self.symbols:
+            return
+        order = self.orders.get(message.order_id)
+        if order is not None:
+            # The same OrderID added again replaces the resting order
+            self._leave(order, message)
+        order = RestingOrder(self.book(message.symbol), message.side_indicator, message.price, message.quantity)
+        self.orders[message.order_id] = order
+        order.book.add(order.side, order.key, order.price, order.quantity, message.message_timestamp)
+
+    def _apply_modify(self, message):
+        order = self.orders.get(message.order_id)
+        if order is None:
+            self.unknown_order_messages += 1
+            return
+        order.book.remove(order.side, order.key, order.quantity, message.message_timestamp, orders=1)
+        order.key, order.price, order.quantity = price_key(message.price), message.price, message.quantity
+        order.book.add(order.side, order.key, order.price, order.quantity, message.message_timestamp)
+
+    def _apply_reduce(self, message, quantity):
+        order = self.orders.get(message.order_id)
+        if order is None:
+            self.unknown_order_messages += 1
+            return
+        if quantity >= order.quantity:
+            self._leave(order, message)
+            return
+        order.quantity -= quantity
+        order.book.remove(order.side, order.key, quantity, message.message_timestamp)
+
+    def _apply_executed(self, message):
+        self._apply_reduce(message, message.executed_qty)
+
+    def _apply_reduce_size(self, message):
+        self._apply_reduce(message, message.cancelled_qty)
+
+    def _apply_delete(self, message):
+        order = self.orders.get(message.order_id)
+        if order is None:
+            self.unknown_order_messages += 1
+            return
+        self._leave(order, message)
+
+    # message_type -> handler, kept on the class like OrderStateEngine so a pickled engine holds only data
+    _APPLY = {
+        'AddOrderMessage': _apply_add,
+        'ModifyOrderMessage': _apply_modify,
+        'OrderExecutedMessage': _apply_executed,
+        'ReduceSizeMessage': _apply_reduce_size,
+        'DeleteOrderMessage': _apply_delete,
+    }
+
+
+# A DEPTH line sorts after every message with Timestamp <= its Depth.Time, whatever their HdrUnit
+_DEPTH_UNIT = 1 << 31
+
+
+def depth_feed_order_key(item):
+    """feed_order_key for a stream mixing order records and DepthSnapshots."""
+    if isinstance(item, DepthSnapshot):
+        return (item.time, _DEPTH_UNIT, 0)
+    return feed_order_key(item)
+
+
+def _lacks_orders_only(side, published, book_levels, levels):
+    """True when a side's difference is only orders the book never saw added.
+
+    Every book level in view of the published side must sit at a published
+    price holding no more quantity or orders than published, and a level
+    with the same order count must hold the same quantity. When `levels`
+    levels are published the side is cut off there, so book levels behind
+    the last published price are out of view.
+    """
+    published_levels = {price_key(price): (quantity, order_count) for price, quantity, order_count in published}
+    last_key = price_key(published[-1][0]) if len(published) >= levels else None
+    for level in book_levels:
+        key = price_key(level.price)
+        if last_key is not None and (key > last_key if side == 'S' else key < last_key):
+            break
+        seen = published_levels.get(key)
+        if seen is None:
+            return False
+        quantity, order_count = seen
+        if quantity < level.quantity or order_count < level.order_count:
+            return False
+        if order_count == level.order_count and quantity != level.quantity:
+            return False
+    return True
+
+
+class DepthVerifier:
+    """Checks published DEPTH lines against an OrderBookEngine fed the same stream.
+
+    Takes order records and DepthSnapshots in depth_feed_order_key order in
+    one pass. A snapshot is held until the first message after its
+    Depth.Time, so it is compared with the book after every message with
+    Timestamp <= Depth.Time; of several lines for one symbol and time only
+    the last one logged is compared. Levels are compared by position on
+    (price, quantity, order count) down to `levels` deep; the level Time is
+    not, since the book only knows orders added inside the logs.
+
+    Orders resting before the first log line are missing from the book, and
+    the Delete/Modify/Executed lines that reveal them carry no symbol. A
+    differing snapshot whose every side is the book plus such orders (see
+    _lacks_orders_only) is reported as book incomplete, not as diverging.
+
+    divergences -- [{'symbol', 'time', 'levels': [{'side', 'level', 'published', 'book'}]}]
+                   one per diverging snapshot, holding only the differing levels
+    incomplete  -- the same for the snapshots only an incomplete book explains
+    summary     -- symbol -> {'snapshots', 'diverging_snapshots', 'diverging_levels', 'incomplete_snapshots'}
+    """
+
+    def __init__(self, levels=10, symbols=None):
+        self.levels = levels
+        self.symbols = frozenset(symbols) if symbols is not None else None
+        self.engine = OrderBookEngine(symbols)
+        self.divergences = []
+        self.incomplete = []
+        self.summary = {}
+        self._pending = {}  # symbol -> last DepthSnapshot at _pending_time
+        self._pending_time = None
+
+    def feed(self, item):
+        if isinstance(item, DepthSnapshot):
+            if self.symbols is not None and item.symbol not in self.symbols:
+                return
+            if item.time != self._pending_time:
+                self.flush()
+                self._pending_time = item.time
+            self._pending[item.symbol] = item
+            return
+        if self._pending and (item.message_timestamp or 0) > self._pending_time:
+            self.flush()
+        self.engine.apply(item)
+
+    def verify(self, items):
+        for item in items:
+            self.feed(item)
+        self.flush()
+        return self.divergences
+
+    def flush(self):
+        """Compare every held snapshot with the book as it is now."""
+        for snapshot in self._pending.values():
+            self._compare(snapshot)
+        self._pending.clear()
+
+    def _compare(self, snapshot):
+        book = self.engine.books.get(snapshot.symbol)
+        diverging = []
+        lacks_orders_only = True
+        for side, side_name, published in (('S', 'ask', snapshot.asks), ('B', 'bid', snapshot.bids)):
+            book_levels = book.top(side, self.levels) if book is not None else []
+            published = [level[:3] for level in published[:self.levels]]
+            side_diverging = []
+            for position in range(max(len(book_levels), len(published))):
+                published_level = published[position] if position < len(published) else None
+                book_level = book_levels[position] if position < len(book_levels) else None
+                if (published_level is not None and book_level is not None
+                        and price_key(published_level[0]) == price_key(book_level.price)
+                        and published_level[1:] == (book_level.quantity, book_level.order_count)):
+                    continue
+                side_diverging.append({
+                    'side': side_name,
+                    'level': position,
+                    'published': list(published_level) if published_level is not None else None,
+                    'book': [book_level.price, book_level.quantity, book_level.order_count] if book_level is not None else None,
+                })
+            if side_diverging:
+                diverging.extend(side_diverging)
+                lacks_orders_only = lacks_orders_only and _lacks_orders_only(side, published, book_levels, self.levels)
+        counts = self.summary.get(snapshot.symbol)
+        if counts is None:
+            counts = self.summary[snapshot.symbol] = {'snapshots': 0, 'diverging_snapshots': 0, 'diverging_levels': 0,
+                                                      'incomplete_snapshots': 0}
+        counts['snapshots'] += 1
+        if not diverging:
+            return
+        entry = {'symbol': snapshot.symbol, 'time': snapshot.time, 'levels': diverging}
+        if lacks_orders_only:
+            counts['incomplete_snapshots'] += 1
+            self.incomplete.append(entry)
+        else:
+            counts['diverging_snapshots'] += 1
+            counts['diverging_levels'] += len(diverging)
+            self.divergences.append(entry)
@@ -0,0 +1,135 @@
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional: bisect over plain lists answers the same queries
+    np = None
+
+
+class _SymbolTimes:
+    """Timestamps of one symbol's messages, sorted, with where each message sits in the grouped layout."""
+
+    __slots__ = ('timestamps', 'positions', 'entries', 'order_slots', 'order_ids')
+
+    def __init__(self, orders):
+        self.order_ids = list(orders)
+        self.entries = []      # messages with a Timestamp, in grouped layout order (order by order)
+        self.order_slots = []  # index into order_ids for each of entries
+        timestamps = []
+        for order_slot, log_entries in enumerate(orders.values()):
+            for entry in log_entries:
+                if entry.message_timestamp:
+                    self.entries.append(entry)
+                    self.order_slots.append(order_slot)
+                    timestamps.append(entry.message_timestamp)
+        # Queries stay on plain lists either way: a numpy sort and tolist() per window cost more than
+        # sorted() on the few positions a window returns, so numpy only does the one-off argsort
+        if np is not None:
+            timestamps = np.array(timestamps, dtype=np.int64)
+            positions = np.argsort(timestamps, kind='stable')
+            self.positions = positions.tolist()
+            self.timestamps = timestamps[positions].tolist()
+        else:
+            self.positions = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+            self.timestamps = [timestamps[p] for p in self.positions]
+
+    def bounds(self, start, end):
+        return bisect_left(self.timestamps, start), bisect_right(self.timestamps, end)
+
+    def hits(self, start, end):
+        """Layout positions of the messages in start..end, in layout order."""
+        lo, hi = self.bounds(start, end)
+        return sorted(self.positions[lo:hi])
+
+
+class SymbolTimeIndex:
+    """Sorted per-symbol Timestamp index over grouped order logs (symbol -> {order_id: [messages]}).
+
+    Built once for a loaded day; every start..end window afterwards costs two
+    binary searches per symbol plus the messages it returns, instead of a
+    scan over every message of every order. window() gives the same result,
+    layout and order as filter_logs_by_time_range on the logs it was built from.
+    Sorts with numpy when it is installed; queries are bisect over lists either way.
+    """
+
+    def __init__(self, grouped):
+        self._symbols = {symbol: _SymbolTimes(orders) for symbol, orders in grouped.items()}
+
+    def window(self, start, end, symbols=None):
+        """symbol -> {order_id: [messages in start..end]}, keeping only orders with at least one."""
+        filtered_logs = {}
+        for symbol, times in self._symbols.items():
+            if symbols is not None and symbol not in symbols:
+                continue
+            filtered_orders = {}
+            for position in times.hits(start, end):
+                order_id = times.order_ids[times.order_slots[position]]
+                entries = filtered_orders.get(order_id)
+                if entries is None:
+                    entries = filtered_orders[order_id] = []
+                entries.append(times.entries[position])
+            if filtered_orders:
+                filtered_logs[symbol] = filtered_orders
+        return filtered_logs
+
+    def count(self, symbol, start, end):
+        """Number of messages of symbol in start..end."""
+        times = self._symbols.get(symbol)
+        if times is None:
+            return 0
+        lo, hi = times.bounds(start, end)
+        return hi - lo
+
+    def orders_in_range(self, symbol, start, end):
+        """Set of order ids of symbol with at least one message in start..end."""
+        times = self._symbols.get(symbol)
+        if times is None:
+            return set()
+        return {times.order_ids[times.order_slots[position]] for position in times.hits(start, end)}
+
+    def time_span(self, symbol):
+        """(first, last) message Timestamp of symbol, or None."""
+        times = self._symbols.get(symbol)
+        if times is None or not len(times.timestamps):
+            return None
+        return int(times.timestamps[0]), int(times.timestamps[-1])
+
+
+# Prices are keyed as integer ticks of 1/PRICE_SCALE, so 64.31 typed in a config and 64.31 parsed from a log are the same key
+PRICE_SCALE = 10_000
+
+
+def price_key(price):
+    return round(price * PRICE_SCALE)
+
+
+class PriceLevelIndex:
+    """(symbol, fixed-point price) -> orders whose messages ever carried that price.
+
+    Built once over grouped order logs; orders(symbol, price) then costs one
+    dict lookup and returns only the orders at that level, in grouped layout
+    order, instead of comparing the price of every message of every order.
+    """
+
+    def __init__(self, grouped):
+        self._levels = {}  # symbol -> {price_key: [order_id, ...]}
+        for symbol, orders in grouped.items():
+            levels = {}
+            for order_id, log_entries in orders.items():
+                order_levels = set()
+                for entry in log_entries:
+                    if entry.price is None:
+                        continue
+                    key = price_key(entry.price)
+                    if key not in order_levels:
+                        order_levels.add(key)
+                        levels.setdefault(key, []).append(order_id)
+            self._levels[symbol] = levels
+
+    def orders(self, symbol, price):
+        """Order ids of symbol that ever carried price, in grouped layout order."""
+        return self._levels.get(symbol, {}).get(price_key(price), [])
+
+    def prices(self, symbol):
+        """Every price level seen for symbol, ascending."""
+        return [key / PRICE_SCALE for key in sorted(self._levels.get(symbol, ()))]
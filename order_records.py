@@ -0,0 +1,267 @@
+import sys
+from decimal import Decimal
+
+
+def format_go_float(value):
+    """Format a float the way Go prints it with %v (shortest digits, exponent outside 1e-4..1e6)."""
+    if value != value or value in (float('inf'), float('-inf')):
+        return 'NaN' if value != value else ('+Inf' if value > 0 else '-Inf')
+    number = Decimal(repr(value)).normalize()
+    digits = number.as_tuple().digits
+    exponent = len(digits) + number.as_tuple().exponent - 1
+    if -4 <= exponent < 6 or value == 0:
+        return format(number, 'f')
+    sign = '-' if value < 0 else ''
+    mantissa = str(digits[0]) + ('.' + ''.join(map(str, digits[1:])) if len(digits) > 1 else '')
+    return f"{sign}{mantissa}e{'+' if exponent >= 0 else '-'}{abs(exponent):02d}"
+
+
+class SequencedUnitHeader:
+    __slots__ = ('length', 'count', 'unit', 'sequence')
+
+    def __init__(self, length, count, unit, sequence):
+        self.length = length
+        self.count = count
+        self.unit = unit
+        self.sequence = sequence
+
+    @classmethod
+    def from_values(cls, values):
+        """Build from HandlerMessage.header_values, or return None when the line has no header.
+
+        values is a tuple in (HdrLength, HdrCount, HdrUnit, HdrSequence) order, or a
+        dict of ints when the logged header had its keys reordered or extra keys.
+        """
+        if values is None:
+            return None
+        if isinstance(values, dict):
+            return cls(values['HdrLength'], values['HdrCount'], values['HdrUnit'], values['HdrSequence'])
+        return cls(int(values[0]), int(values[1]), int(values[2]), int(values[3]))
+
+    def to_dict(self):
+        return {'HdrLength': self.length, 'HdrCount': self.count, 'HdrUnit': self.unit, 'HdrSequence': self.sequence}
+
+
+class LogRecord:
+    """A kept message_handler log line with its message struct already converted.
+
+    Subclasses list their Go struct fields in FIELDS as
+    (go_name, attribute, parse, format): parse turns the logged text into the
+    stored value and format turns it back when the record is exported.
+    ENRICHED_FIELDS are the keys update_order_messages adds to parsed_message,
+    as (go_name, attribute, format, keep_none); keep_none writes null when
+    the value is missing instead of leaving the key out.
+    """
+
+    __slots__ = ('level', 'time', 'caller', 'message', 'timestamp', 'message_type', 'header', 'received_at',
+                 'executed_time_us', 'message_timestamp', 'order_id', 'symbol', 'side_indicator', 'price', 'quantity',
+                 'enriched', 'duplicated')
+
+    FIELDS = ()
+    ENRICHED_FIELDS = ()
+
+    def __init__(self, log, message_type, handler_message):
+        self.level = sys.intern(log['level'])
+        self.time = sys.intern(log['time'])
+        self.caller = sys.intern(log['caller'])
+        self.message = log['message']
+        self.timestamp = log['timestamp']
+        self.message_type = sys.intern(message_type)
+        self.header = SequencedUnitHeader.from_values(handler_message.header_values)
+        self.received_at = handler_message.received_at
+        self.executed_time_us = handler_message.executed_time_us
+        self.message_timestamp = None
+        self.order_id = None
+        self.symbol = None
+        self.side_indicator = None
+        self.price = None
+        self.quantity = None
+        self.enriched = False
+        # The feed connector marks a message it already handled once with ' - DUPLICATED'
+        self.duplicated = 'DUPLICATED' in handler_message.flags
+        fields = handler_message.fields
+        for go_name, attribute, parse, _ in self.FIELDS:
+            setattr(self, attribute, parse(fields[go_name]))
+
+    def parsed_message(self):
+        parsed = {}
+        for go_name, attribute, _, format_value in self.FIELDS:
+            parsed[go_name] = format_value(getattr(self, attribute))
+        if self.header is not None:
+            parsed.update(self.header.to_dict())
+        if self.enriched:
+            for go_name, attribute, format_value, keep_none in self.ENRICHED_FIELDS:
+                value = getattr(self, attribute)
+                if value is not None:
+                    parsed[go_name] = format_value(value)
+                elif keep_none:
+                    parsed[go_name] = None
+        return parsed
+
+    def to_dict(self):
+        """The exported JSON layout: the raw log line plus timestamp, message_type and parsed_message."""
+        return {
+            'level': self.level,
+            'time': self.time,
+            'caller': self.caller,
+            'message': self.message,
+            'timestamp': self.timestamp,
+            'message_type': self.message_type,
+            'parsed_message': self.parsed_message(),
+            'received_at': self.received_at,
+            'executed_time_us': self.executed_time_us,
+        }
+
+
+def _text(value):
+    return value
+
+
+_TIMESTAMP = ('Timestamp', 'message_timestamp', int, str)
+_ORDER_ID = ('OrderID', 'order_id', sys.intern, _text)
+_RESERVED = ('Reserved', 'reserved', sys.intern, _text)
+
+
+class AddOrderMessage(LogRecord):
+    __slots__ = ('pid', 'reserved')
+
+    FIELDS = (
+        _TIMESTAMP,
+        _ORDER_ID,
+        ('SideIndicator', 'side_indicator', sys.intern, _text),
+        ('Quantity', 'quantity', int, str),
+        ('Symbol', 'symbol', sys.intern, _text),
+        ('Price', 'price', float, format_go_float),
+        ('PID', 'pid', sys.intern, _text),
+        _RESERVED,
+    )
+
+
+class ModifyOrderMessage(LogRecord):
+    __slots__ = ('reserved',)
+
+    FIELDS = (
+        _TIMESTAMP,
+        _ORDER_ID,
+        ('Quantity', 'quantity', int, str),
+        ('Price', 'price', float, format_go_float),
+        _RESERVED,
+    )
+    ENRICHED_FIELDS = (
+        ('Symbol', 'symbol', _text, True),
+        ('SideIndicator', 'side_indicator', _text, True),
+    )
+
+
+class OrderExecutedMessage(LogRecord):
+    __slots__ = ('executed_qty', 'execution_id', 'contract_order_id', 'contract_pid', 'reserved')
+
+    FIELDS = (
+        _TIMESTAMP,
+        _ORDER_ID,
+        ('ExecutedQty', 'executed_qty', int, str),
+        ('ExecutionID', 'execution_id', str, _text),
+        ('ContractOrderID', 'contract_order_id', sys.intern, _text),
+        ('ContractPID', 'contract_pid', sys.intern, _text),
+        _RESERVED,
+    )
+    ENRICHED_FIELDS = (
+        ('Symbol', 'symbol', _text, True),
+        ('SideIndicator', 'side_indicator', _text, True),
+        ('Price', 'price', format_go_float, False),
+    )
+
+
+class DeleteOrderMessage(LogRecord):
+    __slots__ = ()
+
+    FIELDS = (
+        _TIMESTAMP,
+        _ORDER_ID,
+    )
+    ENRICHED_FIELDS = (
+        ('Symbol', 'symbol', _text, True),
+        ('SideIndicator', 'side_indicator', _text, True),
+        ('Price', 'price', format_go_float, False),
+        ('Quantity', 'quantity', str, False),
+    )
+
+
+class ReduceSizeMessage(LogRecord):
+    __slots__ = ('cancelled_qty',)
+
+    FIELDS = (
+        _TIMESTAMP,
+        _ORDER_ID,
+        ('CancelledQty', 'cancelled_qty', int, str),
+    )
+    # Quantity is what is left on the order after the reduction
+    ENRICHED_FIELDS = (
+        ('Symbol', 'symbol', _text, True),
+        ('SideIndicator', 'side_indicator', _text, True),
+        ('Price', 'price', format_go_float, False),
+        ('Quantity', 'quantity', str, False),
+    )
+
+
+class TradeMessage(LogRecord):
+    """A trade print; OrderID is usually a non-displayed order that never appears in an AddOrderMessage."""
+
+    __slots__ = ('execution_id', 'contract_order_id', 'pid', 'contract_pid', 'trade_type', 'trade_designation',
+                 'trade_report_type', 'trade_transaction_time', 'reserved')
+
+    FIELDS = (
+        _TIMESTAMP,
+        ('Symbol', 'symbol', sys.intern, _text),
+        ('Quantity', 'quantity', int, str),
+        ('Price', 'price', float, format_go_float),
+        ('ExecutionID', 'execution_id', str, _text),
+        _ORDER_ID,
+        ('ContractOrderID', 'contract_order_id', sys.intern, _text),
+        ('PID', 'pid', sys.intern, _text),
+        ('ContractPID', 'contract_pid', sys.intern, _text),
+        ('TradeType', 'trade_type', sys.intern, _text),
+        ('TradeDesignation', 'trade_designation', sys.intern, _text),
+        ('TradeReportType', 'trade_report_type', sys.intern, _text),
+        ('TradeTransactionTime', 'trade_transaction_time', int, str),
+        _RESERVED,
+    )
+    ENRICHED_FIELDS = (
+        ('SideIndicator', 'side_indicator', _text, False),
+    )
+
+
+class OtherMessage(LogRecord):
+    """Any other message type: the struct is kept as parsed (text values), Symbol and Timestamp are lifted out."""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, log, message_type, handler_message):
+        super().__init__(log, message_type, handler_message)
+        self.fields = handler_message.fields
+        if 'Symbol' in self.fields:
+            self.symbol = sys.intern(self.fields['Symbol'])
+        if 'Timestamp' in self.fields:
+            self.message_timestamp = int(self.fields['Timestamp'])
+
+    def parsed_message(self):
+        parsed = dict(self.fields)
+        if self.header is not None:
+            parsed.update(self.header.to_dict())
+        return parsed
+
+
+RECORD_TYPES = {cls.__name__: cls for cls in (AddOrderMessage, ModifyOrderMessage, OrderExecutedMessage, DeleteOrderMessage,
+                                                ReduceSizeMessage, TradeMessage)}
+
+
+def make_record(log, message_type, handler_message):
+    """Build the typed record for a parsed message_handler line."""
+    return RECORD_TYPES.get(message_type, OtherMessage)(log, message_type, handler_message)
+
+
+def record_to_json(value):
+    """json.dump default= hook that writes records in the exported dict layout."""
+    if isinstance(value, LogRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,218 @@
+class LiveOrder:
+    """State of one order: where it rests now and every message seen for it."""
+
+    __slots__ = ('order_id', 'symbol', 'side_indicator', 'price', 'quantity', 'messages', 'live')
+
+    def __init__(self, add_message):
+        self.order_id = add_message.order_id
+        self.symbol = add_message.symbol
+        self.side_indicator = add_message.side_indicator
+        self.price = add_message.price
+        self.quantity = add_message.quantity
+        self.messages = [add_message]
+        self.live = True
+
+    @classmethod
+    def resting(cls, order_id, symbol, side_indicator, price, quantity):
+        """An order already resting when the messages start, with no history of its own."""
+        order = cls.__new__(cls)
+        order.order_id = order_id
+        order.symbol = symbol
+        order.side_indicator = side_indicator
+        order.price = price
+        order.quantity = quantity
+        order.messages = []
+        order.live = True
+        return order
+
+
+def feed_order_key(message):
+    """Sort key putting records back in feed order: (Timestamp, HdrUnit, HdrSequence).
+
+    The connector logs from several goroutines, so a Delete can be written a
+    second before the Add it refers to; the sequenced unit header is the
+    order the exchange sent them in. Within a unit the message Timestamp
+    never decreases along HdrSequence, so leading with it gives one total
+    order that interleaves the units by exchange time.
+    """
+    header = message.header
+    if header is None:
+        return (message.message_timestamp or 0, -1, 0)
+    return (message.message_timestamp or 0, header.unit, header.sequence)
+
+
+class OrderStateEngine:
+    """Order state built from order records in feed order, one O(1) step per message.
+
+    Every Modify/Executed/ReduceSize/Delete is enriched the moment it is
+    applied from the order's current state (Symbol, SideIndicator, the price
+    the order rests at and, for ReduceSize/Delete, the quantity left), so no
+    second grouping or back-fill pass is needed.
+
+    orders  -- order_id -> LiveOrder for every order whose Add was seen
+               (deleted ones stay, with live=False, so their history can be exported)
+    grouped -- symbol -> {order_id: [messages]}, the layout the order exports use
+    trades  -- symbol -> [TradeMessage] for trades that do not name a known order
+
+    symbols, start_time and end_time push the export filters down into ingest:
+    an Add for a symbol outside symbols never creates an order, so every later
+    message of that order is dropped as unknown before it is enriched or
+    grouped; messages whose raw Timestamp is outside start_time..end_time
+    still move the order's state but are not kept in its history.
+    """
+
+    def __init__(self, symbols=None, start_time=None, end_time=None):
+        self.orders = {}
+        self.grouped = {}
+        self.trades = {}
+        self.unknown_order_messages = 0
+        self.symbols = frozenset(symbols) if symbols is not None else None
+        self.start_time = start_time
+        self.end_time = end_time
+        self.skipped_orders = 0
+
+    def apply(self, message):
+        """Apply one record; return the symbol it belongs to, or None when it was not kept."""
+        apply_message = self._APPLY.get(message.message_type)
+        if apply_message is None:
+            return None
+        if message.duplicated and message.order_id in self.orders:
+            return self._apply_duplicate(message)
+        return apply_message(self, message)
+
+    def apply_all(self, messages):
+        """Apply records in feed order; return the set of symbols that changed."""
+        touched = set()
+        for message in messages:
+            symbol = self.apply(message)
+            if symbol is not None:
+                touched.add(symbol)
+        return touched
+
+    def seed(self, order_book):
+        """Start from the orders resting in an OrderBookEngine (e.g. a checkpoint taken before the messages).
+
+        Later messages of those orders are enriched as if their Add had been
+        applied outside the time window: the order is known, its Add is not
+        in the history. Orders of symbols outside symbols are left out.
+        """
+        for order_id, resting in order_book.orders.items():
+            symbol = resting.book.symbol
+            if self.symbols is not None and symbol not in self.symbols:
+                continue
+            order = self.orders[order_id] = LiveOrder.resting(order_id, symbol, resting.side, resting.price, resting.quantity)
+            self.grouped.setdefault(symbol, {})[order_id] = order.messages
+
+    def live_orders(self, symbol=None):
+        return [order for order in self.orders.values() if order.live and (symbol is None or order.symbol == symbol)]
+
+    def in_time_range(self, message):
+        """True when the message belongs in the exported history (always, without a time window)."""
+        if self.start_time is None:
+            return True
+        timestamp = message.message_timestamp
+        return bool(timestamp) and self.start_time <= timestamp <= self.end_time
+
+    def _keep(self, order, message):
+        if self.in_time_range(message):
+            order.messages.append(message)
+
+    def _attach(self, message):
+        """Enrich a message with its order's Symbol/SideIndicator and append it, or return None for an unknown order."""
+        order = self.orders.get(message.order_id)
+        if order is None:
+            self.unknown_order_messages += 1
+            return None
+        message.symbol = order.symbol
+        message.side_indicator = order.side_indicator
+        message.enriched = True
+        self._keep(order, message)
+        return order
+
+    def _apply_add(self, message):
+        order = self.orders.get(message.order_id)
+        if order is not None:
+            # The same OrderID added again: keep one history, like the grouped export always did
+            self._keep(order, message)
+            order.symbol, order.side_indicator = message.symbol, message.side_indicator
+            order.price, order.quantity, order.live = message.price, message.quantity, True
+        elif self.symbols is not None and message.symbol not in self.symbols:
+            self.skipped_orders += 1
+            return None
+        else:
+            order = LiveOrder(message)
+            if not self.in_time_range(message):
+                order.messages.clear()
+            self.orders[message.order_id] = order
+            self.grouped.setdefault(order.symbol, {})[message.order_id] = order.messages
+        message.enriched = True
+        return order.symbol
+
+    def _apply_modify(self, message):
+        order = self._attach(message)
+        if order is None:
+            return None
+        order.price = message.price
+        order.quantity = message.quantity
+        return order.symbol
+
+    def _apply_executed(self, message):
+        order = self._attach(message)
+        if order is None:
+            return None
+        message.price = order.price
+        order.quantity -= message.executed_qty
+        return order.symbol
+
+    def _apply_reduce_size(self, message):
+        order = self._attach(message)
+        if order is None:
+            return None
+        order.quantity -= message.cancelled_qty
+        message.price = order.price
+        message.quantity = order.quantity
+        return order.symbol
+
+    def _apply_delete(self, message):
+        order = self._attach(message)
+        if order is None:
+            return None
+        message.price = order.price
+        message.quantity = order.quantity
+        order.live = False
+        return order.symbol
+
+    def _apply_trade(self, message):
+        order = self.orders.get(message.order_id)
+        if order is None:
+            if (self.symbols is None or message.symbol in self.symbols) and self.in_time_range(message):
+                self.trades.setdefault(message.symbol, []).append(message)
+            return None
+        message.side_indicator = order.side_indicator
+        message.enriched = True
+        self._keep(order, message)
+        return order.symbol
+
+    def _apply_duplicate(self, message):
+        """A DUPLICATED line is kept in its order's history and enriched, but does not change the order again."""
+        order = self.orders[message.order_id]
+        if message.message_type != 'TradeMessage':
+            message.symbol = order.symbol
+        message.side_indicator = order.side_indicator
+        if message.message_type in ('OrderExecutedMessage', 'ReduceSizeMessage', 'DeleteOrderMessage'):
+            message.price = order.price
+        if message.message_type in ('ReduceSizeMessage', 'DeleteOrderMessage'):
+            message.quantity = order.quantity
+        message.enriched = True
+        self._keep(order, message)
+        return order.symbol
+
+    # message_type -> handler, kept on the class so a pickled engine (follow checkpoint) holds only data
+    _APPLY = {
+        'AddOrderMessage': _apply_add,
+        'ModifyOrderMessage': _apply_modify,
+        'OrderExecutedMessage': _apply_executed,
+        'ReduceSizeMessage': _apply_reduce_size,
+        'DeleteOrderMessage': _apply_delete,
+        'TradeMessage': _apply_trade,
+    }
@@ -0,0 +1,66 @@
+import os
+import sys
+import importlib.util
+import logging
+from datetime import datetime
+
+from analysis_runner import Analysis, run_analyses
+from log_pipeline import list_log_files
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+LOG_FOLDER = 'today'
+PARALLEL_WORKERS = 1  # > 1 quét các file rotate trong process pool, None = dùng mọi CPU
+
+# Tên analysis -> script cung cấp LINE_PREFILTER, parse_log_entry và process_parsed_logs
+# (script có ParsedLogConsumer thì nhận từng phần tử ngay khi file được quét, không gom cả ngày vào list)
+ANALYSIS_SCRIPTS = {
+    'orders': 'parse-cboe-feed-connector-log.py',
+    'sequence': 'parse-cboe-hqrSequence.py',
+    'drops': 'parse-cboe-dropping-message.py',
+    'auction_update': 'aution_update_message-log.py',
+    'calculated_value': 'calculated_value_message-log.py',
+    'end_of_message': 'end_of_message-log.py',
+    'depth_verify': 'parse-cboe-depth-verify.py',
+    'sequence_timeline': 'parse-cboe-sequence-timeline.py',
+}
+ENABLED_ANALYSES = list(ANALYSIS_SCRIPTS)
+
+# Nạp script (tên có dấu '-') như một module, cấu hình của từng script giữ nguyên
+def load_script(file_name):
+    module_name = os.path.splitext(file_name)[0].replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name))
+    module = importlib.util.module_from_spec(spec)
+    # Đăng ký trước khi chạy để worker của process pool unpickle được parse_log_entry
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def load_analysis(name):
+    script = load_script(ANALYSIS_SCRIPTS[name])
+    # Script nào cần log theo thứ tự feed thì khai báo FEED_REORDER_BUFFER
+    return Analysis(name, script.parse_log_entry, script.process_parsed_logs, script.LINE_PREFILTER,
+                    getattr(script, 'FEED_REORDER_BUFFER', None), getattr(script, 'ParsedLogConsumer', None))
+
+# Quét log một lần, mỗi dòng được đưa tới mọi analysis cần nó, rồi mỗi analysis ghi kết quả riêng
+def main():
+    file_paths = list_log_files(LOG_FOLDER)
+    if not file_paths:
+        print(f"No log files in {LOG_FOLDER}")
+        return
+
+    analyses = [load_analysis(name) for name in ENABLED_ANALYSES]
+    print(f"Scanning {len(file_paths)} log files once for: {', '.join(a.name for a in analyses)}")
+    # Thêm tên analysis vào hậu tố vì nhiều script cùng ghi grouped_by_symbol_<suffix>.json
+    datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    consumers = {analysis.name: analysis.start(f"{datetime_str}_{analysis.name}") for analysis in analyses}
+    stats = run_analyses(file_paths, analyses, consumers, PARALLEL_WORKERS)
+    print(stats.summary())
+    for analysis in analyses:
+        if analysis.reorder is not None and analysis.reorder.late:
+            print(f"[{analysis.name}] {analysis.reorder.summary()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import json
+import time
+from datetime import datetime
+
+from log_pipeline import LinePrefilter, ReorderBuffer, iter_log_entries, list_log_files, merge_ordered_streams
+from log_time import parse_log_time
+from message_parser import parse_depth_message, parse_handler_message
+from message_types import MessageTypeResolver
+from order_book import DepthVerifier, depth_feed_order_key
+from order_records import make_record
+
+USE_SYMBOL_FILTER = False  # True: chỉ kiểm tra các symbol trong symbol
+symbol = ['KAR']
+DEPTH_LEVELS = 10  # Số mức giá mỗi bên được so sánh (dòng DEPTH ghi tối đa 10 mức)
+
+# Các message làm thay đổi order book (TradeMessage không đổi book)
+BOOK_MESSAGE_TYPES = ['AddOrderMessage', 'OrderExecutedMessage', 'ModifyOrderMessage', 'DeleteOrderMessage', 'ReduceSizeMessage']
+MESSAGE_TYPE_RESOLVER = MessageTypeResolver(BOOK_MESSAGE_TYPES)
+DEPTH_MARKER = 'DEPTH: '
+
+# Lọc nhanh theo bytes trước khi json.loads: dòng DEPTH và các dòng message_handler làm thay đổi book
+LINE_PREFILTER = LinePrefilter(any_of=[DEPTH_MARKER] + BOOK_MESSAGE_TYPES)
+
+# Mỗi file được đọc dạng luồng (không sort cả file như script order) và dòng DEPTH làm luồng dài gấp đôi:
+# cửa sổ 4096 sắp lại đủ mọi dòng của today/, dòng trễ hơn thế được báo trong summary của buffer
+FEED_REORDER_WINDOW = 4096
+FEED_REORDER_BUFFER = ReorderBuffer(depth_feed_order_key, FEED_REORDER_WINDOW)
+
+# Hàm phân tích từng dòng log: DepthSnapshot cho dòng DEPTH, record cho message thay đổi book
+def parse_log_entry(log):
+    message = log['message']
+    if message.startswith(DEPTH_MARKER):
+        return parse_depth_message(message)
+    caller = log.get('caller', '')
+    if 'Unsupported' in message or 'Err: redis: nil' in message or 'message_handler' not in caller:
+        return None
+    log['timestamp'] = parse_log_time(log['time'])
+    message_type = MESSAGE_TYPE_RESOLVER.resolve(caller, message)
+    if message_type is None:
+        return None
+    handler_message = parse_handler_message(message)
+    if handler_message is None:
+        print(f"Failed to parse message object, {log}")
+        return None
+    try:
+        return make_record(log, message_type, handler_message)
+    except (KeyError, ValueError) as e:
+        print(f"Failed to build {message_type} record: {e}, {log}")
+        return None
+
+# Đọc từng file thành luồng (không giữ cả file trong bộ nhớ)
+def iter_parsed_file(file_path):
+    print(f"Reading log file: {file_path}")
+    for log in iter_log_entries(file_path, LINE_PREFILTER):
+        item = parse_log_entry(log)
+        if item is not None:
+            yield item
+
+# So sánh dòng DEPTH với book dựng lại từ message theo từng phần tử; parse-cboe-all-analyses.py đưa phần tử vào qua feed
+class ParsedLogConsumer:
+    def __init__(self, name_suffix):
+        self.name_suffix = name_suffix
+        self.verifier = DepthVerifier(DEPTH_LEVELS, symbol if USE_SYMBOL_FILTER else None)
+        self.feed = self.verifier.feed
+
+    # Ghi các mức giá lệch
+    def finish(self):
+        verifier = self.verifier
+        verifier.flush()
+        divergences = verifier.divergences
+        snapshots = sum(counts['snapshots'] for counts in verifier.summary.values())
+        # Snapshot chỉ lệch vì book thiếu các order có từ trước log được báo riêng, không tính là diverge
+        print(f"Compared {snapshots} DEPTH snapshots of {len(verifier.summary)} symbols: {len(divergences)} diverge, "
+              f"{len(verifier.incomplete)} book incomplete "
+              f"({verifier.engine.unknown_order_messages} messages for orders added before the logs)")
+        output_filename = f"depth_verification_{self.name_suffix}.json"
+        with open(output_filename, 'w') as f:
+            json.dump({'summary': verifier.summary, 'divergences': divergences, 'incomplete': verifier.incomplete}, f, indent=4)
+        print(f"Export complete: {output_filename}")
+
+def process_parsed_logs(parsed_items, name_suffix):
+    consumer = ParsedLogConsumer(name_suffix)
+    for item in parsed_items:
+        consumer.feed(item)
+    consumer.finish()
+
+# Một lượt streaming: các file được sắp lại theo thứ tự feed và merge, từng phần tử đưa thẳng vào verifier
+def main():
+    file_paths = list_log_files('today')
+    if not file_paths:
+        print("No log files in today")
+        return
+    start_clock = time.perf_counter()
+    items = merge_ordered_streams([iter_parsed_file(file_path) for file_path in file_paths], FEED_REORDER_BUFFER)
+    process_parsed_logs(items, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    if FEED_REORDER_BUFFER.late:
+        print(FEED_REORDER_BUFFER.summary())
+    print(LINE_PREFILTER.summary())
+    print(f"Done in {time.perf_counter() - start_clock:.1f}s")
+
+if __name__ == '__main__':
+    main()
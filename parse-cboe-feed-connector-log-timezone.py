@@ -1,34 +1,23 @@
 import os
 import re
-import gzip
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 from collections import defaultdict
-from zoneinfo import ZoneInfo
 import json
 
+from candlesticks import build_candlesticks
+from log_pipeline import list_log_files, iter_log_entries
+
 FILTER_ONLY_EXECUTED = True
 ORDER_MESSAGE_TYPES = ['AddOrderMessage', 'OrderExecutedMessage', 'ModifyOrderMessage', 'DeleteOrderMessage']
 
 def load_log_data(file_path):
-    log_entries = []
-    if os.path.isfile(file_path) and file_path.endswith('.gz'):
-        print(f"Reading log file: {file_path}")
-        with gzip.open(file_path, 'rt') as file:
-            for line in file:
-                log_entries.append(json.loads(line))
-    elif os.path.isfile(file_path) and file_path.endswith('.log'):
+    if os.path.isfile(file_path) and file_path.endswith(('.gz', '.log')):
         print(f"Reading log file: {file_path}")
-        with open(file_path, 'r') as file:
-            for line in file:
-                log_entries.append(json.loads(line))
-    return log_entries
+        yield from iter_log_entries(file_path)
 
 def load_all_log_data(folder_path):
-    log_entries = []
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
-        log_entries.extend(load_log_data(file_path))
-    return log_entries
+    for file_path in list_log_files(folder_path):
+        yield from load_log_data(file_path)
 
 def extract_object(input_string):
     match = re.search(r'\{(.*)\}', input_string)
@@ -156,78 +145,18 @@ def extract_all_executed_message_by_symbol(logs):
 
     return filtered_logs
 
-def convert_to_au_datetime(utc_datetime_obj):
-    return utc_datetime_obj.astimezone(ZoneInfo("Australia/Sydney"))
-
-
+# Nến theo giờ Sydney dựng chung với script chính (bảng chuyển giờ AEST/AEDT tính trước, không tạo ZoneInfo mỗi trade)
 def construct_candlestick_data(logs, timeframes=['1m', '1h', '1d']):
-    # Define the time delta based on the timeframe
-    time_deltas = {
-        '1m': timedelta(minutes=1),
-        '1h': timedelta(hours=1),
-        '1d': timedelta(days=1)
-    }
-
-    # Initialize the result dictionary
-    candlestick_data = {}
-
-    # Iterate over each log entry
+    trades = {}
     for symbol, order_logs in logs.items():
         #sort all executed msgs according to symbol
         order_logs.sort(key=lambda x:x['timestamp'])
-        for log in order_logs:
-            timestamp = datetime.fromtimestamp(log['timestamp'], timezone.utc)
-
-            if ('Price' not in log['parsed_message']):
-                continue
-
-            price = float(log['parsed_message']['Price'])
-
-            # Initialize the symbol entry if not present
-            if symbol not in candlestick_data:
-                candlestick_data[symbol] = {tf: [] for tf in timeframes}
-
-            for timeframe in timeframes:
-                time_delta = time_deltas[timeframe]
-
-                # Calculate the start and end times with 00 seconds
-                if timeframe == '1m':
-                    start_time = convert_to_au_datetime(timestamp).replace(second=0, microsecond=0, tzinfo=ZoneInfo("Australia/Sydney"))
-                elif timeframe == '1h':
-                    start_time = convert_to_au_datetime(timestamp).replace(minute=0, second=0, microsecond=0, tzinfo=ZoneInfo("Australia/Sydney"))
-                elif timeframe == '1d':
-                    start_time = convert_to_au_datetime(timestamp).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=ZoneInfo("Australia/Sydney"))
-
-                end_time = start_time + time_delta
-
-                # Find the appropriate candlestick entry or create a new one
-                if not candlestick_data[symbol][timeframe] or timestamp >= candlestick_data[symbol][timeframe][-1]['end_time']:
-                    # Create a new candlestick entry
-                    candlestick_entry = {
-                        **{'symbol': symbol}, # thêm symbol cho dễ nhìn
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'open': price,
-                        'high': price,
-                        'low': price,
-                        'close': price
-                    }
-                    candlestick_data[symbol][timeframe].append(candlestick_entry)
-                else:
-                    # Update the existing candlestick entry
-                    candlestick_entry = candlestick_data[symbol][timeframe][-1]
-                    candlestick_entry['high'] = max(candlestick_entry['high'], price)
-                    candlestick_entry['low'] = min(candlestick_entry['low'], price)
-                    candlestick_entry['close'] = price
-
-    # Convert datetime objects to strings for JSON serialization
-    for symbol in candlestick_data:
-        for timeframe in candlestick_data[symbol]:
-            for entry in candlestick_data[symbol][timeframe]:
-                entry['start_time'] = entry['start_time'].strftime('%Y-%m-%dT%H:%M:%SZ')
-                entry['end_time'] = entry['end_time'].strftime('%Y-%m-%dT%H:%M:%SZ')
-
-    return candlestick_data
+        priced = [log for log in order_logs if 'Price' in log['parsed_message']]
+        if priced:
+            trades[symbol] = ([round(log['timestamp'] * 1_000_000) for log in priced],
+                              [float(log['parsed_message']['Price']) for log in priced],
+                              [int(log['parsed_message'].get('ExecutedQty', 0)) for log in priced])
+    return build_candlesticks(trades, timeframes)
 
 def check_date(date_input):
     # Ngày bạn muốn kiểm tra
@@ -1,11 +1,24 @@
 import os
 import json
-import re
-import gzip
+import time
+import heapq
+import pickle
+from itertools import dropwhile, takewhile
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from collections import defaultdict
 
+from candlesticks import build_candlesticks
+from log_pipeline import (PARSE_CACHE_VERSION, LinePrefilter, ParsedFileCache, FileTimeIndex, ReorderBuffer, StateCheckpointStore, list_log_files,
+                          iter_parsed_log_files, merge_ordered_streams, parse_log_file, select_log_files_by_time)
+from log_time import parse_log_time
+from message_parser import parse_handler_message
+from message_types import MessageTypeResolver
+from order_records import make_record, record_to_json
+from order_book import OrderBookEngine
+from order_index import PriceLevelIndex, SymbolTimeIndex
+from order_state import OrderStateEngine, feed_order_key
+
 FILTER_ONLY_EXECUTED = False
 USE_SYMBOL_FILTER = True  # Set to False to disable symbol filtering
 USE_TIME_FILTER = False  # Set to False to disable time filtering
@@ -14,147 +27,239 @@ USE_TIME_AND_PRICE_FILTER = False
 GET_LOG_ORDER = True
 GET_LOG_QUOTE = False
 
-ORDER_MESSAGE_TYPES = ['AddOrderMessage', 'OrderExecutedMessage', 'ModifyOrderMessage', 'DeleteOrderMessage']
+PARALLEL_WORKERS = 1  # > 1 parses rotated files in a process pool, None = use all CPUs
+
+ORDER_MESSAGE_TYPES = ['AddOrderMessage', 'OrderExecutedMessage', 'ModifyOrderMessage', 'DeleteOrderMessage', 'ReduceSizeMessage', 'TradeMessage']
 MESSAGE_TYPES = ['AuctionUpdateMessage']
+MESSAGE_TYPE_RESOLVER = MessageTypeResolver(ORDER_MESSAGE_TYPES if GET_LOG_ORDER else MESSAGE_TYPES if GET_LOG_QUOTE else [])
+
+# Lọc nhanh theo bytes trước khi json.loads, đặt None để decode mọi dòng
+LINE_PREFILTER = LinePrefilter(required=['message_handler'], any_of=ORDER_MESSAGE_TYPES if GET_LOG_ORDER else MESSAGE_TYPES)
+
+# Mỗi file rotate gần đúng thứ tự feed: giữ tối đa FEED_REORDER_WINDOW message để sắp lại trước khi merge các file
+FEED_REORDER_WINDOW = 1024
+FEED_REORDER_BUFFER = ReorderBuffer(feed_order_key, FEED_REORDER_WINDOW)
 
 symbol = ['ALL']  # Symbol to filter for
 # Time range filter parameters 
 START_TIME = 1744167695764000 
 END_TIME = 1744167776676000  
-
-# Hàm đọc dữ liệu từ file log và chuyển đổi JSON sang dictionary
-# def load_log_data(file_path):
-#     log_entries = []
-#     if os.path.isfile(file_path) and file_path.endswith('.gz'):
-#         print(f"Reading log file: {file_path}")
-#         with gzip.open(file_path, 'rt') as file:
-#             for line in file:
-#                 log_entries.append(json.loads(line))
-#     elif os.path.isfile(file_path) and file_path.endswith('.log'):
-#         print(f"Reading log file: {file_path}")
-#         with open(file_path, 'r') as file:
-#             for line in file:
-#                 log_entries.append(json.loads(line))
-#     return log_entries
-
-def load_log_data(file_path):
-    log_entries = []
-    
-    if os.path.isfile(file_path) and file_path.endswith('.gz'):
-        print(f"Reading log file: {file_path}")
-        # Use encoding='utf-8' and errors='replace' to handle problematic characters
-        with gzip.open(file_path, 'rt', encoding='utf-8', errors='replace') as file:
-            for line in file:
-                try:
-                    log_entries.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON in file {file_path}: {e}")
-                    continue
-    
-    elif os.path.isfile(file_path) and file_path.endswith('.log'):
-        print(f"Reading log file: {file_path}")
-        # Also use encoding='utf-8' and errors='replace' for .log files
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
-            for line in file:
-                try:
-                    log_entries.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON in file {file_path}: {e}")
-                    continue
-    
-    return log_entries
-
-# Hàm đọc tất cả dữ liệu log từ thư mục
-def load_all_log_data(folder_path):
-    log_entries = []
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
-        log_entries.extend(load_log_data(file_path))
-    return log_entries
-
-# Hàm trích xuất nội dung JSON từ chuỗi log
-def extract_object(input_string):
-    match = re.search(r'\{(.*)\}', input_string)
-    if match:
-        content = match.group(1)
-
-        # Convert the content into a dictionary
-        content_dict = {}
-        for item in content.split(', '):
-            key, value = item.split(':', 1)
-            key = key.strip()
-            value = value.strip().strip('"')
-            content_dict[key] = value
-
-        return content_dict
-    else:
-        return None
+TARGET_PRICE = 34.36  # Giá cần tìm khi USE_TIME_AND_PRICE_FILTER = True
+# Các khoảng (start, end) micro giây export thêm từ cùng một lần load, tra bằng SymbolTimeIndex (không quét lại log)
+# vd [(1747106800000000, 1747106860000000), (1747106830000000, 1747106845000000)]
+TIME_WINDOWS = []
+# Các giá export thêm từ cùng một lần load (mỗi giá một file, cùng điều kiện với TARGET_PRICE), tra bằng PriceLevelIndex
+# vd [64.31, 64.33, 64.39]
+TARGET_PRICES = []
+# Order book bid/ask theo symbol dựng thẳng từ message: ghi top-N depth tại mỗi thời điểm (micro giây) trong DEPTH_TIMES
+# vd [1747106800000000, 1747106830000000], [] = không dựng book
+DEPTH_TIMES = []
+DEPTH_TOP_N = 10
+# Các khung nến cần dựng, bất kỳ '<số><s|m|h|d>' (vd '1s', '5s', '5m', '15m', '30m', '4h'); khung lớn được gộp từ khung nhỏ nhất
+CANDLE_TIMEFRAMES = ['1m', '1h', '1d']
+
+# Khi USE_TIME_FILTER bật: bỏ qua các file rotate không thể chứa message trong START_TIME..END_TIME,
+# dựa vào thời gian trong tên file và sidecar index min/max Timestamp ghi ở lần đọc đầu tiên
+PRUNE_FILES_BY_TIME = True
+PRUNE_KEEP_HISTORY = True  # False: bỏ cả các file trước START_TIME (nhanh hơn, nhưng order được add trước đó sẽ thiếu Symbol/Price)
+# Lưu ý: với PRUNE_KEEP_HISTORY = True chỉ các file sau khoảng bị bỏ, một khoảng ngắn cuối ngày vẫn decode gần như mọi file.
+# PRUNE_FROM_CHECKPOINT = True: lấy lịch sử từ checkpoint order book (BOOK_CHECKPOINTS) gần nhất trước khoảng và bỏ cả các
+# file trước checkpoint; lượt đầu chưa có checkpoint vẫn đọc đủ lịch sử rồi ghi checkpoint cho các lần sau, nên không nhanh
+# hơn PRUNE_KEEP_HISTORY (vd khoảng 10s cuối ngày trên today/, chưa có cache: lượt đầu ~8.7s so với ~7.1s, vì ghi thêm checkpoint; các lượt sau ~0.1s thay vì ~1.3s)
+PRUNE_FROM_CHECKPOINT = True
+
+# Follow mode: chỉ xử lý các file .gz mới rotate, lưu trạng thái vào checkpoint giữa các lần chạy
+FOLLOW_MODE = False
+FOLLOW_POLL_SECONDS = 0  # 0 = chạy một lượt rồi thoát, > 0 = poll liên tục
+FOLLOW_CHECKPOINT = 'follow_checkpoint.pkl'
+# Mỗi lượt chỉ ghi thêm message mới vào journal cạnh checkpoint; khi journal lớn hơn checkpoint thì ghi lại checkpoint đầy đủ
+FOLLOW_JOURNAL = FOLLOW_CHECKPOINT + '.journal'
+# Mỗi symbol một file grouped/executed/candles, mỗi lượt chỉ ghi lại file của các symbol có message mới
+FOLLOW_OUTPUT_DIR = 'follow_output'
+
+# Đẩy bộ lọc symbol/time xuống bước ingest (OrderStateEngine) thay vì lọc sau khi đã nhóm mọi symbol, kết quả export không đổi
+# (follow mode giữ state của mọi symbol để đổi bộ lọc không phải đọc lại log)
+PUSHDOWN_FILTERS = True
+
+# Cache kết quả parse của từng file (theo path, size, mtime), đặt None để luôn parse lại
+# Tag không chứa symbol: cache, sidecar index và checkpoint giữ mọi symbol, đổi symbol hay ALL không phải decode lại log
+PARSE_TAG = repr((GET_LOG_ORDER, GET_LOG_QUOTE, ORDER_MESSAGE_TYPES, MESSAGE_TYPES))
+PARSE_CACHE = ParsedFileCache('.parse_cache', tag=PARSE_TAG)
+# Sidecar index min/max Timestamp của từng file, cùng tag với cache
+FILE_TIME_INDEX = FileTimeIndex('.parse_cache', tag=PARSE_TAG)
+
+# Chỉ khi không dùng cache: AddOrderMessage/TradeMessage không chứa Symbol:"<symbol> bị bỏ trước parse_handler_message
+# (có cache thì file được parse đủ mọi symbol một lần, bộ lọc symbol áp sau khi nạp trong OrderStateEngine)
+PARSE_SYMBOL = symbol[0] if PUSHDOWN_FILTERS and USE_SYMBOL_FILTER and GET_LOG_ORDER and not FOLLOW_MODE and PARSE_CACHE is None else None
+PARSE_SYMBOL_MARKER = f'Symbol:"{PARSE_SYMBOL}' if PARSE_SYMBOL is not None else None
+
+# Checkpoint order book cạnh parse cache, mỗi BOOK_CHECKPOINT_SECONDS giây feed; đặt None để không đọc/ghi checkpoint
+BOOK_CHECKPOINT_SECONDS = 60
+# Giữ tối đa số checkpoint này (bỏ các checkpoint sớm nhất trước), ~7 giờ feed với BOOK_CHECKPOINT_SECONDS = 60;
+# checkpoint của các file log đã rotate đi (hoặc đã đổi) bị xoá mỗi lần chạy
+BOOK_CHECKPOINT_LIMIT = 420
+# Book trong checkpoint giữ mọi symbol có trong message đã parse (chỉ hẹp lại khi PARSE_SYMBOL lọc lúc parse)
+BOOK_CHECKPOINTS = StateCheckpointStore('.parse_cache', tag=repr((PARSE_TAG, PARSE_SYMBOL)), max_checkpoints=BOOK_CHECKPOINT_LIMIT)
+# True: chỉ tính depth tại DEPTH_TIMES (nạp checkpoint gần nhất trước đó rồi replay phần đuôi), không nhóm/export order
+DEPTH_ONLY = False
+
+# Khoảng Timestamp (min, max) của các message đã parse trong một file
+def get_time_span(entries):
+    timestamps = [e.message_timestamp for e in entries if e.message_timestamp is not None]
+    return (min(timestamps), max(timestamps)) if timestamps else None
+
+# Ghi sidecar index min/max Timestamp cho file lần đầu được parse (không ghi từ lượt parse đã lọc theo PARSE_SYMBOL, khoảng có thể hẹp hơn)
+def index_file_time_span(file_path, time_span):
+    if FILE_TIME_INDEX is not None and PARSE_SYMBOL_MARKER is None and time_span is not None and FILE_TIME_INDEX.load(file_path) is None:
+        FILE_TIME_INDEX.store(file_path, *time_span)
+
+# Bỏ file theo thời gian chỉ khi không làm thay đổi kết quả export
+def prune_files_by_time():
+    return USE_TIME_FILTER and PRUNE_FILES_BY_TIME and not FILTER_ONLY_EXECUTED
+
+# Khoảng (start, end) cần giữ file: START_TIME..END_TIME, mọi khoảng trong TIME_WINDOWS và mọi thời điểm trong DEPTH_TIMES
+def prune_time_range():
+    depth_times = DEPTH_TIMES if GET_LOG_ORDER else []
+    prune_start = min([START_TIME] + [start_time for start_time, _ in TIME_WINDOWS] + depth_times)
+    prune_end = max([END_TIME] + [end_time for _, end_time in TIME_WINDOWS] + depth_times)
+    return prune_start, prune_end
+
+# Cần lịch sử trước khoảng: enrich order add trước START_TIME, và book tại một thời điểm cần mọi message từ đầu log
+def keeps_history():
+    return PRUNE_KEEP_HISTORY or bool(DEPTH_TIMES and GET_LOG_ORDER)
+
+# Hàm đọc và phân tích log theo từng file (dùng cache nếu có), song song nếu PARALLEL_WORKERS > 1
+def load_parsed_log_data(folder_path):
+    file_paths = list_log_files(folder_path)
+    prune_by_time = prune_files_by_time()
+    prune_start, prune_end = prune_time_range()
+    if prune_by_time:
+        selected = select_log_files_by_time(file_paths, prune_start, prune_end, FILE_TIME_INDEX, keeps_history())
+        print(f"Time range {prune_start}..{prune_end} selects {len(selected)} of {len(file_paths)} log files")
+        file_paths = selected
+    return merge_file_streams(read_file_streams(file_paths, prune_end if prune_by_time else None))
+
+# Đọc các file thành list record (mỗi file một list), dừng ở file đầu tiên bắt đầu sau stop_after nếu có
+def read_file_streams(file_paths, stop_after=None):
+    file_streams = []
+    for file_path, entries in iter_parsed_log_files(file_paths, parse_log_entry, LINE_PREFILTER, PARALLEL_WORKERS, PARSE_CACHE, print):
+        time_span = get_time_span(entries)
+        index_file_time_span(file_path, time_span)
+        if stop_after is not None and time_span is not None and time_span[0] > stop_after:
+            # Các file rotate sau chứa dữ liệu feed muộn hơn => dừng đọc
+            print(f"{file_path} starts after {stop_after}, skipping remaining files")
+            break
+        file_streams.append(entries)
+    if LINE_PREFILTER is not None:
+        print(LINE_PREFILTER.summary())
+    return file_streams
+
+# Như load_parsed_log_data, nhưng lịch sử trước khoảng lấy từ checkpoint order book gần nhất trước prune_start:
+# trả về (parsed_log, history), history = (checkpoint_time, OrderBookEngine) và parsed_log chỉ còn message sau checkpoint_time.
+# Chưa có checkpoint (history = None) thì đọc đủ lịch sử như cũ và ghi checkpoint cho các lần chạy sau: lượt đầu không nhanh hơn
+# PRUNE_KEEP_HISTORY (order trong khoảng có thể được add từ file đầu tiên, kể cả order có từ trước log, nên không biết trước
+# file nào là đủ), chỉ các lượt sau mới bắt đầu từ checkpoint
+def load_parsed_log_history(folder_path):
+    if not (prune_files_by_time() and keeps_history() and PRUNE_FROM_CHECKPOINT and BOOK_CHECKPOINTS is not None and GET_LOG_ORDER):
+        return load_parsed_log_data(folder_path), None
+    prune_book_checkpoints()
+    file_paths = list_log_files(folder_path)
+    prune_start, prune_end = prune_time_range()
+    # Checkpoint trước prune_start chỉ cần các file bắt đầu từ trước đó, không parse các file sau khoảng
+    file_spans = load_file_time_spans(file_paths, prune_start - 1)
+    checkpoint = BOOK_CHECKPOINTS.load_before(prune_start - 1, file_spans)
+    if checkpoint is None:
+        parsed_log = load_parsed_log_data(folder_path)
+        store_book_checkpoints(parsed_log, file_spans, prune_start - 1)
+        return parsed_log, None
+    checkpoint_time, order_book = checkpoint
+    # File rotate trước checkpoint chỉ chứa message <= checkpoint_time, đã có trong book
+    selected = select_log_files_by_time(file_paths, checkpoint_time + 1, prune_end, FILE_TIME_INDEX, keep_history=False)
+    print(f"Time range {prune_start}..{prune_end} from checkpoint {checkpoint_time} "
+          f"({len(order_book.orders)} resting orders) selects {len(selected)} of {len(file_paths)} log files")
+    parsed_log = merge_file_streams(read_file_streams(selected, prune_end))
+    return list(dropwhile(lambda log: (log.message_timestamp or 0) <= checkpoint_time, parsed_log)), checkpoint
+
+# Xoá các checkpoint không bao giờ dùng lại được (file log đã rotate đi hoặc đã đổi), một lần mỗi lượt chạy
+def prune_book_checkpoints():
+    removed = BOOK_CHECKPOINTS.prune() if BOOK_CHECKPOINTS is not None else 0
+    if removed:
+        print(f"Removed {removed} stale order book checkpoints")
+
+# Ghi checkpoint order book mỗi BOOK_CHECKPOINT_SECONDS giây feed cho tới until (lượt đọc đủ lịch sử đầu tiên)
+def store_book_checkpoints(parsed_log, file_spans, until):
+    order_book = OrderBookEngine()
+    order_book.replay(parsed_log, until, BOOK_CHECKPOINT_SECONDS * 1_000_000,
+                      lambda timestamp: BOOK_CHECKPOINTS.store(timestamp, order_book, file_spans))
+
+# Ghép các file (mỗi file gần đúng thứ tự feed) bằng k-way merge => list theo thứ tự feed, các bước sau không cần sort lại
+def merge_file_streams(file_streams):
+    parsed_log = list(merge_ordered_streams(file_streams, FEED_REORDER_BUFFER))
+    if FEED_REORDER_BUFFER.late:
+        print(FEED_REORDER_BUFFER.summary())
+    return parsed_log
 
 # Hàm lấy loại thông điệp từ chuỗi log (AddOrderMessage, ModifyOrderMessage, v.v.)
-def get_message_type(input_string):
-    if GET_LOG_ORDER:
-        for order_message_type in ORDER_MESSAGE_TYPES:
-            if (order_message_type in input_string):
-                return order_message_type
-    elif GET_LOG_QUOTE:
-        for message_type in MESSAGE_TYPES:
-            if (message_type in input_string):
-                return message_type
-    return None
+# Tra theo caller (message_handler.go:<dòng>) rồi xác nhận token common.<Type>{, chỉ quét chuỗi khi không có token
+def get_message_type(caller, input_string):
+    return MESSAGE_TYPE_RESOLVER.resolve(caller, input_string)
 
 # Hàm chuyển đổi chuỗi thời gian thành timestamp (2024-03-01T12:30:45Z -> 1709203845)
 # def convert_to_timestamp(time_string):
 #     dt_object = datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%SZ')
 #     return dt_object.timestamp()
 
+# Cùng kết quả với datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S%z').timestamp(), nhưng đọc layout cố định và nhớ các giây đã gặp
 def convert_to_timestamp(time_string):
-    dt_object = datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S%z')
-    # timestamp() will return timestamp in local timzone if no tz is set explicitly => needs to force to utc tz before transforming to POSIX Timezone
-    # dt_object_utc = dt_object.replace(tzinfo=timezone.utc)
-    return dt_object.timestamp()
+    return parse_log_time(time_string)
 
 # Hàm phân tích từng dòng log
 def parse_log_entry(log):
     message = log['message']
-    if 'Unsupported' in message or 'Err: redis: nil' in message or 'message_handler' not in log.get('caller', ''):
+    caller = log.get('caller', '')
+    if 'Unsupported' in message or 'Err: redis: nil' in message or 'message_handler' not in caller:
         return None
     log['timestamp'] = convert_to_timestamp(log['time'])
-    message_type = get_message_type(message)
+    message_type = get_message_type(caller, message)
     if message_type is None:
         # print(f"Failed to get message type, {log}")
         return None
-    log['message_type'] = message_type
-    parsed_message = extract_object(message)
-    if parsed_message is None:
+    if PARSE_SYMBOL_MARKER is not None and message_type in ('AddOrderMessage', 'TradeMessage') and PARSE_SYMBOL_MARKER not in message:
+        # Order của symbol khác: không tạo order => các message sau của nó bị order state bỏ qua
+        return None
+    handler_message = parse_handler_message(message)
+    if handler_message is None:
         print(f"Failed to parse message object, {log}")
         return None
-    log['parsed_message'] = parsed_message
-    return log
+    # Record có kiểu (int/float đã chuyển sẵn), export lại đúng dạng parsed_message cũ qua record_to_json
+    try:
+        return make_record(log, message_type, handler_message)
+    except (KeyError, ValueError) as e:
+        print(f"Failed to build {message_type} record: {e}, {log}")
+        return None
 
 # Hàm check message có trong timeRange
 def is_in_time_range(message, start_timestamp_micros, end_timestamp_micros):
     """Check if a message timestamp is within the specified range"""
-    if 'parsed_message' in message:
-        message_timestamp = int(message['parsed_message'].get('Timestamp'))
-        return start_timestamp_micros <= message_timestamp <= end_timestamp_micros
+    if message.message_timestamp is not None:
+        return start_timestamp_micros <= message.message_timestamp <= end_timestamp_micros
     return False
 
 # Hàm check message có targetPrice
 def has_fixed_price(message, target_price):
     """Check if a message has a fixed price equal to target_price"""
-    try:
-        price = float(message.get('parsed_message', {}).get('Price'))
-        return price == target_price
-    except (TypeError, ValueError):
-        return False
+    return message.price == target_price
 
 
 # Hàm lọc order với targetPrice và timeRange
-def filter_orders_by_price_and_time_range(logs, target_price, start_timestamp_micros, end_timestamp_micros):
+# price_index: PriceLevelIndex dựng từ chính logs => chỉ xét các order từng có giá này
+def filter_orders_by_price_and_time_range(logs, target_price, start_timestamp_micros, end_timestamp_micros, price_index=None):
     filtered_logs = {}
     for symbol_value, orders in logs.items():
-        for order_id, log_entries in orders.items():
-            has_price = any(has_fixed_price(entry, target_price) for entry in log_entries)
+        candidate_orders = orders if price_index is None else price_index.orders(symbol_value, target_price)
+        for order_id in candidate_orders:
+            log_entries = orders[order_id]
+            has_price = price_index is not None or any(has_fixed_price(entry, target_price) for entry in log_entries)
             has_time_in_range = any(is_in_time_range(entry, start_timestamp_micros, end_timestamp_micros)
                                    for entry in log_entries)
             
@@ -178,17 +283,11 @@ def filter_logs_by_time_range(logs, start_timestamp_micros, end_timestamp_micros
             # Check if any message in this order falls within the time range
             time_filtered_entries = []
             for entry in log_entries:
-                # Get the original timestamp from the parsed_message
-                entry_timestamp_micros = int(entry['parsed_message'].get('Timestamp'))
+                # Timestamp của message (micro giây) đã được chuyển sang int khi parse
+                entry_timestamp_micros = entry.message_timestamp
                 
-                if entry_timestamp_micros:
-                    try:                                     
-                        # Check if the message timestamp is within the range
-                        if start_timestamp_micros <= entry_timestamp_micros <= end_timestamp_micros:
-                            time_filtered_entries.append(entry)
-                    except (ValueError, TypeError):
-                        # If we can't parse the timestamp, skip this entry
-                        continue
+                if entry_timestamp_micros and start_timestamp_micros <= entry_timestamp_micros <= end_timestamp_micros:
+                    time_filtered_entries.append(entry)
                     
             # Only include orders that have at least one message within the time range
             if time_filtered_entries:
@@ -214,140 +313,73 @@ def filter_logs_contain_message_type(logs, message_type):
     filtered_logs = {}
     for symbol, orders in logs.items():
         for order_id, log_entries in orders.items():
-            if any(entry['message_type'] == message_type for entry in log_entries):
+            if any(entry.message_type == message_type for entry in log_entries):
                 if symbol not in filtered_logs:
                     filtered_logs[symbol] = {}
                 filtered_logs[symbol][order_id] = log_entries
     return filtered_logs
 
+# Message của mỗi order đã theo thứ tự feed => k-way merge các order thay vì sort lại cả symbol
 def extract_all_executed_message_by_symbol(logs):
     filtered_logs = {}
     for symbol, orders in logs.items():
+        executed_by_order = []
         for _, log_entries in orders.items():
-            for order_log in log_entries:
-                if (order_log['message_type'] == 'OrderExecutedMessage' and 'Price' in order_log['parsed_message']):
-                    if symbol not in filtered_logs:
-                        filtered_logs[symbol] = []
-                    filtered_logs[symbol].append(order_log)
-    for symbol, order_logs in filtered_logs.items():
-        sorted_logs = sorted(order_logs, key=lambda x: x['timestamp'])
-        filtered_logs[symbol] = sorted_logs
+            executed = [order_log for order_log in log_entries
+                        if order_log.message_type == 'OrderExecutedMessage' and order_log.price is not None]
+            if executed:
+                executed_by_order.append(executed)
+        if executed_by_order:
+            filtered_logs[symbol] = list(heapq.merge(*executed_by_order, key=feed_order_key))
 
     return filtered_logs
 
+# Order state cho một lượt chạy, với bộ lọc symbol/time áp ngay khi apply nếu PUSHDOWN_FILTERS
+def make_order_state():
+    if not PUSHDOWN_FILTERS:
+        return OrderStateEngine()
+    symbols = symbol[:1] if USE_SYMBOL_FILTER else None
+    # FILTER_ONLY_EXECUTED cần cả lịch sử order (có Executed ngoài khoảng thời gian), TIME_WINDOWS cần cả ngày => lọc time sau khi nhóm
+    if USE_TIME_FILTER and not FILTER_ONLY_EXECUTED and not TIME_WINDOWS:
+        return OrderStateEngine(symbols, START_TIME, END_TIME)
+    return OrderStateEngine(symbols)
+
 # Hàm nhóm và sắp xếp các log theo symbol và order id
-def group_and_sort_logs(parsed_logs):
+# history: (checkpoint_time, OrderBookEngine) từ load_parsed_log_history => order state bắt đầu từ các order đang nằm trong book
+def group_and_sort_logs(parsed_logs, history=None):
     if GET_LOG_ORDER:
-        # Map OrderID:Symbol
-        order_id_symbol_map = {}
-        for log in parsed_logs:
-            if log['message_type'] == 'AddOrderMessage':
-                order_id = log['parsed_message']['OrderID']
-                symbol = log['parsed_message']['Symbol']
-                order_id_symbol_map[order_id] = symbol
-
-        # Group logs by OrderID
-        grouped_logs = defaultdict(lambda: defaultdict(list))
-        for log in parsed_logs:
-            order_id_raw = log['parsed_message']['OrderID']
-             # Chỉ split nếu order_id_raw chứa dấu "
-            order_id = order_id_raw.split('"')[0] if '"' in order_id_raw else order_id_raw
-
-            if order_id in order_id_symbol_map:
-                symbol = order_id_symbol_map[order_id]
-                grouped_logs[symbol][order_id].append(log)
-
-        # Sort each group by timestamp
-        for symbol, order_logs in grouped_logs.items():
-            for order_id, messages in order_logs.items():
-                # Custom sort key: first by timestamp, then by message type priority
-                messages.sort(key=lambda x: (
-                    x['timestamp'],
-                    # Priority order: AddOrderMessage first, DeleteOrderMessage last, others in between
-                    0 if x['message_type'] == 'AddOrderMessage' else 
-                    2 if x['message_type'] == 'DeleteOrderMessage' else 1
-                ))
+        # parsed_logs đã theo thứ tự feed (merge_file_streams), đưa vào order state: nhóm theo symbol/order và bổ sung Price, SideIndicator, Quantity ngay khi tới
+        order_state = make_order_state()
+        if history is not None:
+            order_state.seed(history[1])
+        if order_state.end_time is not None:
+            # Theo thứ tự feed => message đầu tiên sau END_TIME là hết phần cần export
+            parsed_logs = takewhile(lambda log: (log.message_timestamp or 0) <= order_state.end_time, parsed_logs)
+        order_state.apply_all(parsed_logs)
+        if order_state.skipped_orders:
+            print(f"Skipped {order_state.skipped_orders} orders of other symbols, {order_state.unknown_order_messages} messages of unknown orders")
+        grouped_logs = order_state.grouped
     elif GET_LOG_QUOTE:
         # Map OrderID:Symbol
         order_id_symbol_map = {}
         for log in parsed_logs:
-            if log['message_type'] == 'AuctionUpdateMessage':
-                order_id = log['parsed_message']['Symbol']
-                symbol = log['parsed_message']['Symbol']
-                order_id_symbol_map[order_id] = symbol
+            if log.message_type == 'AuctionUpdateMessage':
+                order_id_symbol_map[log.symbol] = log.symbol
 
         # Group logs by OrderID
         grouped_logs = defaultdict(list)
         for log in parsed_logs:
-            order_id = log['parsed_message']['Symbol']
+            order_id = log.symbol
             if order_id in order_id_symbol_map:
                 symbol = order_id_symbol_map[order_id]
                 grouped_logs[symbol].append(log)
 
         # Sort each group by timestamp
         for symbol, order_logs in grouped_logs.items():
-            order_logs.sort(key=lambda x: x['timestamp'])
+            order_logs.sort(key=lambda x: x.timestamp)
 
     return grouped_logs
 
-# Hàm cập nhật thông điệp OrderExecutedMessage với giá trị Price từ thông điệp ModifyOrderMessage hoặc AddOrderMessage
-def update_order_executed_messages(grouped_sorted_logs):
-    for symbol, order_logs in grouped_sorted_logs.items():
-        for _, messages in order_logs.items():
-            last_modify_order_message = None
-            add_order_message = None
-            last_executed_order_message = None  # Initialize this variable here
-            
-            for message in messages:
-                message['parsed_message']['Symbol'] = symbol
-                
-                if message['message_type'] == 'AddOrderMessage':
-                    add_order_message = message
-                
-                elif message['message_type'] == 'ModifyOrderMessage':
-                    last_modify_order_message = message
-                    # Check if add_order_message exists before accessing it
-                    if add_order_message and 'parsed_message' in add_order_message:
-                        message['parsed_message']['SideIndicator'] = add_order_message['parsed_message']['SideIndicator']
-                    else:
-                        message['parsed_message']['SideIndicator'] = None  # Default value
-                
-                elif message['message_type'] == 'OrderExecutedMessage':
-                    # Check if add_order_message exists before accessing it
-                    if add_order_message and 'parsed_message' in add_order_message:
-                        message['parsed_message']['SideIndicator'] = add_order_message['parsed_message']['SideIndicator']
-                    else:
-                        message['parsed_message']['SideIndicator'] = None  # Default value
-                    
-                    if last_modify_order_message:
-                        message['parsed_message']['Price'] = last_modify_order_message['parsed_message']['Price']
-                    elif add_order_message:
-                        message['parsed_message']['Price'] = add_order_message['parsed_message']['Price']
-                    
-                    last_executed_order_message = message
-                
-                elif message['message_type'] == 'DeleteOrderMessage':
-                    # Check if add_order_message exists before accessing it
-                    if add_order_message and 'parsed_message' in add_order_message:
-                        message['parsed_message']['SideIndicator'] = add_order_message['parsed_message']['SideIndicator']
-                    else:
-                        message['parsed_message']['SideIndicator'] = None  # Default value
-                    
-                    if last_modify_order_message:
-                        message['parsed_message']['OrderID'] = last_modify_order_message['parsed_message']['OrderID']
-                        message['parsed_message']['Price'] = last_modify_order_message['parsed_message']['Price']
-                        if last_executed_order_message:
-                            message['parsed_message']['Quantity'] = str(int(last_modify_order_message['parsed_message']['Quantity']) - int(last_executed_order_message['parsed_message']['ExecutedQty']))
-                        else:
-                            message['parsed_message']['Quantity'] = last_modify_order_message['parsed_message']['Quantity']
-                    elif add_order_message:
-                        message['parsed_message']['OrderID'] = add_order_message['parsed_message']['OrderID']
-                        message['parsed_message']['Price'] = add_order_message['parsed_message']['Price']
-                        if last_executed_order_message:
-                            message['parsed_message']['Quantity'] = str(int(add_order_message['parsed_message']['Quantity']) - int(last_executed_order_message['parsed_message']['ExecutedQty']))
-                        else:
-                            message['parsed_message']['Quantity'] = add_order_message['parsed_message']['Quantity']
-
 # # Hàm cập nhật thông điệp OrderExecutedMessage với giá trị Price từ thông điệp ModifyOrderMessage hoặc AddOrderMessage
 # def update_order_executed_messages(grouped_sorted_logs):
 #     for symbol, order_logs in grouped_sorted_logs.items():
@@ -399,7 +431,19 @@ def round_datetime(timestamp: datetime, timeframe: str) -> datetime:
         return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
     raise ValueError(f"Timeframe không hợp lệ: {timeframe}")
 
-def construct_candlestick_data(logs, timeframes=['1m', '1h', '1d']):
+# Dựng nến (OHLC, volume, số trade, VWAP) từ mảng timestamp (micro giây), giá và ExecutedQty của từng symbol:
+# một lượt qua trade cho khung nhỏ nhất, các khung lớn hơn gộp từ nến đó (numpy nếu có)
+def construct_candlestick_data(logs, timeframes=None):
+    trades = {}
+    for symbol, order_logs in logs.items():
+        # executed msgs của symbol đã theo thứ tự feed (extract_all_executed_message_by_symbol)
+        priced = [log for log in order_logs if log.price is not None]
+        trades[symbol] = ([round(log.timestamp * 1_000_000) for log in priced], [log.price for log in priced],
+                          [log.executed_qty for log in priced])
+    return build_candlesticks(trades, CANDLE_TIMEFRAMES if timeframes is None else timeframes)
+
+# Cách dựng nến cũ, từng trade một qua datetime/ZoneInfo: giữ lại để so kết quả (test/6_benchmark_candlesticks.py)
+def construct_candlestick_data_by_trade(logs, timeframes=['1m', '1h', '1d']):
     # Define the time delta based on the timeframe
     time_deltas = {
         '1m': timedelta(minutes=1),
@@ -412,8 +456,7 @@ def construct_candlestick_data(logs, timeframes=['1m', '1h', '1d']):
 
     # Iterate over each log entry
     for symbol, order_logs in logs.items():
-        #sort all executed msgs according to symbol
-        order_logs.sort(key=lambda x:x['timestamp'])
+        # executed msgs của symbol đã theo thứ tự feed (extract_all_executed_message_by_symbol)
 
         # Initialize the symbol entry if not present
         if symbol not in candlestick_data:
@@ -421,13 +464,13 @@ def construct_candlestick_data(logs, timeframes=['1m', '1h', '1d']):
 
         for log in order_logs:
             # Bỏ qua nếu không có giá            
-            if ('Price' not in log['parsed_message']):
+            if log.price is None:
                 continue
 
             try:
                 # Xử lý timestamp và giá
-                timestamp = datetime.fromtimestamp(log['timestamp'], timezone.utc)
-                price = float(log['parsed_message']['Price'])
+                timestamp = datetime.fromtimestamp(log.timestamp, timezone.utc)
+                price = log.price
 
                 for timeframe in timeframes:
                     # Tính toán thời gian bắt đầu/kết thúc
@@ -488,21 +531,8 @@ def check_date(date_input):
     else:
         return False
     
-# Hàm chính xuất kết quả vào file JSON
-def main():
-    log_data = load_all_log_data('today')
-    print('Successfully loaded all log data')
-
-    print('Parsing log data...')
-    parsed_log = list(filter(None, map(parse_log_entry, log_data)))
-
-    print('Grouping logs by symbol and order id...')
-    grouped_sorted_order_logs = group_and_sort_logs(parsed_log)
-
-    if GET_LOG_ORDER:
-        update_order_executed_messages(grouped_sorted_order_logs)
-
-
+# Hàm áp dụng các bộ lọc không theo thời gian (executed, symbol) lên log đã nhóm
+def filter_logs_by_order(grouped_sorted_order_logs):
     if FILTER_ONLY_EXECUTED:
         logs_to_export = filter_logs_contain_message_type(grouped_sorted_order_logs, 'OrderExecutedMessage')
     else:
@@ -510,35 +540,312 @@ def main():
 
     if USE_SYMBOL_FILTER:
         logs_to_export = filter_logs_by_symbol(logs_to_export, symbol[0])
-    
+    return logs_to_export
+
+# Hàm áp dụng các bộ lọc export (executed, symbol, time, price) lên log đã nhóm
+def filter_logs_for_export(grouped_sorted_order_logs, time_index=None):
+    logs_to_export = filter_logs_by_order_and_time(grouped_sorted_order_logs, time_index)
+    return filter_logs_by_target_price(logs_to_export)
+
+# Hàm áp dụng các bộ lọc executed, symbol, time
+# time_index: SymbolTimeIndex dựng từ filter_logs_by_order(...) => khoảng thời gian tra bằng binary search
+def filter_logs_by_order_and_time(grouped_sorted_order_logs, time_index=None):
+    logs_to_export = filter_logs_by_order(grouped_sorted_order_logs)
+
     if USE_TIME_FILTER:
         print(f"Filtering logs by timestamp range: {START_TIME} to {END_TIME}")
-        logs_to_export = filter_logs_by_time_range(logs_to_export, START_TIME, END_TIME)
-    
+        if time_index is not None:
+            logs_to_export = time_index.window(START_TIME, END_TIME)
+        else:
+            logs_to_export = filter_logs_by_time_range(logs_to_export, START_TIME, END_TIME)
+    return logs_to_export
+
+# Hàm lọc theo TARGET_PRICE + timeRange (price_index dựng từ chính logs_to_export nếu có)
+def filter_logs_by_target_price(logs_to_export, price_index=None):
     if USE_TIME_AND_PRICE_FILTER:
-        target_price = 34.36
-        print(f"Filtering logs by target price: {target_price} and timestamp range: {START_TIME} to {END_TIME}")
-        logs_to_export = filter_orders_by_price_and_time_range(logs_to_export, target_price, START_TIME, END_TIME)
-
-    # Get the current datetime string
-    datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    all_executed_message_by_symbol = extract_all_executed_message_by_symbol(logs_to_export)
+        print(f"Filtering logs by target price: {TARGET_PRICE} and timestamp range: {START_TIME} to {END_TIME}")
+        logs_to_export = filter_orders_by_price_and_time_range(logs_to_export, TARGET_PRICE, START_TIME, END_TIME, price_index)
+    return logs_to_export
 
-    with open(f'all_executed_message_by_symbol_{datetime_str}.json', 'w') as f:
-        json.dump(all_executed_message_by_symbol, f, indent=4)
+# Hàm ghi các file kết quả JSON
+def export_results(logs_to_export, all_executed_message_by_symbol, candlestick_data, name_suffix):
+    with open(f'all_executed_message_by_symbol_{name_suffix}.json', 'w') as f:
+        json.dump(all_executed_message_by_symbol, f, indent=4, default=record_to_json)
 
-    candlestick_data = construct_candlestick_data(all_executed_message_by_symbol)
-    
-    with open(f'candlestick_data_{datetime_str}.json', 'w') as f:
+    with open(f'candlestick_data_{name_suffix}.json', 'w') as f:
         json.dump(candlestick_data, f, indent=4)
     
     print("Exporting to json file...")
     # Write the result to a JSON file
-    with open(f'grouped_by_symbol_{symbol[0]}_{datetime_str}.json', 'w') as f:
-        json.dump(logs_to_export, f, indent=4)
+    with open(f'grouped_by_symbol_{symbol[0]}_{name_suffix}.json', 'w') as f:
+        json.dump(logs_to_export, f, indent=4, default=record_to_json)
 
     print("Export complete")
 
+# Ghi thêm một file grouped cho mỗi khoảng trong TIME_WINDOWS
+def export_time_windows(time_index, name_suffix):
+    for start_time, end_time in TIME_WINDOWS:
+        window_logs = time_index.window(start_time, end_time)
+        message_count = sum(len(entries) for orders in window_logs.values() for entries in orders.values())
+        print(f"Window {start_time}..{end_time}: {message_count} messages")
+        with open(f'grouped_by_symbol_{symbol[0]}_{name_suffix}_{start_time}_{end_time}.json', 'w') as f:
+            json.dump(window_logs, f, indent=4, default=record_to_json)
+
+# Ghi thêm một file grouped cho mỗi giá trong TARGET_PRICES
+def export_target_prices(logs_to_export, price_index, name_suffix):
+    for target_price in TARGET_PRICES:
+        price_logs = filter_orders_by_price_and_time_range(logs_to_export, target_price, START_TIME, END_TIME, price_index)
+        order_count = sum(len(orders) for orders in price_logs.values())
+        print(f"Price {target_price}: {order_count} orders")
+        with open(f'grouped_by_symbol_{symbol[0]}_{name_suffix}_price_{target_price}.json', 'w') as f:
+            json.dump(price_logs, f, indent=4, default=record_to_json)
+
+# Dựng order book trong một lượt qua parsed_log (theo thứ tự feed), trả về (book, {thời điểm: top-N depth}) cho DEPTH_TIMES
+# history: (checkpoint_time, OrderBookEngine) => replay tiếp từ book của checkpoint (mọi DEPTH_TIMES đều sau checkpoint_time)
+def build_depth(parsed_log, history=None):
+    book_symbols = symbol[:1] if USE_SYMBOL_FILTER else None
+    order_book = OrderBookEngine(book_symbols) if history is None else history[1]
+    depth_by_time = {}
+    for depth_time, depth in order_book.replay_depth(parsed_log, DEPTH_TIMES, DEPTH_TOP_N, book_symbols):
+        depth_by_time[depth_time] = depth
+    return order_book, depth_by_time
+
+# Ghi top-N depth tại mỗi thời điểm trong DEPTH_TIMES
+def export_depth(parsed_log, name_suffix, history=None):
+    order_book, depth_by_time = build_depth(parsed_log, history)
+    print(f"Order book: {len(order_book.books)} symbols, {len(order_book.orders)} resting orders, depth at {len(depth_by_time)} times")
+    with open(f'depth_by_symbol_{symbol[0]}_{name_suffix}.json', 'w') as f:
+        json.dump(depth_by_time, f, indent=4)
+
+# Khoảng Timestamp của từng file: đọc từ FILE_TIME_INDEX, file chưa có index thì parse (qua cache) và ghi index
+def load_file_time_spans(file_paths, stop_after=None):
+    file_spans = {}
+    for file_path in file_paths:
+        time_span = FILE_TIME_INDEX.load(file_path) if FILE_TIME_INDEX is not None else None
+        if time_span is None:
+            time_span = get_time_span(parse_log_file(file_path, parse_log_entry, LINE_PREFILTER, PARSE_CACHE))
+            index_file_time_span(file_path, time_span)
+        file_spans[file_path] = time_span
+        if stop_after is not None and time_span is not None and time_span[0] > stop_after:
+            # Các file rotate sau bắt đầu còn muộn hơn, checkpoint tới stop_after không phụ thuộc vào chúng
+            break
+    return file_spans
+
+# Order book (mọi symbol, dùng chung checkpoint cho mọi bộ lọc symbol) tại depth_time: nạp checkpoint gần nhất trước đó rồi chỉ replay các file có message từ checkpoint tới depth_time
+# Replay ghi thêm checkpoint mỗi BOOK_CHECKPOINT_SECONDS để lần tra sau nhanh hơn
+def seek_order_book(file_paths, file_spans, depth_time):
+    checkpoint = BOOK_CHECKPOINTS.load_before(depth_time, file_spans) if BOOK_CHECKPOINTS is not None else None
+    if checkpoint is None:
+        checkpoint_time, order_book = None, OrderBookEngine()
+    else:
+        checkpoint_time, order_book = checkpoint
+    # Chỉ các file có message trong (checkpoint_time, depth_time]
+    tail_paths = [file_path for file_path, time_span in file_spans.items()
+                  if time_span is not None and time_span[0] <= depth_time
+                  and (checkpoint_time is None or time_span[1] > checkpoint_time)]
+    print(f"Depth at {depth_time}: checkpoint {checkpoint_time}, replaying {len(tail_paths)} of {len(file_paths)} log files")
+
+    file_streams = [parse_log_file(file_path, parse_log_entry, LINE_PREFILTER, PARSE_CACHE) for file_path in tail_paths]
+    messages = merge_ordered_streams(file_streams, FEED_REORDER_BUFFER)
+    if checkpoint_time is not None:
+        messages = dropwhile(lambda log: (log.message_timestamp or 0) <= checkpoint_time, messages)
+
+    def store_checkpoint(timestamp):
+        BOOK_CHECKPOINTS.store(timestamp, order_book, file_spans)
+
+    order_book.replay(messages, depth_time, BOOK_CHECKPOINT_SECONDS * 1_000_000,
+                      store_checkpoint if BOOK_CHECKPOINTS is not None else None)
+    return order_book
+
+# Depth-only: top-N depth tại mỗi thời điểm trong DEPTH_TIMES, mỗi thời điểm tra từ checkpoint
+def export_depth_from_checkpoints(folder_path, name_suffix):
+    prune_book_checkpoints()
+    file_paths = list_log_files(folder_path)
+    file_spans = load_file_time_spans(file_paths)
+    book_symbols = symbol[:1] if USE_SYMBOL_FILTER else None
+    depth_by_time = {}
+    for depth_time in sorted(DEPTH_TIMES):
+        order_book = seek_order_book(file_paths, file_spans, depth_time)
+        depth_by_time[depth_time] = order_book.depth(DEPTH_TOP_N, book_symbols)
+    with open(f'depth_by_symbol_{symbol[0]}_{name_suffix}.json', 'w') as f:
+        json.dump(depth_by_time, f, indent=4)
+
+# Cấu hình ảnh hưởng tới kết quả đã lưu trong checkpoint của follow mode
+def follow_config():
+    return (PARSE_CACHE_VERSION, GET_LOG_ORDER, ORDER_MESSAGE_TYPES, FILTER_ONLY_EXECUTED, USE_SYMBOL_FILTER, symbol[0],
+            USE_TIME_FILTER, USE_TIME_AND_PRICE_FILTER, TARGET_PRICE, START_TIME, END_TIME, CANDLE_TIMEFRAMES)
+
+def load_follow_checkpoint():
+    try:
+        with open(FOLLOW_CHECKPOINT, 'rb') as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        state = None
+    if state is None or state['config'][:3] != follow_config()[:3]:
+        # Chưa có checkpoint, đổi định dạng record hoặc đổi loại message => đọc lại từ đầu
+        if os.path.exists(FOLLOW_JOURNAL):
+            os.remove(FOLLOW_JOURNAL)
+        return {'config': follow_config(), 'files': set(), 'orders': OrderStateEngine(), 'executed': {}, 'candles': {}}
+    replay_follow_journal(state)
+    if state['config'] != follow_config():
+        # Chỉ đổi bộ lọc => giữ order state, tính lại executed/candles cho mọi symbol ở lần chạy này
+        state['config'] = follow_config()
+        state['executed'] = {}
+        state['candles'] = {}
+        state['refresh_all'] = True
+    return state
+
+# Áp lại các lượt đã ghi trong journal lên state của checkpoint; phần cuối ghi dở (bị ngắt giữa chừng) bị cắt bỏ,
+# các file của nó chưa được đánh dấu nên lượt sau đọc lại
+def replay_follow_journal(state):
+    if not os.path.exists(FOLLOW_JOURNAL):
+        return
+    with open(FOLLOW_JOURNAL, 'r+b') as f:
+        valid_end = 0
+        while True:
+            try:
+                entry = pickle.load(f)
+            except EOFError:
+                break
+            except (pickle.UnpicklingError, ValueError):
+                f.truncate(valid_end)
+                break
+            valid_end = f.tell()
+            state['orders'].apply_all(pickle.loads(entry['messages']))
+            state['files'].update(entry['files'])
+            update_follow_symbols(state, entry['touched'], entry['executed'], entry['candles'])
+
+def save_follow_checkpoint(state):
+    tmp_path = FOLLOW_CHECKPOINT + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, FOLLOW_CHECKPOINT)
+    if os.path.exists(FOLLOW_JOURNAL):
+        os.remove(FOLLOW_JOURNAL)
+
+# Ghi thêm một lượt vào journal (message mới ở dạng trước khi áp vào order state), chi phí theo lượng dữ liệu mới
+def append_follow_journal(entry):
+    with open(FOLLOW_JOURNAL, 'ab') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    if not os.path.exists(FOLLOW_CHECKPOINT) or os.path.getsize(FOLLOW_JOURNAL) > os.path.getsize(FOLLOW_CHECKPOINT):
+        return False
+    return True
+
+# Hàm thêm log mới vào order state, trả về các symbol bị thay đổi
+def merge_new_order_logs(state, parsed_logs):
+    return state['orders'].apply_all(parsed_logs)
+
+# Thay executed/candles của các symbol vừa tính lại
+def update_follow_symbols(state, touched_symbols, executed, candles):
+    for symbol_value in touched_symbols:
+        state['executed'].pop(symbol_value, None)
+        state['candles'].pop(symbol_value, None)
+    state['executed'].update(executed)
+    state['candles'].update(candles)
+
+# Ghi lại file của các symbol vừa đổi, symbol không còn gì để export thì xoá file cũ
+def export_follow_symbols(state, logs_to_export, touched_symbols):
+    os.makedirs(FOLLOW_OUTPUT_DIR, exist_ok=True)
+    for symbol_value in touched_symbols:
+        outputs = (('grouped_by_symbol', logs_to_export), ('all_executed_message_by_symbol', state['executed']),
+                   ('candlestick_data', state['candles']))
+        for name, data_by_symbol in outputs:
+            output_path = os.path.join(FOLLOW_OUTPUT_DIR, f'{name}_{symbol_value}.json')
+            if data_by_symbol.get(symbol_value):
+                with open(output_path, 'w') as f:
+                    json.dump({symbol_value: data_by_symbol[symbol_value]}, f, indent=4, default=record_to_json)
+            elif os.path.exists(output_path):
+                os.remove(output_path)
+
+# Hàm xử lý một lượt follow: chỉ đọc các file .gz đã rotate mà checkpoint chưa thấy
+# Lọc, export và checkpoint chỉ động tới các symbol có message mới, chi phí mỗi lượt theo dữ liệu mới chứ không theo cả ngày
+def follow_once(folder_path, state):
+    new_files = [f for f in list_log_files(folder_path) if f.endswith('.gz') and f not in state['files']]
+    refresh_all = state.pop('refresh_all', False)
+    if not new_files and not refresh_all:
+        return False
+
+    file_streams = []
+    for file_path in new_files:
+        print(f"Reading new log file: {file_path}")
+        file_streams.append(parse_log_file(file_path, parse_log_entry, LINE_PREFILTER, PARSE_CACHE))
+    parsed_log = merge_file_streams(file_streams)
+    # Record được enrich khi áp vào order state => journal giữ bản trước khi áp để lần nạp sau áp lại y hệt
+    messages_blob = pickle.dumps(parsed_log, protocol=pickle.HIGHEST_PROTOCOL)
+    touched_symbols = merge_new_order_logs(state, parsed_log)
+    if refresh_all:
+        touched_symbols = set(state['orders'].grouped)
+    state['files'].update(new_files)
+
+    # Chỉ lọc và tính lại executed/candles cho các symbol có message mới
+    grouped = state['orders'].grouped
+    logs_to_export = filter_logs_for_export({s: grouped[s] for s in touched_symbols if s in grouped})
+    executed = extract_all_executed_message_by_symbol(logs_to_export)
+    candles = construct_candlestick_data(executed)
+    update_follow_symbols(state, touched_symbols, executed, candles)
+
+    print(f"Ingested {len(new_files)} new file(s), {len(parsed_log)} messages, {len(touched_symbols)} symbol(s) updated")
+    export_follow_symbols(state, logs_to_export, touched_symbols)
+    journal_entry = {'files': new_files, 'messages': messages_blob, 'touched': touched_symbols, 'executed': executed, 'candles': candles}
+    if refresh_all or not append_follow_journal(journal_entry):
+        save_follow_checkpoint(state)
+    return True
+
+# Follow mode: xử lý tăng dần các file mới rotate trong ngày
+def follow(folder_path):
+    if not GET_LOG_ORDER:
+        print("Follow mode only supports order messages (GET_LOG_ORDER = True)")
+        return
+    state = load_follow_checkpoint()
+    while True:
+        follow_once(folder_path, state)
+        if not FOLLOW_POLL_SECONDS:
+            break
+        time.sleep(FOLLOW_POLL_SECONDS)
+
+# Hàm xử lý các log đã parse (nhóm, bổ sung, lọc, nến) và ghi kết quả, dùng chung với parse-cboe-all-analyses.py
+# history: checkpoint từ load_parsed_log_history, parsed_log khi đó chỉ chứa message sau checkpoint
+def process_parsed_logs(parsed_log, name_suffix, history=None):
+    print('Grouping logs by symbol and order id...')
+    grouped_sorted_order_logs = group_and_sort_logs(parsed_log, history)
+
+    time_index = None
+    if TIME_WINDOWS and GET_LOG_ORDER:
+        # Dựng index một lần, mọi khoảng thời gian (kể cả START_TIME..END_TIME) tra bằng binary search
+        time_index = SymbolTimeIndex(filter_logs_by_order(grouped_sorted_order_logs))
+        export_time_windows(time_index, name_suffix)
+    logs_to_export = filter_logs_by_order_and_time(grouped_sorted_order_logs, time_index)
+
+    price_index = None
+    if TARGET_PRICES and GET_LOG_ORDER:
+        # Dựng index giá một lần, mọi giá (kể cả TARGET_PRICE) tra theo (symbol, giá)
+        price_index = PriceLevelIndex(logs_to_export)
+        export_target_prices(logs_to_export, price_index, name_suffix)
+    logs_to_export = filter_logs_by_target_price(logs_to_export, price_index)
+
+    all_executed_message_by_symbol = extract_all_executed_message_by_symbol(logs_to_export)
+    candlestick_data = construct_candlestick_data(all_executed_message_by_symbol)
+    export_results(logs_to_export, all_executed_message_by_symbol, candlestick_data, name_suffix)
+
+    if DEPTH_TIMES and GET_LOG_ORDER:
+        # Sau group_and_sort_logs: order state đã chép các order của checkpoint, book của checkpoint giờ được replay tiếp
+        export_depth(parsed_log, name_suffix, history)
+
+# Hàm chính xuất kết quả vào file JSON
+def main():
+    if FOLLOW_MODE:
+        follow('today')
+        return
+    if DEPTH_ONLY and GET_LOG_ORDER:
+        export_depth_from_checkpoints('today', datetime.now().strftime("%Y%m%d_%H%M%S"))
+        return
+
+    print('Loading and parsing log data...')
+    parsed_log, history = load_parsed_log_history('today')
+
+    # Get the current datetime string
+    datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    process_parsed_logs(parsed_log, datetime_str, history)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
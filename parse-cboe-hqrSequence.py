@@ -1,10 +1,13 @@
 import os
 import json
-import re
-import gzip
-from datetime import datetime, timezone
+from datetime import datetime
 import logging
 
+from log_pipeline import LinePrefilter, list_log_files, iter_log_entries, load_parsed_log_data
+from log_time import parse_log_time
+from message_parser import parse_handler_message
+from sequence_check import SequenceGapDetector
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -13,115 +16,43 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 USE_TIME_FILTER = False  # Set to False to disable time filtering
+PARALLEL_WORKERS = 1  # > 1 parses rotated files in a process pool, None = use all CPUs
+STREAMING = True  # Validate while reading, without keeping the logs; False = load everything and also export the sorted logs
+SEQUENCE_REORDER_WINDOW = 256  # Packets held back per HdrUnit before a missing range is reported as a gap
+# Byte-level pre-filter applied before json.loads (None = decode every line)
+LINE_PREFILTER = LinePrefilter(required=["message_handler", "HdrSequence"])
 START_TIME = 1747106717235000
 END_TIME = 1747106717239000
 
 
 def load_log_data(file_path):
-    """Load log entries from a single file with proper error handling."""
-    log_entries = []
-
+    """Lazily yield log entries from a single file with proper error handling."""
     if not os.path.isfile(file_path):
         logger.warning(f"File does not exist: {file_path}")
-        return log_entries
-
+        return
+    if not file_path.endswith((".gz", ".log")):
+        logger.warning(f"Unsupported file format: {file_path}")
+        return
+    logger.info(f"Reading log file: {file_path}")
     try:
-        logger.info(f"Reading log file: {file_path}")
-
-        # Handle gzip compressed files
-        if file_path.endswith(".gz"):
-            open_func = lambda: gzip.open(
-                file_path, "rt", encoding="utf-8", errors="replace"
-            )
-        # Handle plain text log files
-        elif file_path.endswith(".log"):
-            open_func = lambda: open(file_path, "r", encoding="utf-8", errors="replace")
-        else:
-            logger.warning(f"Unsupported file format: {file_path}")
-            return log_entries
-
-        with open_func() as file:
-            for line_num, line in enumerate(file, 1):
-                try:
-                    log_entries.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    logger.error(
-                        f"Error parsing JSON in {file_path}, line {line_num}: {e}"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"Unexpected error reading {file_path}, line {line_num}: {e}"
-                    )
+        yield from iter_log_entries(file_path, LINE_PREFILTER)
     except Exception as e:
         logger.error(f"Failed to process file {file_path}: {e}")
 
-    return log_entries
-
 
 def load_all_log_data(folder_path):
-    """Load log data from all valid files in the specified folder."""
-    if not os.path.exists(folder_path):
-        logger.error(f"Folder does not exist: {folder_path}")
-        return []
-
-    log_entries = []
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
-        if os.path.isfile(file_path) and (
-            file_path.endswith(".gz") or file_path.endswith(".log")
-        ):
-            entries = load_log_data(file_path)
-            logger.info(f"Loaded {len(entries)} entries from {file_name}")
-            log_entries.extend(entries)
-
-    logger.info(f"Total log entries loaded: {len(log_entries)}")
-    return log_entries
-
-
-def extract_object(input_string):
-    """Extract JSON content from log message string."""
-    try:
-        match = re.search(r"\{(.*)\}", input_string)
-        if not match:
-            return None
-
-        content = match.group(1)
-
-        # More robust parsing of key-value pairs
-        content_dict = {}
-        # Split by commas, but not those inside quotes
-        items = re.findall(r"([^,]+:[^,]+)(?:,|$)", content)
-
-        for item in items:
-            if ":" not in item:
-                continue
-
-            key, value = item.split(":", 1)
-            key = key.strip()
-            value = value.strip().strip('"')
-            content_dict[key] = value
-
-        return content_dict
-    except Exception as e:
-        logger.error(f"Error parsing object: {e}, input: {input_string[:100]}...")
-        return None
+    """Lazily yield log data from all valid files in the specified folder."""
+    for file_path in list_log_files(folder_path):
+        yield from load_log_data(file_path)
 
 
 def convert_to_timestamp(time_string):
-    """Convert ISO format time string to UNIX timestamp."""
+    """Convert ISO format time string to UNIX timestamp (memoized per distinct second)."""
     try:
-        # Handle ISO format with timezone
-        dt_object = datetime.strptime(time_string, "%Y-%m-%dT%H:%M:%S%z")
-        return dt_object.timestamp()
-    except ValueError:
-        try:
-            # Handle ISO format without timezone (assume UTC)
-            dt_object = datetime.strptime(time_string, "%Y-%m-%dT%H:%M:%SZ")
-            dt_object = dt_object.replace(tzinfo=timezone.utc)
-            return dt_object.timestamp()
-        except ValueError as e:
-            logger.error(f"Failed to parse timestamp: {time_string}, error: {e}")
-            return 0
+        return parse_log_time(time_string)
+    except ValueError as e:
+        logger.error(f"Failed to parse timestamp: {time_string}, error: {e}")
+        return 0
 
 
 def parse_log_entry(log):
@@ -146,12 +77,14 @@ def parse_log_entry(log):
         if "time" in log:
             log["timestamp"] = convert_to_timestamp(log["time"])
 
-        # Extract message content
-        parsed_message = extract_object(message)
-        if parsed_message is None:
+        # Extract message struct and SequencedUnitHeader
+        handler_message = parse_handler_message(message)
+        if handler_message is None:
             return None
 
-        log["parsed_message"] = parsed_message
+        log["parsed_message"] = {**handler_message.fields, **handler_message.header}
+        log["received_at"] = handler_message.received_at
+        log["executed_time_us"] = handler_message.executed_time_us
         return log
     except Exception as e:
         logger.error(f"Error parsing log entry: {e}")
@@ -249,106 +182,152 @@ def filter_logs_by_time_range(logs, start_timestamp_micros, end_timestamp_micros
 #         result["errors"].append({"error": str(e)})
 #         return result
 
-def validate_sequence_increments(sorted_logs):
-    result = {"valid": True, "total_logs": len(sorted_logs), "errors": []}
+def iter_sequence_packets(logs):
+    """(HdrUnit, HdrSequence, HdrCount, log timestamp) of each parsed log, in the order given."""
+    for log in logs:
+        message = log["parsed_message"]
+        yield (
+            int(message.get("HdrUnit", 0)),
+            int(message.get("HdrSequence", 0)),
+            int(message.get("HdrCount", 1)),
+            log.get("timestamp"),
+        )
 
-    if not sorted_logs:
-        logger.warning("No logs to validate sequence")
-        return result
 
-    try:
-        # Nhóm các log theo HdrUnit
-        logs_by_unit = {}
-        for log in sorted_logs:
-            unit = int(log["parsed_message"].get("HdrUnit", 0))
-            logs_by_unit.setdefault(unit, []).append(log)
-
-        # Kiểm tra từng nhóm HdrUnit riêng
-        for unit, unit_logs in logs_by_unit.items():
-            prev_seq = None
-            for idx, log in enumerate(unit_logs):
-                current_seq = int(log["parsed_message"].get("HdrSequence", 0))
-
-                if prev_seq is not None:
-                    expected_seq = prev_seq + 1
-                    if current_seq != expected_seq:
-                        result["valid"] = False
-                        error = {
-                            "HdrUnit": unit,
-                            "index": idx,
-                            "message": log.get("parsed_message", {}),
-                            "result": f"[HdrUnit {unit}] Sequence error at index {idx}: Expected {expected_seq}, got {current_seq}, previous {prev_seq}, (gap: {current_seq - prev_seq})"
-                        }
-                        result["errors"].append(error)
-                        logger.warning(error["result"])
-                prev_seq = current_seq
+def log_sequence_event(event):
+    """Log one detector event as soon as it is decided."""
+    if event["type"] == "gap":
+        logger.warning(
+            f"[HdrUnit {event['unit']}] Gap: {event['missing']} sequences missing ({event['start']}..{event['end']})"
+        )
+    elif event["type"] == "out_of_order":
+        logger.debug(
+            f"[HdrUnit {event['unit']}] Out of order: {event['sequence']} arrived {event['behind']} sequences late"
+        )
+    elif event["type"] == "reset":
+        logger.warning(f"[HdrUnit {event['unit']}] Reset: sequence restarted at 1, expected {event['previous']}")
+    else:
+        logger.warning(f"[HdrUnit {event['unit']}] {event['type'].capitalize()}: sequence {event['sequence']}")
+
+
+def sequence_report(detector):
+    """Validation report of a finished detector: per-unit counts and the [start, end] ranges still missing."""
+    units = detector.summary
+    return {
+        "valid": all(not counts["missing"] and not counts["duplicates"] for counts in units.values()),
+        "total_logs": sum(counts["packets"] for counts in units.values()),
+        "units": units,
+    }
+
 
+def log_sequence_report(report):
+    for unit, counts in report["units"].items():
         logger.info(
-            f"Sequence validation complete: {'VALID' if result['valid'] else 'INVALID with ' + str(len(result['errors'])) + ' errors'}"
+            f"[HdrUnit {unit}] {counts['packets']} packets, {counts['first_sequence']}..{counts['next_sequence'] - 1}: "
+            f"{counts['missing']} sequences missing in {counts['gaps']} ranges, {counts['duplicates']} duplicates, "
+            f"{counts['late']} late, {counts['out_of_order']} out of order, {counts['resets']} resets"
         )
-        return result
+    logger.info(f"Sequence validation complete: {'VALID' if report['valid'] else 'INVALID'}")
 
-    except Exception as e:
-        logger.error(f"Error validating sequence increments: {e}")
-        result["valid"] = False
-        result["errors"].append({"error": str(e)})
-        return result
+
+def validate_sequence_increments(logs):
+    """Check HdrSequence continuity per HdrUnit over logs in arrival order (HdrSequence + HdrCount = next)."""
+    detector = SequenceGapDetector(SEQUENCE_REORDER_WINDOW)
+    for event in detector.check(iter_sequence_packets(logs)):
+        log_sequence_event(event)
+    report = sequence_report(detector)
+    if not report["total_logs"]:
+        logger.warning("No logs to validate sequence")
+    log_sequence_report(report)
+    return report
+
+
+def validate_sequence_stream(folder_path):
+    """Read, parse and validate the logs of folder_path in one pass, logging each event as it is decided.
+
+    Only the detector's per-unit state is kept: memory grows with the number of gaps, not with the logs.
+    """
+    detector = SequenceGapDetector(SEQUENCE_REORDER_WINDOW)
+    parsed_logs = filter(None, map(parse_log_entry, load_all_log_data(folder_path)))
+    if USE_TIME_FILTER:
+        parsed_logs = (log for log in parsed_logs if is_in_time_range(log, START_TIME, END_TIME))
+    for event in detector.check(iter_sequence_packets(parsed_logs)):
+        log_sequence_event(event)
+    if LINE_PREFILTER is not None:
+        logger.info(LINE_PREFILTER.summary())
+    report = sequence_report(detector)
+    log_sequence_report(report)
+    return report
+
+
+def process_parsed_logs(parsed_logs, name_suffix):
+    """Validate, sort and export parsed logs (shared with parse-cboe-all-analyses.py)."""
+    # Apply time filter if enabled
+    if USE_TIME_FILTER:
+        logger.info(
+            f"Filtering logs by timestamp range: {START_TIME} to {END_TIME}"
+        )
+        parsed_logs = filter_logs_by_time_range(
+            parsed_logs, START_TIME, END_TIME
+        )
+
+    # Validate sequence increments in arrival order, before the export sort mixes the units
+    logger.info("Validating sequence increments...")
+    sequence_validation = validate_sequence_increments(parsed_logs)
+
+    logger.info("Sorting logs...")
+    logs_to_export = group_and_sort_logs(parsed_logs)
+
+    # Export sequence validation results
+    validation_filename = f"sequence_validation_{name_suffix}.json"
+    with open(validation_filename, "w", encoding="utf-8") as f:
+        json.dump(sequence_validation, f, indent=4)
+    logger.info(f"Sequence validation results exported to {validation_filename}")
+
+    # Export logs
+    output_filename = f"grouped_by_symbol_{name_suffix}.json"
+    logger.info(f"Exporting {len(logs_to_export)} logs to {output_filename}...")
+
+    # Write the result to a JSON file
+    with open(output_filename, "w", encoding="utf-8") as f:
+        json.dump(logs_to_export, f, indent=4)
+
+    logger.info(f"Export complete: {output_filename}")
+
+    # Print validation summary
+    if not sequence_validation["valid"]:
+        missing_ranges = sum(counts["gaps"] for counts in sequence_validation["units"].values())
+        logger.warning(
+            f"Found {missing_ranges} missing sequence ranges out of {sequence_validation['total_logs']} logs"
+        )
+    else:
+        logger.info("All sequences are valid and continue at HdrSequence + HdrCount")
 
 
 def main():
     try:
         logger.info("Starting log processing...")
 
-        log_data = load_all_log_data("today")
-        if not log_data:
+        if not list_log_files("today"):
             logger.error("No log data loaded. Exiting.")
             return
 
-        logger.info("Parsing log data...")
-        parsed_logs = list(filter(None, map(parse_log_entry, log_data)))
-        logger.info(f"Successfully parsed {len(parsed_logs)} log entries")
-
-        logger.info("Sorting logs...")
-        logs_to_export = group_and_sort_logs(parsed_logs)
-
-        # Apply time filter if enabled
-        if USE_TIME_FILTER:
-            logger.info(
-                f"Filtering logs by timestamp range: {START_TIME} to {END_TIME}"
-            )
-            logs_to_export = filter_logs_by_time_range(
-                logs_to_export, START_TIME, END_TIME
-            )
-
-        # Validate sequence increments
-        logger.info("Validating sequence increments...")
-        sequence_validation = validate_sequence_increments(logs_to_export)
-
         # Get the current datetime string for the output filename
         datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Export sequence validation results
-        validation_filename = f"sequence_validation_{datetime_str}.json"
-        with open(validation_filename, "w", encoding="utf-8") as f:
-            json.dump(sequence_validation, f, indent=4)
-        logger.info(f"Sequence validation results exported to {validation_filename}")
-
-        # Export logs
-        output_filename = f"grouped_by_symbol_{datetime_str}.json"
-        logger.info(f"Exporting {len(logs_to_export)} logs to {output_filename}...")
-
-        # Write the result to a JSON file
-        with open(output_filename, "w", encoding="utf-8") as f:
-            json.dump(logs_to_export, f, indent=4)
-
-        logger.info(f"Export complete: {output_filename}")
-
-        # Print validation summary
-        if not sequence_validation["valid"]:
-            logger.warning(
-                f"Found {len(sequence_validation['errors'])} sequence errors out of {sequence_validation['total_logs']} logs"
-            )
-        else:
-            logger.info("All sequences are valid and increment by exactly 1 unit")
+
+        if STREAMING:
+            logger.info("Validating sequences while reading log data...")
+            sequence_validation = validate_sequence_stream("today")
+            validation_filename = f"sequence_validation_{datetime_str}.json"
+            with open(validation_filename, "w", encoding="utf-8") as f:
+                json.dump(sequence_validation, f, indent=4)
+            logger.info(f"Sequence validation results exported to {validation_filename}")
+            return
+
+        logger.info("Parsing log data...")
+        parsed_logs = load_parsed_log_data("today", parse_log_entry, LINE_PREFILTER, PARALLEL_WORKERS)
+        logger.info(f"Successfully parsed {len(parsed_logs)} log entries")
+        process_parsed_logs(parsed_logs, datetime_str)
 
     except Exception as e:
         logger.error(f"An error occurred in the main process: {e}")
@@ -0,0 +1,95 @@
+import json
+import time
+from datetime import datetime
+
+from log_pipeline import LinePrefilter, iter_log_entries, list_log_files
+from log_time import parse_log_time
+from message_parser import parse_drop_message, parse_handler_message, parse_sequence_check
+from sequence_check import SequenceTimeline
+
+TIMELINE_BIN_SECONDS = 1  # Độ rộng mỗi bin; 'time' của log chỉ chính xác tới giây
+SEQUENCE_REORDER_WINDOW = 256  # Số packet giữ lại mỗi HdrUnit trước khi báo gap (như parse-cboe-hqrSequence.py)
+DROP_SLACK_BINS = 1  # Gap được tính là trùng drop khi source có drop cách gap không quá số bin này
+
+DROP_MARKER = 'Data channel full'
+# Lọc nhanh theo bytes trước khi json.loads: dòng drop, dòng message_handler có header và dòng kiểm tra sequence qua Redis
+LINE_PREFILTER = LinePrefilter(any_of=[DROP_MARKER, 'HdrSequence', 'SEQUENCE: ', 'IsDuplicate: '])
+
+# Hàm phân tích từng dòng log thành một tuple nhỏ: ('drop', t, addr, length), ('packet', t, addr, unit, seq, count), ('check', t, SequenceCheck)
+def parse_log_entry(log):
+    message = log.get('message', '')
+    timestamp = parse_log_time(log['time'])
+    if message.startswith(DROP_MARKER):
+        drop = parse_drop_message(message)
+        return ('drop', timestamp, *drop) if drop is not None else None
+    addr_start = message.find('UDPAddr: ')
+    if addr_start != -1:
+        if 'message_handler' not in log.get('caller', ''):
+            return None
+        # Một số dòng có tiền tố như 'ProcessCalculatedValueMessage: ' trước UDPAddr
+        handler_message = parse_handler_message(message[addr_start:])
+        if handler_message is None or 'HdrSequence' not in handler_message.header:
+            return None
+        header = handler_message.header
+        return ('packet', timestamp, handler_message.udp_addr, header['HdrUnit'], header['HdrSequence'], header.get('HdrCount', 1))
+    check = parse_sequence_check(message)
+    return ('check', timestamp, check) if check is not None else None
+
+# Đọc từng file thành luồng, không giữ dòng log nào trong bộ nhớ
+def iter_parsed_logs(folder_path):
+    for file_path in list_log_files(folder_path):
+        print(f"Reading log file: {file_path}")
+        for log in iter_log_entries(file_path, LINE_PREFILTER):
+            item = parse_log_entry(log)
+            if item is not None:
+                yield item
+
+# Đưa từng phần tử vào timeline theo thứ tự log; parse-cboe-all-analyses.py đưa phần tử vào qua feed
+class ParsedLogConsumer:
+    def __init__(self, name_suffix):
+        self.name_suffix = name_suffix
+        self.timeline = SequenceTimeline(TIMELINE_BIN_SECONDS, SEQUENCE_REORDER_WINDOW, DROP_SLACK_BINS)
+
+    def feed(self, item):
+        if item[0] == 'packet':
+            _, timestamp, udp_addr, unit, sequence, count = item
+            self.timeline.add_packet(udp_addr, unit, sequence, count, timestamp)
+        elif item[0] == 'drop':
+            _, timestamp, udp_addr, length = item
+            self.timeline.add_drop(udp_addr, length, timestamp)
+        else:
+            self.timeline.add_sequence_check(item[2], item[1])
+
+    # Ghép drop, gap và kiểm tra Redis theo từng source, ghi ra sequence_timeline_{suffix}.json
+    def finish(self):
+        self.timeline.flush()
+        sources = self.timeline.timeline()
+        for source, entry in sources.items():
+            summary = entry['summary']
+            units = f" (HdrUnit {', '.join(map(str, entry['units']))})" if entry['units'] else ''
+            print(f"{source}{units}: {summary['drops']} drops, {summary['missing']} sequences missing in {summary['gaps']} gaps, "
+                  f"{summary['gap_bins_with_drops']} of {summary['gap_bins']} gap bins with drops "
+                  f"({summary['missing_with_drops']} missing), Redis reported {summary['redis_missing']} missing")
+        output_filename = f"sequence_timeline_{self.name_suffix}.json"
+        with open(output_filename, 'w') as f:
+            json.dump({'bin_seconds': TIMELINE_BIN_SECONDS, 'sources': sources}, f, indent=4)
+        print(f"Export complete: {output_filename}")
+
+def process_parsed_logs(parsed_items, name_suffix):
+    consumer = ParsedLogConsumer(name_suffix)
+    for item in parsed_items:
+        consumer.feed(item)
+    consumer.finish()
+
+# Một lượt streaming qua mọi file, từng dòng đưa thẳng vào timeline
+def main():
+    if not list_log_files('today'):
+        print("No log files in today")
+        return
+    start_clock = time.perf_counter()
+    process_parsed_logs(iter_parsed_logs('today'), datetime.now().strftime("%Y%m%d_%H%M%S"))
+    print(LINE_PREFILTER.summary())
+    print(f"Done in {time.perf_counter() - start_clock:.1f}s")
+
+if __name__ == '__main__':
+    main()
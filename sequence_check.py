@@ -0,0 +1,349 @@
+import heapq
+from bisect import bisect_left, bisect_right
+
+
+class SequenceRanges:
+    """A set of sequence numbers stored as sorted, disjoint [start, end] runs.
+
+    Consecutive sequences share one run, so a unit that received a million
+    packets with three holes is four runs. Adding, membership and the
+    number already present are binary searches; appending past the last
+    run, the usual case, extends it in place.
+    """
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def add(self, start, end):
+        """Add start..end (inclusive); returns how many of those sequences were already in the set."""
+        starts, ends = self.starts, self.ends
+        if ends and start == ends[-1] + 1:
+            ends[-1] = end
+            return 0
+        # Runs lo..hi-1 overlap start..end or touch it, and merge with it
+        lo = bisect_left(ends, start - 1)
+        hi = bisect_right(starts, end + 1)
+        present = sum(max(0, min(ends[i], end) - max(starts[i], start) + 1) for i in range(lo, hi))
+        if lo < hi:
+            start, end = min(start, starts[lo]), max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi] = [end]
+        return present
+
+    def __contains__(self, sequence):
+        position = bisect_right(self.starts, sequence) - 1
+        return position >= 0 and sequence <= self.ends[position]
+
+    def runs(self):
+        """[[start, end], ...] in ascending order."""
+        return [[start, end] for start, end in zip(self.starts, self.ends)]
+
+    def gaps(self):
+        """[[start, end], ...] of the sequences missing between the first and the last run."""
+        return [[end + 1, start - 1] for end, start in zip(self.ends, self.starts[1:])]
+
+    def missing(self):
+        """Number of sequences in gaps()."""
+        return sum(start - end - 1 for end, start in zip(self.ends, self.starts[1:]))
+
+
+class _UnitState:
+    """Running sequence state of one HdrUnit."""
+
+    __slots__ = ('next_sequence', 'highest', 'pending', 'pending_sequences', 'received', 'duplicated', 'sessions', 'counts')
+
+    def __init__(self):
+        self.next_sequence = None   # first sequence not yet accounted for (None until the start is known)
+        self.highest = None         # end of the highest packet seen so far
+        self.pending = []           # heap of (sequence, count, timestamp) received past next_sequence
+        self.pending_sequences = set()
+        self.received = SequenceRanges()    # every sequence accepted, held packets excluded
+        self.duplicated = SequenceRanges()  # sequences that arrived more than once
+        self.sessions = []                  # (received, duplicated) of the sessions before each reset
+        self.counts = {'packets': 0, 'messages': 0, 'first_sequence': None, 'next_sequence': None,
+                       'duplicates': 0, 'out_of_order': 0, 'late': 0, 'resets': 0}
+
+
+class SequenceGapDetector:
+    """Streaming HdrSequence check per HdrUnit.
+
+    A packet's SequencedUnitHeader carries the sequence of its first message
+    and HdrCount messages, so the next packet of the unit is expected at
+    HdrSequence + HdrCount. Packets are fed in arrival order. A packet past
+    the expected sequence waits in a heap of at most `window` packets per
+    unit; once the heap is full, the range up to its smallest packet can no
+    longer be filled and is reported as a gap. Every event is returned by
+    the feed()/flush() call that decides it:
+
+    gap          -- {'unit', 'start', 'end', 'missing', 'timestamp'}: sequences start..end had not
+                    arrived; timestamp is that of the first packet after them
+    duplicate    -- {'unit', 'sequence', 'count', 'timestamp'}: the packet's sequences were already received
+    out_of_order -- {'unit', 'sequence', 'count', 'timestamp', 'behind'}: arrived after a packet with a
+                    later sequence but in time to fill its place; behind is how many sequences later
+    late         -- {'unit', 'sequence', 'count', 'timestamp'}: arrived after its range was reported as a gap
+    reset        -- {'unit', 'sequence', 'count', 'timestamp', 'previous'}: HdrSequence 1 arrived after the
+                    unit had passed it, so the unit restarted its sequence (a new session); the packets
+                    held back are released first and the unit is checked afresh from 1. previous is
+                    the sequence the unit expected before the reset
+
+    Each event dict also has 'type'. Received and duplicated sequences are
+    kept per unit as SequenceRanges, so memory grows with the number of
+    gaps, not of packets, and a late packet shrinks the gap it fills.
+
+    summary -- unit -> {'packets', 'messages', 'first_sequence', 'next_sequence', 'duplicates',
+                        'out_of_order', 'late', 'resets', 'gaps', 'missing', 'missing_ranges', 'duplicate_ranges'}
+               where missing_ranges are the [start, end] runs still missing between the first and
+               the last sequence received of each session (sessions in order), and gaps/missing
+               their count and total length
+    """
+
+    def __init__(self, window=256):
+        self.window = window
+        self._units = {}
+
+    @property
+    def summary(self):
+        summary = {}
+        for unit, state in self._units.items():
+            sessions = state.sessions + [(state.received, state.duplicated)]
+            missing_ranges = [gap for received, _ in sessions for gap in received.gaps()]
+            summary[unit] = dict(state.counts, gaps=len(missing_ranges),
+                                 missing=sum(received.missing() for received, _ in sessions),
+                                 missing_ranges=missing_ranges,
+                                 duplicate_ranges=[run for _, duplicated in sessions for run in duplicated.runs()])
+        return summary
+
+    def received(self, unit):
+        """SequenceRanges of the sequences of unit accepted since its last reset (packets still held back excluded)."""
+        state = self._units.get(unit)
+        return state.received if state is not None else SequenceRanges()
+
+    def feed(self, unit, sequence, count=1, timestamp=None):
+        """Account for one packet; returns the events it decides (usually none)."""
+        state = self._units.get(unit)
+        if state is None:
+            state = self._units[unit] = _UnitState()
+        counts = state.counts
+        counts['packets'] += 1
+        counts['messages'] += count
+        count = max(count, 1)
+        last = sequence + count - 1
+        events = []
+        if sequence == 1 and state.next_sequence is not None and state.next_sequence > 1:
+            self._reset(unit, state, events, count, timestamp)
+        if state.next_sequence is not None and sequence < state.next_sequence:
+            # Below next_sequence every sequence was either received or already reported missing
+            present = state.received.add(sequence, last)
+            if present == count:
+                state.duplicated.add(sequence, last)
+                kind = 'duplicate'
+                counts['duplicates'] += 1
+            else:
+                kind = 'late'
+                counts['late'] += 1
+            events.append({'type': kind, 'unit': unit, 'sequence': sequence, 'count': count, 'timestamp': timestamp})
+            return events
+        if sequence in state.pending_sequences:
+            state.duplicated.add(sequence, last)
+            counts['duplicates'] += 1
+            events.append({'type': 'duplicate', 'unit': unit, 'sequence': sequence, 'count': count, 'timestamp': timestamp})
+            return events
+        if state.highest is not None and sequence < state.highest:
+            counts['out_of_order'] += 1
+            events.append({'type': 'out_of_order', 'unit': unit, 'sequence': sequence, 'count': count,
+                           'timestamp': timestamp, 'behind': state.highest - sequence})
+        state.highest = max(state.highest or 0, sequence + count)
+        if sequence == state.next_sequence:
+            state.received.add(sequence, last)
+            state.next_sequence = sequence + count
+        else:
+            heapq.heappush(state.pending, (sequence, count, timestamp))
+            state.pending_sequences.add(sequence)
+            if len(state.pending) > self.window:
+                self._release(unit, state, events)
+        self._drain(state)
+        counts['next_sequence'] = state.next_sequence
+        return events
+
+    def flush(self):
+        """End of input: report every range still missing before the packets held back."""
+        events = []
+        for unit, state in self._units.items():
+            while state.pending:
+                self._release(unit, state, events)
+                self._drain(state)
+            state.counts['next_sequence'] = state.next_sequence
+        return events
+
+    def check(self, packets):
+        """Yield the events of (unit, sequence, count, timestamp) packets in arrival order, then of flush()."""
+        for unit, sequence, count, timestamp in packets:
+            yield from self.feed(unit, sequence, count, timestamp)
+        yield from self.flush()
+
+    def _reset(self, unit, state, events, count, timestamp):
+        # The old session ends: release what it held back, keep its ranges for the summary, start again at 1
+        while state.pending:
+            self._release(unit, state, events)
+            self._drain(state)
+        events.append({'type': 'reset', 'unit': unit, 'sequence': 1, 'count': count, 'timestamp': timestamp,
+                       'previous': state.next_sequence})
+        state.sessions.append((state.received, state.duplicated))
+        state.received, state.duplicated = SequenceRanges(), SequenceRanges()
+        state.next_sequence = 1
+        state.highest = None
+        state.counts['resets'] += 1
+
+    def _release(self, unit, state, events):
+        # The smallest held packet is accepted as the next one; whatever lies before it is missing
+        sequence, count, timestamp = heapq.heappop(state.pending)
+        state.pending_sequences.discard(sequence)
+        if state.next_sequence is None:
+            state.next_sequence = state.counts['first_sequence'] = sequence
+        if sequence > state.next_sequence:
+            events.append({'type': 'gap', 'unit': unit, 'start': state.next_sequence, 'end': sequence - 1,
+                           'missing': sequence - state.next_sequence, 'timestamp': timestamp})
+        state.received.add(sequence, sequence + count - 1)
+        state.next_sequence = max(state.next_sequence, sequence + count)
+
+    @staticmethod
+    def _drain(state):
+        # Held packets that now continue the sequence are accepted in order
+        pending = state.pending
+        while pending and state.next_sequence is not None and pending[0][0] <= state.next_sequence:
+            sequence, count, _ = heapq.heappop(pending)
+            state.pending_sequences.discard(sequence)
+            state.received.add(sequence, sequence + count - 1)
+            state.next_sequence = max(state.next_sequence, sequence + count)
+
+
+# Counters of one timeline bin; drops are per UDP source, the rest per HdrUnit until joined to its source
+_TIMELINE_FIELDS = ('packets', 'drops', 'dropped_bytes', 'gaps', 'missing', 'late', 'duplicates',
+                    'redis_lookups', 'redis_in_order', 'redis_missing_checks', 'redis_missing', 'redis_duplicates')
+
+
+class SequenceTimeline:
+    """Channel-full drops, sequence gaps and the connector's Redis sequence checks binned on one timeline.
+
+    Fed in one pass, in log order: handler packets go through a
+    SequenceGapDetector and each gap is binned at the log time of the first
+    packet after it; drop lines are binned by UDP address; Redis check lines
+    by HdrUnit. A unit's bins join its UDP source, learnt from the
+    UDPAddr of its handler lines, when the timeline is read. Memory grows
+    with the number of non-empty bins and gaps, not with the logs.
+
+    bin_seconds -- bin width; log 'time' has whole-second resolution, so a finer
+                   bin only separates lines that carry a finer time
+    slack_bins  -- a gap is counted as coinciding with drops when its source dropped
+                   messages within this many bins of it
+    """
+
+    def __init__(self, bin_seconds=1, window=256, slack_bins=1):
+        self.bin_seconds = bin_seconds
+        self.slack_bins = slack_bins
+        self.detector = SequenceGapDetector(window)
+        self.unit_sources = {}  # HdrUnit -> UDP address
+        self._bins = {}         # 'udp address' or ('unit', HdrUnit) -> {bin index: {field: count}}
+
+    def _bin(self, key, timestamp):
+        bins = self._bins.get(key)
+        if bins is None:
+            bins = self._bins[key] = {}
+        index = int(timestamp // self.bin_seconds)
+        counters = bins.get(index)
+        if counters is None:
+            counters = bins[index] = dict.fromkeys(_TIMELINE_FIELDS, 0)
+        return counters
+
+    def add_packet(self, udp_addr, unit, sequence, count, timestamp):
+        if udp_addr and unit not in self.unit_sources:
+            self.unit_sources[unit] = udp_addr
+        self._bin(('unit', unit), timestamp)['packets'] += 1
+        self._add_events(self.detector.feed(unit, sequence, count, timestamp))
+
+    def add_drop(self, udp_addr, length, timestamp):
+        counters = self._bin(udp_addr, timestamp)
+        counters['drops'] += 1
+        counters['dropped_bytes'] += length
+
+    def add_sequence_check(self, check, timestamp):
+        """check is a message_parser.SequenceCheck."""
+        counters = self._bin(('unit', check.unit), timestamp)
+        if check.kind == 'redis_lookup':
+            counters['redis_lookups'] += 1
+        elif check.kind == 'in_order':
+            counters['redis_in_order'] += 1
+        elif check.kind == 'missing':
+            counters['redis_missing_checks'] += 1
+            counters['redis_missing'] += check.missing
+        elif check.kind == 'duplicate':
+            counters['redis_duplicates'] += 1
+
+    def flush(self):
+        """End of input: bin the gaps still held back by the detector."""
+        self._add_events(self.detector.flush())
+
+    def _add_events(self, events):
+        for event in events:
+            counters = self._bin(('unit', event['unit']), event['timestamp'] or 0)
+            if event['type'] == 'gap':
+                counters['gaps'] += 1
+                counters['missing'] += event['missing']
+            elif event['type'] == 'late':
+                counters['late'] += 1
+            elif event['type'] == 'duplicate':
+                counters['duplicates'] += 1
+
+    def timeline(self):
+        """source -> {'units', 'summary', 'bins': [{'timestamp', <field>: count, ...}]}, bins in time order.
+
+        A source is a UDP address, or 'unit <n>' for a unit whose handler lines never showed one.
+        summary holds the field totals plus gap_bins, gap_bins_with_drops and missing_with_drops
+        (gaps with a drop on the same source within slack_bins) and drop_bins_without_gaps.
+        """
+        sources = {}
+        for key, bins in self._bins.items():
+            if isinstance(key, tuple):
+                unit = key[1]
+                source = self.unit_sources.get(unit, f"unit {unit}")
+            else:
+                unit, source = None, key
+            entry = sources.get(source)
+            if entry is None:
+                entry = sources[source] = {'units': [], 'bins': {}}
+            if unit is not None:
+                entry['units'].append(unit)
+            for index, counters in bins.items():
+                merged = entry['bins'].get(index)
+                if merged is None:
+                    entry['bins'][index] = dict(counters)
+                else:
+                    for field, value in counters.items():
+                        merged[field] += value
+        return {source: self._source_timeline(entry) for source, entry in sorted(sources.items())}
+
+    def _source_timeline(self, entry):
+        bins = entry['bins']
+        summary = dict.fromkeys(_TIMELINE_FIELDS, 0)
+        summary.update(gap_bins=0, gap_bins_with_drops=0, missing_with_drops=0, drop_bins_without_gaps=0)
+        drop_bins = {index for index, counters in bins.items() if counters['drops']}
+        gap_bins = {index for index, counters in bins.items() if counters['gaps']}
+        for index, counters in bins.items():
+            for field in _TIMELINE_FIELDS:
+                summary[field] += counters[field]
+            if counters['gaps']:
+                summary['gap_bins'] += 1
+                if any(index + offset in drop_bins for offset in range(-self.slack_bins, self.slack_bins + 1)):
+                    summary['gap_bins_with_drops'] += 1
+                    summary['missing_with_drops'] += counters['missing']
+            if counters['drops'] and not any(index + offset in gap_bins
+                                             for offset in range(-self.slack_bins, self.slack_bins + 1)):
+                summary['drop_bins_without_gaps'] += 1
+        return {
+            'units': sorted(entry['units']),
+            'summary': summary,
+            'bins': [dict(timestamp=index * self.bin_seconds, **bins[index]) for index in sorted(bins)],
+        }
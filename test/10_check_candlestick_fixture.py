@@ -0,0 +1,88 @@
+import os
+import sys
+import importlib.util
+
+# Chạy từ thư mục gốc: python test/10_check_candlestick_fixture.py
+# Nến dựng từ vài dòng message_handler cố định, so với giá trị OHLC tính tay (không qua code dựng nến):
+# hai trade cùng giây log 04:27:20 được ghi theo thứ tự HdrSequence, nên close của nến 14:27 là trade seq 12 (10.00)
+# chứ không phải trade seq 11 (10.05) như khi sắp theo giờ log rồi theo order
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from order_state import feed_order_key
+
+def load_order_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_feed_connector_log', os.path.join(ROOT, 'parse-cboe-feed-connector-log.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def handler_line(time, caller_line, body, sequence):
+    return {
+        'level': 'info',
+        'time': time,
+        'caller': f'/app/pkg/cboe/message_handler.go:{caller_line}',
+        'message': f'UDPAddr: 170.137.217.68:41750 - {body} - common.SequencedUnitHeader{{HdrLength:50, HdrCount:1, HdrUnit:1, '
+                   f'HdrSequence:{sequence}}} - ReceivedAt: 2025-05-13 14:15:33.104 - ExecutedTime: 316.154µs',
+    }
+
+def add_order(time, timestamp, order_id, quantity, price, sequence):
+    return handler_line(time, 71, f'common.AddOrderMessage{{Timestamp:{timestamp}, OrderID:"{order_id}", SideIndicator:"S", '
+                                  f'Quantity:{quantity}, Symbol:"TST", Price:{price}, PID:"9452", Reserved:"\\x00"}}', sequence)
+
+def order_executed(time, timestamp, order_id, quantity, sequence):
+    return handler_line(time, 77, f'common.OrderExecutedMessage{{Timestamp:{timestamp}, OrderID:"{order_id}", ExecutedQty:{quantity}, '
+                                  f'ExecutionID:"E{sequence}", ContractOrderID:"C{sequence}", ContractPID:"    ", Reserved:"\\x00"}}', sequence)
+
+# Giờ log UTC, Sydney = UTC+10 ngày 13/05/2025: 04:27 UTC là nến 14:27
+LOGS = [
+    add_order('2025-05-13T04:26:50Z', 1747110409000000, 'A1', 200, 10.0, 8),
+    add_order('2025-05-13T04:26:50Z', 1747110409500000, 'A2', 70, 10.05, 9),
+    order_executed('2025-05-13T04:27:05Z', 1747110424000000, 'A1', 100, 10),
+    order_executed('2025-05-13T04:27:20Z', 1747110439000000, 'A2', 50, 11),
+    order_executed('2025-05-13T04:27:20Z', 1747110439200000, 'A1', 30, 12),
+    order_executed('2025-05-13T04:28:01Z', 1747110480000000, 'A2', 20, 13),
+    order_executed('2025-05-13T04:28:02Z', 1747110481000000, 'A1', 70, 14),
+]
+
+def candle(start_time, end_time, open_price, high, low, close, volume, trade_count, vwap):
+    return {'symbol': 'TST', 'start_time': start_time, 'end_time': end_time, 'open': open_price, 'high': high, 'low': low,
+            'close': close, 'volume': volume, 'trade_count': trade_count, 'vwap': vwap}
+
+# 14:27: 100 @ 10.00, 50 @ 10.05, 30 @ 10.00; 14:28: 20 @ 10.05, 70 @ 10.00
+EXPECTED = {
+    '1m': [
+        candle('2025-05-13T14:27:00Z', '2025-05-13T14:28:00Z', 10.0, 10.05, 10.0, 10.0, 180, 3, 1802.5 / 180),
+        candle('2025-05-13T14:28:00Z', '2025-05-13T14:29:00Z', 10.05, 10.05, 10.0, 10.0, 90, 2, 901 / 90),
+    ],
+    '1h': [candle('2025-05-13T14:00:00Z', '2025-05-13T15:00:00Z', 10.0, 10.05, 10.0, 10.0, 270, 5, 2703.5 / 270)],
+    '1d': [candle('2025-05-13T00:00:00Z', '2025-05-14T00:00:00Z', 10.0, 10.05, 10.0, 10.0, 270, 5, 2703.5 / 270)],
+}
+
+def main():
+    script = load_order_script()
+    script.USE_SYMBOL_FILTER = False
+    parsed_log = sorted((script.parse_log_entry(log) for log in LOGS), key=feed_order_key)
+    grouped = script.group_and_sort_logs(parsed_log)
+    executed = script.extract_all_executed_message_by_symbol(script.filter_logs_by_order_and_time(grouped, None))
+    actual = script.construct_candlestick_data(executed, ['1m', '1h', '1d']).get('TST', {})
+
+    failures = []
+    for timeframe, expected_candles in EXPECTED.items():
+        candles = actual.get(timeframe, [])
+        if len(candles) != len(expected_candles):
+            failures.append(f"{timeframe}: expected {len(expected_candles)} candles, got {len(candles)}")
+            continue
+        for expected_candle, got in zip(expected_candles, candles):
+            for key, value in expected_candle.items():
+                if got.get(key) != value:
+                    failures.append(f"{timeframe} {expected_candle['start_time']} {key}: expected {value}, got {got.get(key)}")
+    print(f"TST: {sum(len(candles) for candles in actual.values())} candles checked against the fixture")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
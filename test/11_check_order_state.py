@@ -0,0 +1,98 @@
+import os
+import sys
+import importlib.util
+
+# Chạy từ thư mục gốc: python test/11_check_order_state.py
+# OrderStateEngine với vài dòng message_handler cố định: một order add -> reduce -> execute -> delete (Quantity của
+# Delete là phần còn lại sau mọi lần giảm/khớp), và một Delete tới trước AddOrder của nó theo HdrSequence (bị bỏ,
+# đếm là unknown, như IBTC 22DJR6U8IENSY: Delete seq 7078142 xoá order cũ cùng OrderID trước khi Add seq 7078144 tới)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from order_state import OrderStateEngine, feed_order_key
+
+def load_order_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_feed_connector_log', os.path.join(ROOT, 'parse-cboe-feed-connector-log.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def handler_line(caller_line, body, sequence):
+    return {
+        'level': 'info',
+        'time': '2025-05-13T04:19:26Z',
+        'caller': f'/app/pkg/cboe/message_handler.go:{caller_line}',
+        'message': f'UDPAddr: 170.137.217.68:41750 - {body} - common.SequencedUnitHeader{{HdrLength:50, HdrCount:1, HdrUnit:1, '
+                   f'HdrSequence:{sequence}}} - ReceivedAt: 2025-05-13 14:14:36.685 - ExecutedTime: 421.371µs',
+    }
+
+def add_order(timestamp, order_id, quantity, price, sequence):
+    return handler_line(71, f'common.AddOrderMessage{{Timestamp:{timestamp}, OrderID:"{order_id}", SideIndicator:"B", '
+                            f'Quantity:{quantity}, Symbol:"TST", Price:{price}, PID:"6463", Reserved:"\\x00"}}', sequence)
+
+def reduce_size(timestamp, order_id, quantity, sequence):
+    return handler_line(75, f'common.ReduceSizeMessage{{Timestamp:{timestamp}, OrderID:"{order_id}", CancelledQty:{quantity}}}', sequence)
+
+def order_executed(timestamp, order_id, quantity, sequence):
+    return handler_line(77, f'common.OrderExecutedMessage{{Timestamp:{timestamp}, OrderID:"{order_id}", ExecutedQty:{quantity}, '
+                            f'ExecutionID:"E{sequence}", ContractOrderID:"C{sequence}", ContractPID:"    ", Reserved:"\\x00"}}', sequence)
+
+def delete_order(timestamp, order_id, sequence):
+    return handler_line(83, f'common.DeleteOrderMessage{{Timestamp:{timestamp}, OrderID:"{order_id}"}}', sequence)
+
+LOGS = [
+    add_order(1747109676000000, 'A1', 500, 15.8, 7078100),
+    reduce_size(1747109676100000, 'A1', 100, 7078101),
+    order_executed(1747109676200000, 'A1', 150, 7078102),
+    delete_order(1747109676300000, 'A1', 7078103),
+    # Cùng Timestamp, Delete có HdrSequence nhỏ hơn Add => tới trước theo thứ tự feed
+    add_order(1747109676688000, 'B1', 9923, 15.8, 7078144),
+    delete_order(1747109676688000, 'B1', 7078142),
+]
+
+# Phần được bổ sung vào parsed_message của từng message của A1 (Price/Quantity theo trạng thái order lúc đó)
+EXPECTED_A1 = [
+    ('AddOrderMessage', {'SideIndicator': 'B', 'Quantity': '500', 'Symbol': 'TST', 'Price': '15.8'}),
+    ('ReduceSizeMessage', {'CancelledQty': '100', 'Symbol': 'TST', 'SideIndicator': 'B', 'Price': '15.8', 'Quantity': '400'}),
+    ('OrderExecutedMessage', {'ExecutedQty': '150', 'Symbol': 'TST', 'SideIndicator': 'B', 'Price': '15.8'}),
+    ('DeleteOrderMessage', {'Symbol': 'TST', 'SideIndicator': 'B', 'Price': '15.8', 'Quantity': '250'}),
+]
+
+def main():
+    script = load_order_script()
+    messages = sorted((script.parse_log_entry(log) for log in LOGS), key=feed_order_key)
+    engine = OrderStateEngine()
+    touched = engine.apply_all(messages)
+    history = engine.grouped.get('TST', {})
+    print(f"TST: {len(history)} orders, {engine.unknown_order_messages} unknown order messages, touched {sorted(touched)}")
+
+    failures = []
+    a1 = [message.to_dict() for message in history.get('A1', [])]
+    if [entry['message_type'] for entry in a1] != [message_type for message_type, _ in EXPECTED_A1]:
+        failures.append(f"A1: expected {[message_type for message_type, _ in EXPECTED_A1]}, got {[entry['message_type'] for entry in a1]}")
+    for entry, (message_type, expected) in zip(a1, EXPECTED_A1):
+        parsed = entry['parsed_message']
+        for key, value in expected.items():
+            if parsed.get(key) != value:
+                failures.append(f"A1 {message_type} {key}: expected {value!r}, got {parsed.get(key)!r}")
+        if parsed.get('HdrUnit') != 1 or not isinstance(parsed.get('HdrSequence'), int):
+            failures.append(f"A1 {message_type}: expected int header fields, got {parsed.get('HdrUnit')!r}/{parsed.get('HdrSequence')!r}")
+    if engine.orders['A1'].live or engine.orders['A1'].quantity != 250:
+        failures.append(f"A1: expected deleted with 250 left, got live={engine.orders['A1'].live} quantity={engine.orders['A1'].quantity}")
+
+    if [message.message_type for message in history.get('B1', [])] != ['AddOrderMessage']:
+        failures.append(f"B1: expected only the AddOrder, got {[message.message_type for message in history.get('B1', [])]}")
+    if 'B1' in engine.orders and not engine.orders['B1'].live:
+        failures.append("B1: the Delete before its AddOrder must not delete the order")
+    if engine.unknown_order_messages != 1:
+        failures.append(f"expected the out-of-order Delete as the only unknown order message, got {engine.unknown_order_messages}")
+    if touched != {'TST'}:
+        failures.append(f"expected touched symbols {{'TST'}}, got {touched}")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
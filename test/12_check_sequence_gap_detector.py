@@ -0,0 +1,72 @@
+import os
+import sys
+
+# Chạy từ thư mục gốc: python test/12_check_sequence_gap_detector.py
+# SequenceGapDetector (window = 2) với các chuỗi packet cố định mỗi HdrUnit một tình huống: gap (có HdrCount > 1 và một
+# packet tới trễ sau khi gap đã báo), duplicate, out of order và unit reset về HdrSequence 1.
+# Mỗi event phải được trả về đúng ở lần feed() quyết định được nó; timestamp của packet là số thứ tự của nó
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sequence_check import SequenceGapDetector
+
+# unit -> [(HdrSequence, HdrCount)] theo thứ tự tới
+PACKETS = {
+    # 1-2, 3, 4-6 liền nhau; thiếu 7..9; 8 tới sau khi gap 7..9 đã báo
+    1: [(1, 2), (3, 1), (4, 3), (10, 1), (11, 1), (12, 1), (8, 1)],
+    # 2 tới lần thứ hai
+    2: [(1, 1), (2, 1), (3, 1), (2, 1)],
+    # 5 tới trước 4, 4 vẫn kịp lấp chỗ => không có gap
+    3: [(1, 1), (2, 1), (3, 1), (5, 1), (4, 1)],
+    # Thiếu 5 (6 đang giữ lại khi reset), unit bắt đầu lại từ 1, thiếu 3 của phiên mới
+    4: [(1, 1), (2, 1), (3, 1), (4, 1), (6, 1), (1, 1), (2, 1), (4, 1), (5, 1), (6, 1)],
+}
+
+# (unit, thứ tự packet quyết định event) -> events
+EXPECTED_EVENTS = {
+    (1, 5): [{'type': 'gap', 'unit': 1, 'start': 7, 'end': 9, 'missing': 3, 'timestamp': 3}],
+    (1, 6): [{'type': 'late', 'unit': 1, 'sequence': 8, 'count': 1, 'timestamp': 6}],
+    (2, 3): [{'type': 'duplicate', 'unit': 2, 'sequence': 2, 'count': 1, 'timestamp': 3}],
+    (3, 4): [{'type': 'out_of_order', 'unit': 3, 'sequence': 4, 'count': 1, 'timestamp': 4, 'behind': 2}],
+    (4, 5): [{'type': 'gap', 'unit': 4, 'start': 5, 'end': 5, 'missing': 1, 'timestamp': 4},
+             {'type': 'reset', 'unit': 4, 'sequence': 1, 'count': 1, 'timestamp': 5, 'previous': 7}],
+    (4, 9): [{'type': 'gap', 'unit': 4, 'start': 3, 'end': 3, 'missing': 1, 'timestamp': 7}],
+}
+
+EXPECTED_SUMMARY = {
+    1: {'packets': 7, 'messages': 10, 'first_sequence': 1, 'next_sequence': 13, 'duplicates': 0, 'out_of_order': 0,
+        'late': 1, 'resets': 0, 'gaps': 2, 'missing': 2, 'missing_ranges': [[7, 7], [9, 9]], 'duplicate_ranges': []},
+    2: {'packets': 4, 'messages': 4, 'first_sequence': 1, 'next_sequence': 4, 'duplicates': 1, 'out_of_order': 0,
+        'late': 0, 'resets': 0, 'gaps': 0, 'missing': 0, 'missing_ranges': [], 'duplicate_ranges': [[2, 2]]},
+    3: {'packets': 5, 'messages': 5, 'first_sequence': 1, 'next_sequence': 6, 'duplicates': 0, 'out_of_order': 1,
+        'late': 0, 'resets': 0, 'gaps': 0, 'missing': 0, 'missing_ranges': [], 'duplicate_ranges': []},
+    4: {'packets': 10, 'messages': 10, 'first_sequence': 1, 'next_sequence': 7, 'duplicates': 0, 'out_of_order': 0,
+        'late': 0, 'resets': 1, 'gaps': 2, 'missing': 2, 'missing_ranges': [[5, 5], [3, 3]], 'duplicate_ranges': []},
+}
+
+def main():
+    failures = []
+    for unit, packets in PACKETS.items():
+        detector = SequenceGapDetector(window=2)
+        for index, (sequence, count) in enumerate(packets):
+            events = detector.feed(unit, sequence, count, index)
+            expected = EXPECTED_EVENTS.get((unit, index), [])
+            if events != expected:
+                failures.append(f"unit {unit} packet {index} ({sequence}, {count}): expected {expected}, got {events}")
+        flushed = detector.flush()
+        if flushed:
+            failures.append(f"unit {unit}: expected nothing left at flush, got {flushed}")
+        summary = detector.summary.get(unit)
+        if summary != EXPECTED_SUMMARY[unit]:
+            failures.append(f"unit {unit}: expected summary {EXPECTED_SUMMARY[unit]}, got {summary}")
+        print(f"HdrUnit {unit}: {summary['packets']} packets, {summary['missing']} missing in {summary['gaps']} gaps, "
+              f"{summary['duplicates']} duplicates, {summary['out_of_order']} out of order, {summary['late']} late, "
+              f"{summary['resets']} resets")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+
+# Chạy từ thư mục gốc: python test/13_check_sequence_ranges.py
+# SequenceRanges qua một chuỗi add() cố định: nối run liền kề (sau, trước và lấp chỗ giữa hai run), gộp các khoảng
+# chồng nhau (trả về số sequence đã có), rồi kiểm tra `in`, gaps() và missing() ở sát mép các run
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sequence_check import SequenceRanges
+
+# (start, end) -> số sequence đã có, runs sau khi add
+STEPS = [
+    ((1, 3), 0, [[1, 3]]),
+    # Liền sau run cuối: nối vào run đó
+    ((4, 5), 0, [[1, 5]]),
+    ((12, 14), 0, [[1, 5], [12, 14]]),
+    # Liền trước một run: nối vào đầu run
+    ((10, 11), 0, [[1, 5], [10, 14]]),
+    ((7, 7), 0, [[1, 5], [7, 7], [10, 14]]),
+    # Lấp đúng chỗ trống giữa hai run: ba run thành một
+    ((6, 6), 0, [[1, 7], [10, 14]]),
+    # Chồng lên đầu run sau (10, 11 đã có)
+    ((9, 11), 2, [[1, 7], [9, 14]]),
+    # Chồng lên đầu run đầu tiên, bắt đầu trước nó
+    ((0, 2), 2, [[0, 7], [9, 14]]),
+    # Nằm hẳn trong một run
+    ((3, 4), 2, [[0, 7], [9, 14]]),
+    ((20, 22), 0, [[0, 7], [9, 14], [20, 22]]),
+    # Phủ hai run và chỗ trống giữa chúng (12..14 và 20 đã có)
+    ((12, 20), 4, [[0, 7], [9, 22]]),
+]
+
+# Sau STEPS: sát mép các run [0, 7] và [9, 22]
+CONTAINS = {-1: False, 0: True, 7: True, 8: False, 9: True, 22: True, 23: False}
+EXPECTED_GAPS = [[8, 8]]
+
+def main():
+    failures = []
+    ranges = SequenceRanges()
+    for (start, end), expected_present, expected_runs in STEPS:
+        present = ranges.add(start, end)
+        if present != expected_present:
+            failures.append(f"add({start}, {end}): expected {expected_present} already present, got {present}")
+        if ranges.runs() != expected_runs:
+            failures.append(f"add({start}, {end}): expected runs {expected_runs}, got {ranges.runs()}")
+    for sequence, expected in CONTAINS.items():
+        if (sequence in ranges) != expected:
+            failures.append(f"{sequence} in ranges: expected {expected}")
+    if ranges.gaps() != EXPECTED_GAPS or ranges.missing() != 1:
+        failures.append(f"expected gaps {EXPECTED_GAPS} (1 missing), got {ranges.gaps()} ({ranges.missing()} missing)")
+
+    # Trước khi các run gộp lại: mỗi chỗ trống là một gap, missing đếm đủ các sequence
+    ranges = SequenceRanges()
+    for start, end in ((1, 5), (7, 7), (10, 12)):
+        ranges.add(start, end)
+    if ranges.gaps() != [[6, 6], [8, 9]] or ranges.missing() != 3:
+        failures.append(f"expected gaps [[6, 6], [8, 9]] (3 missing), got {ranges.gaps()} ({ranges.missing()} missing)")
+    if [sequence for sequence in range(0, 14) if sequence in ranges] != [1, 2, 3, 4, 5, 7, 10, 11, 12]:
+        failures.append(f"unexpected members {[sequence for sequence in range(0, 14) if sequence in ranges]}")
+    if 0 in SequenceRanges():
+        failures.append("an empty SequenceRanges contains 0")
+
+    print(f"{len(STEPS)} add() steps, {len(CONTAINS)} membership checks at run edges")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import tempfile
+import importlib.util
+
+# Chạy từ thư mục gốc: python test/14_check_sequence_timeline.py
+# Vài dòng log cố định (packet message_handler, drop 'Data channel full', kiểm tra sequence qua Redis) của hai source
+# đi qua parse_log_entry và ParsedLogConsumer của parse-cboe-sequence-timeline.py; so file timeline ghi ra với các bin
+# và summary tính tay. Source A mất 103..105 một giây sau hai drop (gap trùng drop), source B có drop mà không có gap
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCE_A = '170.137.217.68:41750'
+SOURCE_B = '170.137.217.68:43612'
+# 2025-05-13T04:26:06Z
+T0 = 1747110366
+
+def load_timeline_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_sequence_timeline', os.path.join(ROOT, 'parse-cboe-sequence-timeline.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def log_time(offset):
+    return f'2025-05-13T04:26:{6 + offset:02d}Z'
+
+def packet(offset, udp_addr, unit, sequence, count=1, caller='/app/pkg/cboe/message_handler.go:83'):
+    return {'level': 'info', 'time': log_time(offset), 'caller': caller,
+            'message': f'UDPAddr: {udp_addr} - common.DeleteOrderMessage{{Timestamp:1747109706634000, OrderID:"D{sequence}"}} - '
+                       f'common.SequencedUnitHeader{{HdrLength:30, HdrCount:{count}, HdrUnit:{unit}, HdrSequence:{sequence}}} - '
+                       f'ReceivedAt: 2025-05-13 14:15:06.631 - ExecutedTime: 91.852µs'}
+
+def drop(offset, udp_addr, length):
+    return {'level': 'warn', 'time': log_time(offset), 'message': f'Data channel full, dropping message from {udp_addr} (length: {length})'}
+
+def check(offset, message):
+    return {'level': 'warn', 'time': log_time(offset), 'caller': '/app/cmd/app/main.go:61', 'message': message}
+
+LOGS = [
+    packet(0, SOURCE_A, 1, 100),
+    packet(0, SOURCE_A, 1, 101, count=2),
+    check(0, 'SEQUENCE: 2025-05-13:1:103 - Get latest sequence from Redis'),
+    drop(1, SOURCE_A, 39),
+    drop(1, SOURCE_A, 50),
+    # 103..105 không tới
+    packet(2, SOURCE_A, 1, 106),
+    check(2, 'SEQUENCE: 2025-05-13:1:102:106 - Missing packets: 3'),
+    packet(2, SOURCE_A, 1, 106),
+    # UDPAddr nhưng không phải message_handler, và một dòng không liên quan: bỏ qua
+    packet(2, SOURCE_A, 1, 107, caller='/app/pkg/cboe/pitch/add_order.go:41'),
+    check(3, 'Get: cboe:transaction:22DJR6U8IENSY. Err: redis: nil'),
+    packet(4, SOURCE_B, 2, 500),
+    check(4, 'Sequence: {2025-05-13 2 500} - IsDuplicate: false'),
+    drop(6, SOURCE_B, 30),
+    check(14, 'Sequence: {2025-05-13 2 501} - IsDuplicate: true'),
+    packet(14, SOURCE_B, 2, 501),
+]
+
+FIELDS = ('packets', 'drops', 'dropped_bytes', 'gaps', 'missing', 'late', 'duplicates',
+          'redis_lookups', 'redis_in_order', 'redis_missing_checks', 'redis_missing', 'redis_duplicates')
+
+def counters(**counts):
+    return dict(dict.fromkeys(FIELDS, 0), **counts)
+
+def time_bin(offset, **counts):
+    return dict(timestamp=T0 + offset, **counters(**counts))
+
+EXPECTED = {
+    'bin_seconds': 1,
+    'sources': {
+        SOURCE_A: {
+            'units': [1],
+            'summary': dict(counters(packets=4, drops=2, dropped_bytes=89, gaps=1, missing=3, duplicates=1, redis_lookups=1,
+                                     redis_missing_checks=1, redis_missing=3),
+                            gap_bins=1, gap_bins_with_drops=1, missing_with_drops=3, drop_bins_without_gaps=0),
+            'bins': [
+                time_bin(0, packets=2, redis_lookups=1),
+                time_bin(1, drops=2, dropped_bytes=89),
+                # Gap 103..105 vào bin của packet đầu tiên sau nó (106), packet 106 lần hai là duplicate
+                time_bin(2, packets=2, gaps=1, missing=3, duplicates=1, redis_missing_checks=1, redis_missing=3),
+            ],
+        },
+        SOURCE_B: {
+            'units': [2],
+            'summary': dict(counters(packets=2, drops=1, dropped_bytes=30, redis_duplicates=1),
+                            gap_bins=0, gap_bins_with_drops=0, missing_with_drops=0, drop_bins_without_gaps=1),
+            'bins': [
+                time_bin(4, packets=1),
+                time_bin(6, drops=1, dropped_bytes=30),
+                time_bin(14, packets=1, redis_duplicates=1),
+            ],
+        },
+    },
+}
+
+def main():
+    script = load_timeline_script()
+    items = [item for item in map(script.parse_log_entry, LOGS) if item is not None]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as output_dir:
+        os.chdir(output_dir)
+        try:
+            script.process_parsed_logs(items, 'fixture')
+            with open('sequence_timeline_fixture.json') as f:
+                actual = json.load(f)
+        finally:
+            os.chdir(cwd)
+
+    failures = []
+    if len(items) != len(LOGS) - 2:
+        failures.append(f"expected {len(LOGS) - 2} parsed lines, got {len(items)}")
+    if actual.get('bin_seconds') != EXPECTED['bin_seconds']:
+        failures.append(f"expected bin_seconds {EXPECTED['bin_seconds']}, got {actual.get('bin_seconds')}")
+    if sorted(actual.get('sources', {})) != sorted(EXPECTED['sources']):
+        failures.append(f"expected sources {sorted(EXPECTED['sources'])}, got {sorted(actual.get('sources', {}))}")
+    for source, expected in EXPECTED['sources'].items():
+        entry = actual.get('sources', {}).get(source, {})
+        for key in ('units', 'summary', 'bins'):
+            if entry.get(key) != expected[key]:
+                failures.append(f"{source} {key}: expected {expected[key]}, got {entry.get(key)}")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
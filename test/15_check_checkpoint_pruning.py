@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+
+# Chạy từ thư mục gốc: python test/15_check_checkpoint_pruning.py
+# StateCheckpointStore trong thư mục tạm với ba file log giả: checkpoint của file đã rotate đi (bị xoá) hay đã đổi
+# bị prune() xoá, checkpoint chỉ liệt kê file đó với Timestamp sau checkpoint thì giữ, và store() không giữ quá max_checkpoints
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from log_pipeline import StateCheckpointStore
+
+def write_file(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        first, second, active = (os.path.join(work_dir, name) for name in ('first.log.gz', 'second.log.gz', 'active.log'))
+        for path in (first, second, active):
+            write_file(path, path)
+        # Mỗi file bắt đầu ở 100, 200, 300
+        file_spans = {first: (100, 199), second: (200, 299), active: (300, 399)}
+
+        store = StateCheckpointStore(os.path.join(work_dir, 'cache'), max_checkpoints=3)
+        for timestamp in (150, 250, 350):
+            store.store(timestamp, {'at': timestamp}, file_spans)
+        if store.prune() != 0 or store.times() != [150, 250, 350]:
+            failures.append(f"nothing changed: expected no checkpoint removed, got {store.times()}")
+
+        # File đang ghi lớn thêm: checkpoint 350 (sau message đầu của nó) không dùng được nữa, 150 và 250 vẫn dùng được
+        write_file(active, active + ' more lines')
+        removed = store.prune()
+        if removed != 1 or store.times() != [150, 250]:
+            failures.append(f"active file grew: expected only 350 removed, got {removed} removed, left {store.times()}")
+
+        # File đầu tiên rotate đi: mọi checkpoint đã replay nó bị xoá
+        os.remove(first)
+        removed = store.prune()
+        if removed != 2 or store.times() != []:
+            failures.append(f"first file rotated away: expected 150 and 250 removed, got {removed} removed, left {store.times()}")
+
+        # Giới hạn số checkpoint: store() bỏ các checkpoint sớm nhất
+        file_spans = {second: (200, 299), active: (300, 420)}
+        for timestamp in (210, 260, 310, 360, 410):
+            store.store(timestamp, {'at': timestamp}, file_spans)
+        if store.times() != [310, 360, 410]:
+            failures.append(f"max_checkpoints=3: expected [310, 360, 410] kept, got {store.times()}")
+        if store.load_before(400, file_spans) != (360, {'at': 360}):
+            failures.append(f"expected the checkpoint at 360 before 400, got {store.load_before(400, file_spans)}")
+
+        # Checkpoint hỏng cũng bị xoá
+        write_file(os.path.join(store.checkpoint_dir, f"500{store.suffix}"), 'not a pickle')
+        removed = store.prune()
+        if removed != 1 or store.times() != [310, 360, 410]:
+            failures.append(f"unreadable checkpoint: expected only it removed, got {removed} removed, left {store.times()}")
+
+    print("StateCheckpointStore: prune() after a file grew, rotated away and a corrupt checkpoint, store() over max_checkpoints")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
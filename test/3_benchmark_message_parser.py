@@ -0,0 +1,97 @@
+import os
+import re
+import sys
+import time
+
+# Chạy từ thư mục gốc: python test/3_benchmark_message_parser.py [folder] [max_lines]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_pipeline import LinePrefilter, iter_folder_log_entries
+from message_parser import parse_handler_message
+
+# Hai bản extract_object cũ để so sánh: regex + split ', ' (script order/auction/...) và regex findall (script hqrSequence)
+def legacy_extract_object(input_string):
+    match = re.search(r'\{(.*)\}', input_string)
+    if match:
+        content = match.group(1)
+
+        content_dict = {}
+        for item in content.split(', '):
+            key, value = item.split(':', 1)
+            key = key.strip()
+            value = value.strip().strip('"')
+            content_dict[key] = value
+
+        return content_dict
+    else:
+        return None
+
+def legacy_findall_extract_object(input_string):
+    match = re.search(r"\{(.*)\}", input_string)
+    if not match:
+        return None
+
+    content = match.group(1)
+    content_dict = {}
+    items = re.findall(r"([^,]+:[^,]+)(?:,|$)", content)
+
+    for item in items:
+        if ":" not in item:
+            continue
+
+        key, value = item.split(":", 1)
+        key = key.strip()
+        value = value.strip().strip('"')
+        content_dict[key] = value
+
+    return content_dict
+
+def load_messages(folder_path, max_lines):
+    prefilter = LinePrefilter(required=['message_handler', 'common.'])
+    messages = []
+    for entry in iter_folder_log_entries(folder_path, prefilter):
+        messages.append(entry.get('message', ''))
+        if len(messages) >= max_lines:
+            break
+    return messages
+
+# Mỗi parser chạy BENCHMARK_REPEATS lượt xen kẽ nhau, lấy lượt nhanh nhất (máy test dao động nhiều giữa các lượt)
+BENCHMARK_REPEATS = 5
+
+def run_once(parse_fn, messages):
+    failed = 0
+    start = time.perf_counter()
+    for message in messages:
+        try:
+            parse_fn(message)
+        except ValueError:
+            failed += 1
+    return time.perf_counter() - start, failed
+
+def main():
+    folder_path = sys.argv[1] if len(sys.argv) > 1 else 'today'
+    max_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+
+    messages = load_messages(folder_path, max_lines)
+    if not messages:
+        print(f"No message_handler lines found in {folder_path}")
+        return
+    print(f"Benchmarking {len(messages)} message_handler lines from {folder_path}, best of {BENCHMARK_REPEATS}")
+
+    parsers = [('extract_object (split)', legacy_extract_object), ('extract_object (findall)', legacy_findall_extract_object),
+               ('parse_handler_message', parse_handler_message)]
+    best = {}
+    for _ in range(BENCHMARK_REPEATS):
+        for name, parse_fn in parsers:
+            elapsed, failed = run_once(parse_fn, messages)
+            if name not in best or elapsed < best[name][0]:
+                best[name] = (elapsed, failed)
+    for name, _ in parsers:
+        elapsed, failed = best[name]
+        print(f"{name:<24} {len(messages) / elapsed:>12,.0f} lines/s  ({elapsed:.3f}s, {failed} failed)")
+
+    legacy, legacy_findall, current = (best[name][0] for name, _ in parsers)
+    print(f"Speed-up: {legacy / current:.2f}x vs split, {legacy_findall / current:.2f}x vs findall")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+# Chạy từ thư mục gốc: python test/4_benchmark_timestamp_parse.py [folder] [max_lines]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from log_pipeline import LinePrefilter, iter_folder_log_entries
+from log_time import parse_log_time
+
+# Pre-filter giống LINE_PREFILTER của từng script
+SCRIPT_PREFILTERS = {
+    'order': LinePrefilter(required=['message_handler', 'common.']),
+    'sequence': LinePrefilter(required=['message_handler', 'HdrSequence']),
+    'drop': LinePrefilter(required=['dropping message']),
+}
+
+# Cách cũ: strptime cho mọi dòng
+def legacy_convert_to_timestamp(time_string):
+    return datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S%z').timestamp()
+
+def load_times(folder_path, prefilter, max_lines):
+    times = []
+    for entry in iter_folder_log_entries(folder_path, prefilter):
+        times.append(entry.get('time', ''))
+        if len(times) >= max_lines:
+            break
+    return times
+
+def benchmark(name, convert_fn, values):
+    start = time.perf_counter()
+    results = [convert_fn(value) for value in values]
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<28} {elapsed / len(values) * 1e9:>8,.0f} ns/line  ({elapsed:.3f}s)")
+    return elapsed, results
+
+def compare(label, legacy_fn, fast_fn, values, clear_memo):
+    clear_memo()
+    legacy, expected = benchmark(f"{label} (strptime)", legacy_fn, values)
+    fast, actual = benchmark(f"{label} (fixed + memo)", fast_fn, values)
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"  speed-up {legacy / fast:.1f}x, saved {(legacy - fast) / len(values) * 1e9:,.0f} ns/line, {mismatches} mismatches")
+
+def main():
+    folder_path = sys.argv[1] if len(sys.argv) > 1 else 'today'
+    max_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 300_000
+
+    for script, prefilter in SCRIPT_PREFILTERS.items():
+        times = load_times(folder_path, prefilter, max_lines)
+        if not times:
+            print(f"[{script}] no lines in {folder_path}")
+            continue
+        print(f"[{script}] {len(times)} lines, {len(set(times))} distinct 'time' values")
+        compare('time', legacy_convert_to_timestamp, parse_log_time, times, parse_log_time.cache_clear)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import random
+import importlib.util
+
+# Chạy từ thư mục gốc: python test/5_benchmark_time_index.py [folder] [so_khoang]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from order_index import SymbolTimeIndex, np
+
+def load_order_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_feed_connector_log', os.path.join(ROOT, 'parse-cboe-feed-connector-log.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main():
+    folder_path = sys.argv[1] if len(sys.argv) > 1 else 'today'
+    window_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    script = load_order_script()
+    parsed_log = script.load_parsed_log_data(folder_path)
+    order_state = script.OrderStateEngine()
+    order_state.apply_all(parsed_log)
+    grouped = order_state.grouped
+    timestamps = [log.message_timestamp for log in parsed_log if log.message_timestamp]
+    if not timestamps:
+        print(f"No order messages in {folder_path}")
+        return
+    first, last = min(timestamps), max(timestamps)
+
+    # Các khoảng ngẫu nhiên dài 1 giây .. 5 phút, giống khi bisect quanh một sự cố
+    random.seed(1)
+    windows = []
+    for _ in range(window_count):
+        start = random.randint(first, last)
+        windows.append((start, start + random.randint(1_000_000, 300_000_000)))
+
+    start_clock = time.perf_counter()
+    expected = [script.filter_logs_by_time_range(grouped, start, end) for start, end in windows]
+    scan = time.perf_counter() - start_clock
+
+    start_clock = time.perf_counter()
+    time_index = SymbolTimeIndex(grouped)
+    build = time.perf_counter() - start_clock
+    start_clock = time.perf_counter()
+    actual = [time_index.window(start, end) for start, end in windows]
+    query = time.perf_counter() - start_clock
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b or [list(o) for o in a.values()] != [list(o) for o in b.values()])
+    print(f"{len(timestamps)} messages, {len(grouped)} symbols, {window_count} windows, numpy={'yes' if np is not None else 'no'}")
+    print(f"  scan  filter_logs_by_time_range  {scan:.3f}s  ({scan / window_count * 1000:.1f} ms/window)")
+    print(f"  index build {build:.3f}s + query {query:.3f}s  ({query / window_count * 1000:.1f} ms/window)")
+    print(f"  {mismatches} mismatches")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import random
+import importlib.util
+from types import SimpleNamespace
+
+# Chạy từ thư mục gốc: python test/6_benchmark_candlesticks.py [folder] [so_trade_gia_lap]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from candlesticks import np
+
+def load_order_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_feed_connector_log', os.path.join(ROOT, 'parse-cboe-feed-connector-log.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Symbol giả lập: một symbol rất nhiều trade trong phiên 10:00-16:00 (giờ Sydney) ngày 13/05/2025,
+# và hai symbol trải một tuần quanh mỗi lần đổi giờ AEDT/AEST; 1% trade được ghi log trễ vài giây
+def synthetic_trades(trade_count):
+    random.seed(1)
+    logs = {}
+    for name, first, last, count in (('BUSY', 1747094400, 1747116000, trade_count),
+                                     ('DST_APR', 1743681600, 1743681600 + 7 * 86400, trade_count // 10),
+                                     ('DST_OCT', 1759456800, 1759456800 + 7 * 86400, trade_count // 10)):
+        trades = []
+        for timestamp in sorted(random.randint(first, last) for _ in range(count)):
+            if random.random() < 0.01:
+                timestamp -= random.randint(1, 5)
+            trades.append(SimpleNamespace(timestamp=float(timestamp), price=round(random.uniform(10, 11), 2),
+                                          executed_qty=random.randint(1, 5000)))
+        logs[name] = trades
+    return logs
+
+# Chỉ so các trường nến cũ có (open/high/low/close, start/end), volume/trade_count/vwap là trường mới
+def ohlc_only(candlestick_data):
+    return {symbol: {timeframe: [{key: candle[key] for key in LEGACY_KEYS} for candle in candles]
+                     for timeframe, candles in timeframes.items()}
+            for symbol, timeframes in candlestick_data.items()}
+
+LEGACY_KEYS = ('symbol', 'start_time', 'end_time', 'open', 'high', 'low', 'close')
+ROLLUP_TIMEFRAMES = ['1s', '5s', '1m', '5m', '15m', '30m', '1h', '1d']
+# Giờ 02:00-03:00 lặp lại khi hết giờ mùa hè (6/4/2025): dựng thẳng từ trade giữ cách so end_time (fold=0) của vòng lặp cũ,
+# còn nến gộp đi theo giờ đồng hồ => không so các nến bắt đầu trong giờ này ở khung nhỏ hơn 1h
+REPEATED_HOUR = '2025-04-06T02:'
+
+def outside_repeated_hour(candlestick_data):
+    return {symbol: {timeframe: [candle for candle in candles if not candle['start_time'].startswith(REPEATED_HOUR)]
+                     for timeframe, candles in timeframes.items()}
+            for symbol, timeframes in candlestick_data.items()}
+
+def compare(script, name, logs):
+    start_clock = time.perf_counter()
+    expected = script.construct_candlestick_data_by_trade(logs)
+    by_trade = time.perf_counter() - start_clock
+    start_clock = time.perf_counter()
+    actual = script.construct_candlestick_data(logs, ['1m', '1h', '1d'])
+    arrays = time.perf_counter() - start_clock
+    trades = sum(len(trades) for trades in logs.values())
+    print(f"{name}: {trades} trades, {len(logs)} symbols")
+    print(f"  by trade  {by_trade:.3f}s")
+    print(f"  arrays    {arrays:.3f}s  ({by_trade / arrays if arrays else 0:.0f}x)")
+    print(f"  identical: {'yes' if expected == ohlc_only(actual) else 'NO'}")
+
+    # Mọi khung gộp từ nến 1s phải giống hệt khi dựng riêng từng khung từ trade
+    start_clock = time.perf_counter()
+    rolled_up = script.construct_candlestick_data(logs, ROLLUP_TIMEFRAMES)
+    rollup = time.perf_counter() - start_clock
+    start_clock = time.perf_counter()
+    direct = {}
+    for timeframe in ROLLUP_TIMEFRAMES:
+        for symbol, candles in script.construct_candlestick_data(logs, [timeframe]).items():
+            direct.setdefault(symbol, {}).update(candles)
+    separate = time.perf_counter() - start_clock
+    print(f"  {len(ROLLUP_TIMEFRAMES)} timeframes rolled up {rollup:.3f}s, each from trades {separate:.3f}s, "
+          f"identical: {'yes' if outside_repeated_hour(rolled_up) == outside_repeated_hour(direct) else 'NO'}")
+
+def main():
+    folder_path = sys.argv[1] if len(sys.argv) > 1 else 'today'
+    trade_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+
+    script = load_order_script()
+    # Không có numpy (cài mặc định) thì chạy đường list thuần: đo được ~6x so với vòng lặp theo trade, có numpy ~10x
+    print(f"numpy={'yes' if np is not None else 'no (plain-list path, pip install numpy for the array path)'}")
+    parsed_log = script.load_parsed_log_data(folder_path)
+    order_state = script.OrderStateEngine()
+    order_state.apply_all(parsed_log)
+    compare(script, folder_path, script.extract_all_executed_message_by_symbol(order_state.grouped))
+    compare(script, 'synthetic', synthetic_trades(trade_count))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import importlib.util
+
+# Chạy từ thư mục gốc: python test/7_check_depth_pruning.py [folder]
+# Depth tại các DEPTH_TIMES sau END_TIME phải giống nhau khi bật/tắt PRUNE_FILES_BY_TIME
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def load_order_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_feed_connector_log', os.path.join(ROOT, 'parse-cboe-feed-connector-log.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def depth_with_pruning(script, folder_path, prune):
+    script.PRUNE_FILES_BY_TIME = prune
+    _, depth_by_time = script.build_depth(script.load_parsed_log_data(folder_path))
+    return depth_by_time
+
+def main():
+    folder_path = sys.argv[1] if len(sys.argv) > 1 else 'today'
+
+    script = load_order_script()
+    file_spans = [span for span in script.load_file_time_spans(script.list_log_files(folder_path)).values() if span is not None]
+    if not file_spans:
+        print(f"No order messages in {folder_path}")
+        return
+    first, last = min(span[0] for span in file_spans), max(span[1] for span in file_spans)
+
+    # Khoảng lọc một phút ở đầu ngày, depth ở giữa và gần cuối ngày (sau END_TIME), mọi symbol
+    script.USE_SYMBOL_FILTER = False
+    script.USE_TIME_FILTER = True
+    script.START_TIME, script.END_TIME = first + 30_000_000, first + 90_000_000
+    script.DEPTH_TIMES = [(first + last) // 2, last - 60_000_000]
+
+    expected = depth_with_pruning(script, folder_path, False)
+    actual = depth_with_pruning(script, folder_path, True)
+
+    print(f"Depth at {len(script.DEPTH_TIMES)} times after END_TIME")
+    mismatches = 0
+    for depth_time in script.DEPTH_TIMES:
+        expected_depth, actual_depth = expected.get(depth_time, {}), actual.get(depth_time, {})
+        differing = [s for s in expected_depth.keys() | actual_depth.keys() if expected_depth.get(s) != actual_depth.get(s)]
+        print(f"  {depth_time}: {len(expected_depth)} symbols without pruning, {len(actual_depth)} with pruning, {len(differing)} differ")
+        mismatches += len(differing)
+    print(f"  {mismatches} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
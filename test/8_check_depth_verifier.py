@@ -0,0 +1,89 @@
+import os
+import sys
+import importlib.util
+
+# Chạy từ thư mục gốc: python test/8_check_depth_verifier.py
+# Book biết trước dựng từ vài dòng message_handler, so với ba dòng DEPTH: một dòng khớp,
+# một dòng có thêm order từ trước log (book incomplete) và một dòng cố ý sai quantity (diverge)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from order_book import DepthVerifier, depth_feed_order_key
+
+def load_depth_verify_script():
+    spec = importlib.util.spec_from_file_location('parse_cboe_depth_verify', os.path.join(ROOT, 'parse-cboe-depth-verify.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def handler_line(caller_line, body, sequence):
+    return {
+        'level': 'info',
+        'time': '2025-05-13T04:31:31Z',
+        'caller': f'/app/pkg/cboe/message_handler.go:{caller_line}',
+        'message': f'UDPAddr: 170.137.217.68:41750 - {body} - common.SequencedUnitHeader{{HdrLength:50, HdrCount:1, HdrUnit:1, '
+                   f'HdrSequence:{sequence}}} - ReceivedAt: 2025-05-13 14:15:33.104 - ExecutedTime: 316.154µs',
+    }
+
+def add_order(timestamp, order_id, side, quantity, price, sequence):
+    return handler_line(71, f'common.AddOrderMessage{{Timestamp:{timestamp}, OrderID:"{order_id}", SideIndicator:"{side}", '
+                            f'Quantity:{quantity}, Symbol:"TST", Price:{price}, PID:"9452", Reserved:"\\x00"}}', sequence)
+
+def delete_order(timestamp, order_id, sequence):
+    return handler_line(83, f'common.DeleteOrderMessage{{Timestamp:{timestamp}, OrderID:"{order_id}"}}', sequence)
+
+def depth_line(time, asks, bids):
+    def levels(side, entries):
+        return ', '.join(f'"{index}":models.Trade{{Symbol:"TST", Side:"{side}", Quantity:{quantity}, NumberOfTrades:{orders}, '
+                         f'Price:{price}, Exchange:"CXA", Time:{time}}}' for index, (price, quantity, orders) in enumerate(entries))
+    return {
+        'level': 'info',
+        'time': '2025-05-13T04:31:32Z',
+        'caller': '/app/pkg/cboe/pitch/add_order.go:41',
+        'message': f'DEPTH: qh-depth:asx-18 - TST - models.Depth{{Symbol:"TST", Exchange:"CXA", '
+                   f'Ask:map[string]models.Trade{{{levels("Ask", asks)}}}, Bid:map[string]models.Trade{{{levels("Bid", bids)}}}, '
+                   f'Time:{time}, IsChanged:true}} - true - 0x6c41a0 - %!v(MISSING)',
+    }
+
+def main():
+    script = load_depth_verify_script()
+    logs = [
+        add_order(1000, 'A1', 'B', 100, 10.0, 1),
+        add_order(1000, 'A2', 'B', 50, 10.0, 2),
+        add_order(1000, 'A3', 'S', 200, 10.1, 3),
+        # Order có từ trước log: book không biết, message chỉ được đếm là unknown
+        delete_order(1500, 'BEFORE_LOGS', 4),
+        # Khớp book: bid 10.0 (150, 2 order), ask 10.1 (200, 1 order)
+        depth_line(1000, [(10.1, 200, 1)], [(10.0, 150, 2)]),
+        # Thêm một mức bid 9.99 của order có từ trước log: book incomplete, không diverge
+        depth_line(2000, [(10.1, 200, 1)], [(10.0, 150, 2), (9.99, 300, 1)]),
+        # Cố ý sai quantity ở bid 10.0 với cùng số order: diverge
+        depth_line(3000, [(10.1, 200, 1)], [(10.0, 140, 2)]),
+    ]
+    items = sorted((script.parse_log_entry(log) for log in logs), key=depth_feed_order_key)
+
+    verifier = DepthVerifier(levels=10)
+    divergences = verifier.verify(items)
+    counts = verifier.summary.get('TST', {})
+    print(f"TST: {counts.get('snapshots', 0)} snapshots, {counts.get('diverging_snapshots', 0)} diverge, "
+          f"{counts.get('incomplete_snapshots', 0)} book incomplete, {verifier.engine.unknown_order_messages} unknown order messages")
+
+    failures = []
+    if counts.get('snapshots') != 3:
+        failures.append(f"expected 3 snapshots, got {counts.get('snapshots')}")
+    if [entry['time'] for entry in divergences] != [3000]:
+        failures.append(f"expected only the DEPTH line at 3000 to diverge, got {[entry['time'] for entry in divergences]}")
+    elif divergences[0]['levels'] != [{'side': 'bid', 'level': 0, 'published': [10.0, 140, 2], 'book': [10.0, 150, 2]}]:
+        failures.append(f"unexpected diverging levels {divergences[0]['levels']}")
+    if [entry['time'] for entry in verifier.incomplete] != [2000]:
+        failures.append(f"expected the DEPTH line at 2000 as book incomplete, got {[entry['time'] for entry in verifier.incomplete]}")
+    if verifier.engine.unknown_order_messages != 1:
+        failures.append(f"expected 1 unknown order message, got {verifier.engine.unknown_order_messages}")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Chạy từ thư mục gốc: python test/9_check_record_header.py
+# Header của record phải giống nhau dù SequencedUnitHeader được log đúng thứ tự, đảo thứ tự key hay có thêm key
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from message_parser import parse_handler_message
+from order_records import make_record
+
+BODY = ('UDPAddr: 170.137.217.68:41750 - common.AddOrderMessage{Timestamp:1747109733107000, OrderID:"NRICFHZWFB42", '
+        'SideIndicator:"S", Quantity:22000, Symbol:"BBOZ", Price:25.12, PID:"9452", Reserved:"\\x00"}')
+TAIL = ' - ReceivedAt: 2025-05-13 14:15:33.104 - ExecutedTime: 316.154µs'
+HEADERS = {
+    'standard': 'HdrLength:50, HdrCount:1, HdrUnit:1, HdrSequence:7096697',
+    'reordered': 'HdrUnit:1, HdrSequence:7096697, HdrLength:50, HdrCount:1',
+    'extra key': 'HdrLength:50, HdrCount:1, HdrUnit:1, HdrSequence:7096697, HdrReserved:0',
+}
+EXPECTED = {'HdrLength': 50, 'HdrCount': 1, 'HdrUnit': 1, 'HdrSequence': 7096697}
+
+def main():
+    failures = []
+    for name, header in HEADERS.items():
+        log = {'level': 'info', 'time': '2025-05-13T04:31:31Z', 'caller': '/app/pkg/cboe/message_handler.go:71',
+               'message': f"{BODY} - common.SequencedUnitHeader{{{header}}}{TAIL}", 'timestamp': 1747100000.0}
+        try:
+            record = make_record(log, 'AddOrderMessage', parse_handler_message(log['message']))
+        except (KeyError, ValueError) as e:
+            failures.append(f"{name}: make_record raised {e!r}")
+            continue
+        actual = record.header.to_dict() if record.header is not None else None
+        print(f"  {name:<10} {actual}")
+        if actual != EXPECTED:
+            failures.append(f"{name}: expected {EXPECTED}, got {actual}")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("  OK")
+
+if __name__ == '__main__':
+    main()